@@ -0,0 +1,42 @@
+import asyncio
+import os
+from typing import Awaitable, Iterable, List, TypeVar
+
+T = TypeVar("T")
+
+
+def limit_from_env(name: str, default: int) -> int:
+    """Read a concurrency limit from the environment, never below 1."""
+    return max(int(os.getenv(name, str(default))), 1)
+
+
+async def bounded(semaphore: asyncio.Semaphore, aw: Awaitable[T]) -> T:
+    """Await `aw` once the semaphore has a free slot."""
+    async with semaphore:
+        return await aw
+
+
+async def gather_cancelling(*aws: Awaitable[T]) -> List[T]:
+    """Like `asyncio.gather`, but the first failure cancels everything still running.
+
+    Returns:
+        List: Results in the order of `aws`
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def gather_bounded(aws: Iterable[Awaitable[T]], limit: int) -> List[T]:
+    """Await everything in `aws` with at most `limit` running at once.
+
+    Returns:
+        List: Results in the order of `aws`
+    """
+    semaphore = asyncio.Semaphore(limit)
+    return await gather_cancelling(*(bounded(semaphore, aw) for aw in aws))
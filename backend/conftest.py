@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+import types
+
+import httpx
+import pytest
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+# The provider clients are created at import time and refuse to start without keys; tests never reach them
+for key in ("OPENROUTER_API_KEY", "OPENAI_API_KEY", "EXA_API_KEY", "FAL_KEY"):
+    os.environ.setdefault(key, "test")
+
+
+def fake_value(schema, defs):
+    """The simplest value matching a JSON schema."""
+    if "$ref" in schema:
+        return fake_value(defs[schema["$ref"].split("/")[-1]], defs)
+    if "anyOf" in schema:
+        return fake_value(schema["anyOf"][0], defs)
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: fake_value(prop, defs) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [fake_value(schema["items"], defs)]
+    return {"string": "text", "integer": 1, "number": 1.0, "boolean": True, "null": None}[kind]
+
+
+def parse_sse(text):
+    """Split a Server-Sent Events body into (id, event, data) tuples, skipping comments."""
+    messages = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if fields:
+            messages.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+    return messages
+
+
+def completion(content, model="test-model"):
+    """A chat completion answering with `content`."""
+    return ChatCompletion.model_validate({
+        "id": "test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+    })
+
+
+def chunk(model, content=None, completion_tokens=None):
+    """A chunk of a streamed chat completion: some text, or the final usage."""
+    return ChatCompletionChunk.model_validate({
+        "id": "test",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": model,
+        "choices": [] if content is None else [{"index": 0, "delta": {"content": content}}],
+        "usage": None if completion_tokens is None else {
+            "prompt_tokens": 1, "completion_tokens": completion_tokens, "total_tokens": completion_tokens + 1,
+        },
+    })
+
+
+class FakeStream:
+    def __init__(self, texts, model, error=None):
+        self.texts = texts
+        self.model = model
+        self.error = error
+        self.closed = False
+
+    async def __aiter__(self):
+        for text in self.texts:
+            yield chunk(self.model, text)
+        if self.error is not None:
+            raise self.error
+        yield chunk(self.model, completion_tokens=len(self.texts))
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeCompletions:
+    """Stands in for the OpenRouter chat completions API, answering every schema with its simplest value."""
+
+    def __init__(self):
+        self.requests = []
+        self.running = 0
+        self.peak = 0
+        self.delay = 0.0
+        # Text of each chunk of streamed responses, and an error to raise after them
+        self.stream_chunks = ["Hello", ", ", "world"]
+        self.stream_error = None
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        if kwargs.get("stream"):
+            return FakeStream(self.stream_chunks, kwargs["model"], self.stream_error)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        response_format = kwargs.get("response_format")
+        if response_format:
+            schema = response_format["json_schema"]["schema"]
+            content = json.dumps(fake_value(schema, schema.get("$defs", {})))
+        else:
+            content = "text"
+        return completion(content, kwargs["model"])
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Answer LLM and image calls locally; returns the fake completions API."""
+    from models import images, llms
+    from models.rate_limiter import ModelRateLimiter
+
+    completions = FakeCompletions()
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+    monkeypatch.setattr(llms, "get_async_client", lambda: client)
+    # A limiter of its own, so tests neither wait for the process-wide token bucket nor drain it
+    monkeypatch.setattr(llms, "model_limiter", ModelRateLimiter(llms._is_overload, rate=1000, burst=1000))
+
+    async def subscribe_async(model, arguments, **kwargs):
+        return {"images": [{"url": "http://img"}]}
+
+    monkeypatch.setattr(images.fal_client, "subscribe_async", subscribe_async)
+    return completions
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The API module, with empty stores, job manager and image queue of its own."""
+    monkeypatch.chdir(tmp_path)
+    import main
+    from db import open_db
+    from db_async import AsyncJsonDB
+    from image_queue import ImageQueue
+    from jobs import JobManager
+
+    db = AsyncJsonDB(open_db("marketmind_content", backend="json"))
+    batches = AsyncJsonDB(open_db("marketmind_batches", backend="json"))
+    job_records = AsyncJsonDB(open_db("marketmind_jobs", backend="json"), io_threads=1)
+    monkeypatch.setattr(main, "db", db)
+    monkeypatch.setattr(main, "batches", batches)
+    monkeypatch.setattr(main, "job_records", job_records)
+    monkeypatch.setattr(main, "jobs", JobManager(store=job_records, poll_interval=0.01))
+    monkeypatch.setattr(main, "image_queue", ImageQueue(main.store_image))
+    # Bound to the event loop of the first test that waits on it otherwise
+    monkeypatch.setattr(main, "image_slots_lock", asyncio.Lock())
+    yield main
+    db.close()
+    batches.close()
+    job_records.close()
+
+
+@pytest.fixture
+def client(app):
+    """Client for the API, to be used within a single event loop."""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://test")
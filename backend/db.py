@@ -1,42 +1,317 @@
 import os
 import json
+import fcntl
+import hashlib
+import stat
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, TextIO, Tuple, Union
+
+# Sections of a stored generation that the API serves individually
+SECTIONS = (
+    "campaigns",
+    "detailed_campaign",
+    "gtm_plan",
+    "personas",
+    "market_research",
+    "executive_brief",
+)
+
+
+# Codecs for values stored as individual records. zlib streams always start
+# with 0x78 ("x"), which can never start a JSON document, so records can be
+# decoded without knowing which codec wrote them.
+CODECS = ("json", "zlib")
+
+
+def encode_value(value: Any, codec: str = "json") -> bytes:
+    """Encode a stored value as compact JSON, optionally zlib-compressed."""
+    data = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    if codec == "json":
+        return data
+    if codec == "zlib":
+        return zlib.compress(data)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def decode_value(data: Union[bytes, str]) -> Any:
+    """Decode a value written by `encode_value` with any codec."""
+    if isinstance(data, bytes) and data[:1] == b"x":
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+
+def split_sections(value: Any) -> Tuple[Dict, Dict]:
+    """Split an entry into its metadata and its individually stored sections.
+
+    Entries that are not dictionaries are kept whole in the metadata.
+    """
+    if not isinstance(value, dict):
+        return {"value": value}, {}
+    meta = {"fields": {k: v for k, v in value.items() if k not in SECTIONS}}
+    sections = {k: v for k, v in value.items() if k in SECTIONS}
+    return meta, sections
+
+
+def join_sections(meta: Dict, sections: Dict) -> Any:
+    """Rebuild an entry from the output of `split_sections`."""
+    if "value" in meta:
+        return meta["value"]
+    value = dict(meta["fields"])
+    for section in SECTIONS:
+        if section in sections:
+            value[section] = sections[section]
+    return value
+
+
+def input_hash(product_info: str, company_info: str = "") -> str:
+    """Hash the inputs of a generation, ignoring case and whitespace differences."""
+    normalized = "\n".join(" ".join(text.split()).lower() for text in (product_info, company_info))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def entry_input_hash(value: Any) -> Optional[str]:
+    """Get the `input_hash` of a stored generation, or None if it has no inputs."""
+    if not isinstance(value, dict) or "product_info" not in value:
+        return None
+    return input_hash(value["product_info"], value.get("company_info", ""))
+
+
+def is_complete(value: Any) -> bool:
+    """Check whether a stored generation has every section filled in."""
+    return isinstance(value, dict) and all(value.get(section) is not None for section in SECTIONS)
+
+def iter_json_object(f: TextIO, chunk_size: int = 64 * 1024) -> Iterator[Tuple[str, Any]]:
+    """Incrementally parse the top-level JSON object in a file.
+
+    Yields one `(key, value)` pair at a time, so memory use is bounded by the
+    largest value rather than the size of the file.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill(size: int) -> None:
+        nonlocal buf, pos, eof
+        chunk = f.read(size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def skip_whitespace() -> None:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill(chunk_size)
+
+    def expect(chars: str) -> str:
+        skip_whitespace()
+        if pos >= len(buf) or buf[pos] not in chars:
+            raise ValueError(f"Expected one of {chars!r} at offset {pos} of JSON object")
+        return buf[pos]
+
+    def decode() -> Any:
+        nonlocal pos
+        size = chunk_size
+        while True:
+            skip_whitespace()
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+                # A number is only complete once a delimiter follows it
+                if eof or (end < len(buf) and (buf[end] in ",:]}" or buf[end].isspace())):
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            fill(size)
+            size *= 2
+
+    expect("{")
+    pos += 1
+    if expect('"}') == "}":
+        return
+    while True:
+        key = decode()
+        expect(":")
+        pos += 1
+        yield key, decode()
+        if expect(",}") == "}":
+            return
+        pos += 1
+
+
+class _PendingWrite:
+    """A mutation waiting for the next group commit."""
+
+    def __init__(self, mutation: Callable[[Dict], Tuple[Any, bool]]):
+        self.mutation = mutation
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
 
 class JsonDB:
-    def __init__(self, db_name: str):
+    def __init__(self, db_name: str, group_commit_window: float = 0.0):
         self.db_name = db_name
         self.data_dir = Path(".data")
         self.data_dir.mkdir(exist_ok=True)
-        self.db_file = self.data_dir / f"{db_name}.json"
+        self.group_commit_window = group_commit_window
+        self._open()
+
+    def _open(self) -> None:
+        """Open the underlying storage for this database."""
+        self.db_file = self.data_dir / f"{self.db_name}.json"
+        self.lock_file = self.data_dir / f"{self.db_name}.json.lock"
+        self._pending: List[_PendingWrite] = []
+        self._pending_cond = threading.Condition()
+        self._committer: Optional[threading.Thread] = None
+        self.commits = 0
+        self.committed_writes = 0
+        self._reset_hash_index(None)
+        self._hashes_lock = threading.Lock()
+        # generation() of the file the input hash index matches
+        self._hashes_generation: Hashable = None
         self._ensure_db_exists()
     
     def _ensure_db_exists(self) -> None:
         """Ensure the database file exists, create it if it doesn't."""
-        if not self.db_file.exists():
-            self._write_data({})
+        with self._exclusive_lock():
+            if not self.db_file.exists():
+                self._write_data({})
+
+    @contextmanager
+    def _exclusive_lock(self) -> Iterator[None]:
+        """Hold an exclusive lock on the database across threads and processes."""
+        with open(self.lock_file, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
     
     def _read_data(self) -> Dict:
-        """Read data from the database file."""
+        """Read data from the database file.
+
+        Writers replace the file atomically, so readers need no lock. A file
+        that cannot be parsed is an error rather than an empty database, since
+        writing back an empty dictionary would wipe the store.
+        """
         try:
             with open(self.db_file, 'r') as f:
                 return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
+        except FileNotFoundError:
             return {}
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Database file {self.db_file} is corrupt: {e}")
     
     def _write_data(self, data: Dict) -> None:
-        """Write data to the database file."""
-        with open(self.db_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        """Write data to the database file.
+
+        The data is written and fsynced to a temporary file that then replaces
+        the database file, so readers see either the old or the new contents.
+        Callers must hold the exclusive lock.
+        """
+        try:
+            mode = stat.S_IMODE(self.db_file.stat().st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+        fd, tmp = tempfile.mkstemp(dir=self.data_dir, prefix=f".{self.db_name}.", suffix=".tmp")
+        try:
+            # mkstemp creates the file as 0600, which the replace would carry over to the database
+            os.fchmod(fd, mode)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.db_file)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def _mutate(self, mutation: Callable[[Dict], Tuple[Any, bool]]) -> Any:
+        """Apply a read-modify-write to the database under the exclusive lock.
+
+        `mutation` changes the data in place and returns `(result, changed)`.
+        With a group commit window, mutations arriving within the window are
+        applied together and written with a single fsync.
+        """
+        if self.group_commit_window <= 0:
+            with self._exclusive_lock(), self._hash_index_write():
+                data = self._read_data()
+                result, changed = mutation(data)
+                if changed:
+                    self._write_data(data)
+                    self.commits += 1
+                    self.committed_writes += 1
+                return result
+
+        pending = _PendingWrite(mutation)
+        with self._pending_cond:
+            self._pending.append(pending)
+            if self._committer is None:
+                self._committer = threading.Thread(
+                    target=self._commit_loop, name=f"{self.db_name}-committer", daemon=True
+                )
+                self._committer.start()
+            self._pending_cond.notify()
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _commit_loop(self) -> None:
+        while True:
+            with self._pending_cond:
+                while not self._pending:
+                    self._pending_cond.wait()
+            # Let more writes join this commit
+            time.sleep(self.group_commit_window)
+            with self._pending_cond:
+                batch, self._pending = self._pending, []
+            self._commit(batch)
+
+    def _commit(self, batch: List[_PendingWrite]) -> None:
+        try:
+            with self._exclusive_lock(), self._hash_index_write():
+                data = self._read_data()
+                changed = 0
+                for pending in batch:
+                    try:
+                        pending.result, pending_changed = pending.mutation(data)
+                        changed += pending_changed
+                    except Exception as e:
+                        pending.error = e
+                if changed:
+                    self._write_data(data)
+                    self.commits += 1
+                    self.committed_writes += changed
+        except BaseException as e:
+            for pending in batch:
+                pending.error = e
+        finally:
+            for pending in batch:
+                pending.done.set()
     
     def create(self, key: str, value: Any) -> bool:
         """Create a new entry in the database."""
-        data = self._read_data()
-        if key in data:
-            return False
-        data[key] = value
-        self._write_data(data)
-        return True
+        def mutation(data: Dict) -> Tuple[bool, bool]:
+            if key in data:
+                return False, False
+            data[key] = value
+            self._track_hash(key, value)
+            return True, True
+        return self._mutate(mutation)
     
     def read(self, key: str) -> Optional[Any]:
         """Read an entry from the database."""
@@ -45,26 +320,243 @@ class JsonDB:
     
     def update(self, key: str, value: Any) -> bool:
         """Update an entry in the database."""
-        data = self._read_data()
-        if key not in data:
-            return False
-        data[key] = value
-        self._write_data(data)
-        return True
+        def mutation(data: Dict) -> Tuple[bool, bool]:
+            if key not in data:
+                return False, False
+            data[key] = value
+            self._track_hash(key, value)
+            return True, True
+        return self._mutate(mutation)
     
     def delete(self, key: str) -> bool:
         """Delete an entry from the database."""
-        data = self._read_data()
-        if key not in data:
-            return False
-        del data[key]
-        self._write_data(data)
-        return True
+        def mutation(data: Dict) -> Tuple[bool, bool]:
+            if key not in data:
+                return False, False
+            del data[key]
+            self._track_hash(key)
+            return True, True
+        return self._mutate(mutation)
     
+    def delete_many(self, keys: List[str]) -> int:
+        """Delete several entries with a single write. Returns the number deleted."""
+        def mutation(data: Dict) -> Tuple[int, bool]:
+            deleted = 0
+            for key in keys:
+                if data.pop(key, None) is not None:
+                    self._track_hash(key)
+                    deleted += 1
+            return deleted, deleted > 0
+        return self._mutate(mutation)
+
+    def read_section(self, key: str, section: str) -> Optional[Any]:
+        """Read a single section of an entry from the database."""
+        value = self.read(key)
+        if not isinstance(value, dict):
+            return None
+        return value.get(section)
+
+    def write_section(self, key: str, section: str, section_value: Any) -> bool:
+        """Update a single section of an existing entry in the database."""
+        def mutation(data: Dict) -> Tuple[bool, bool]:
+            if not isinstance(data.get(key), dict):
+                return False, False
+            data[key][section] = section_value
+            self._track_hash(key, data[key])
+            return True, True
+        return self._mutate(mutation)
+
+    def _write_section_by_update(self, key: str, section: str, section_value: Any) -> bool:
+        """Update a single section by rewriting the whole entry.
+
+        Backends that override `write_section` fall back to this for sections
+        they do not store separately; they must hold their own write lock.
+        """
+        value = self.read(key)
+        if not isinstance(value, dict):
+            return False
+        value[section] = section_value
+        return self.update(key, value)
+
+    def _reset_hash_index(self, hashes: Optional[Dict[str, str]]) -> None:
+        """Drop the input hash index, or start an empty one with `{}`."""
+        # key -> input hash of complete entries, and input hash -> keys in the order they completed
+        self._hashes = hashes
+        self._keys_by_hash: Dict[str, Dict[str, None]] = {}
+
+    def _track_hash(self, key: str, value: Any = None) -> None:
+        """Keep the input hash index in step with a write of `value`, or a delete without one."""
+        if self._hashes is None:
+            return
+        previous = self._hashes.pop(key, None)
+        if previous is not None:
+            keys = self._keys_by_hash[previous]
+            del keys[key]
+            if not keys:
+                del self._keys_by_hash[previous]
+        hashed = entry_input_hash(value) if is_complete(value) else None
+        if hashed is not None:
+            self._hashes[key] = hashed
+            self._keys_by_hash.setdefault(hashed, {})[key] = None
+
+    def _latest_with_hash(self, hashed: str) -> Optional[str]:
+        keys = self._keys_by_hash.get(hashed)
+        return next(reversed(keys)) if keys else None
+
+    @contextmanager
+    def _hash_index_write(self) -> Iterator[None]:
+        """Keep the input hash index valid across a write. Callers must hold the exclusive lock.
+
+        The index is dropped if another process wrote since it was built, or
+        if the write fails halfway, and rebuilt on the next lookup.
+        """
+        with self._hashes_lock:
+            if self._hashes is not None and self.generation() != self._hashes_generation:
+                self._reset_hash_index(None)
+            try:
+                yield
+            except BaseException:
+                self._reset_hash_index(None)
+                raise
+            if self._hashes is not None:
+                self._hashes_generation = self.generation()
+
+    def find_by_input_hash(self, hashed: str) -> Optional[str]:
+        """Find the latest complete entry generated from inputs with this `input_hash`.
+
+        Lookups go through an in-memory index kept up to date by writes; the
+        store is only scanned to build it, or when another process wrote.
+
+        Args:
+            hashed (str): Hash of the inputs, as returned by `input_hash`
+
+        Returns:
+            Optional[str]: Key of the entry, or None if there is none
+        """
+        with self._hashes_lock:
+            generation = self.generation()
+            if self._hashes is None or generation != self._hashes_generation:
+                self._reset_hash_index({})
+                for key, value in self.iter_items():
+                    self._track_hash(key, value)
+                self._hashes_generation = generation
+            return self._latest_with_hash(hashed)
+
     def list_all(self) -> Dict:
         """List all entries in the database."""
         return self._read_data()
+
+    def iter_items(self, after: Optional[str] = None) -> Iterator[Tuple[str, Any]]:
+        """Iterate over entries in storage order without loading them all at once.
+
+        Args:
+            after (str, optional): Only yield entries that come after this key
+
+        Yields:
+            Tuple[str, Any]: Key and value of each entry
+        """
+        try:
+            f = open(self.db_file, 'r')
+        except FileNotFoundError:
+            return
+        with f:
+            items = iter_json_object(f)
+            if after is not None:
+                for key, _ in items:
+                    if key == after:
+                        break
+            yield from items
     
     def clear(self) -> None:
         """Clear all entries in the database."""
-        self._write_data({})
+        with self._exclusive_lock(), self._hash_index_write():
+            self._write_data({})
+            self._reset_hash_index(None)
+
+    def generation(self) -> Hashable:
+        """Get a token that changes whenever the stored data changes."""
+        try:
+            stat = self.db_file.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def storage_bytes(self) -> int:
+        """Get the number of bytes the database occupies on disk."""
+        try:
+            return self.db_file.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def compact(self) -> int:
+        """Reclaim space left by deleted entries. Returns the number of bytes reclaimed.
+
+        Every write already rewrites the whole file, so there is nothing to do here.
+        """
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get statistics about the database."""
+        stats = {"backend": type(self).__name__}
+        if type(self) is JsonDB:
+            stats["commits"] = self.commits
+            stats["committed_writes"] = self.committed_writes
+        return stats
+
+    def close(self) -> None:
+        """Release any resources held by the database."""
+        pass
+
+
+def open_db(
+    db_name: str,
+    backend: Optional[str] = None,
+    cache_size: Optional[int] = None,
+    codec: Optional[str] = None,
+) -> JsonDB:
+    """Open a database using the configured storage backend.
+
+    The backend is read from the `MARKETMIND_DB_BACKEND` environment variable
+    when not given explicitly:
+        - "json": a single pretty-printed JSON file (default)
+        - "log": append-only log segments with background compaction
+        - "sharded": one directory per entry with a file per section
+        - "sqlite": SQLite in WAL mode, migrating `.data/<db_name>.json` on first use
+
+    The "log", "sharded" and "sqlite" backends store each record with `codec`
+    (or `MARKETMIND_DB_CODEC`): "json" for compact JSON or "zlib" for
+    compressed JSON. The "json" backend always keeps a pretty-printed file.
+
+    For the "json" backend, `MARKETMIND_DB_GROUP_COMMIT_MS` batches writes that
+    arrive within that many milliseconds into a single commit.
+
+    When `cache_size` (or `MARKETMIND_DB_CACHE_SIZE`) is positive, the backend
+    is wrapped in a write-through LRU cache holding that many entries.
+    """
+    if cache_size is None:
+        cache_size = int(os.getenv("MARKETMIND_DB_CACHE_SIZE", "0"))
+    codec = codec or os.getenv("MARKETMIND_DB_CODEC", "json")
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec: {codec}")
+    db = _open_backend(db_name, backend, codec)
+    if cache_size > 0:
+        from db_cache import CachedJsonDB
+        return CachedJsonDB(db, max_entries=cache_size)
+    return db
+
+
+def _open_backend(db_name: str, backend: Optional[str], codec: str = "json") -> JsonDB:
+    backend = backend or os.getenv("MARKETMIND_DB_BACKEND", "json")
+    if backend == "json":
+        group_commit_ms = float(os.getenv("MARKETMIND_DB_GROUP_COMMIT_MS", "0"))
+        return JsonDB(db_name, group_commit_window=group_commit_ms / 1000)
+    if backend == "log":
+        from db_log import LogJsonDB
+        return LogJsonDB(db_name, codec=codec)
+    if backend == "sharded":
+        from db_sharded import ShardedJsonDB
+        return ShardedJsonDB(db_name, codec=codec)
+    if backend == "sqlite":
+        from db_sqlite import SqliteJsonDB
+        return SqliteJsonDB(db_name, codec=codec)
+    raise ValueError(f"Unknown database backend: {backend}")
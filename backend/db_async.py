@@ -0,0 +1,96 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from db import JsonDB
+
+
+class AsyncJsonDB:
+    """Awaitable interface to a JsonDB for use inside async endpoints.
+
+    Every call runs on a dedicated I/O thread pool instead of the event loop,
+    so parsing or rewriting the store never stalls other requests, and storage
+    work does not compete with `asyncio.to_thread` callers for the default
+    executor.
+    """
+
+    def __init__(self, db: JsonDB, io_threads: int = 4):
+        self.db = db
+        self.io_threads = io_threads
+        self._executor = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix=f"{db.db_name}-io")
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args))
+
+    async def create(self, key: str, value: Any) -> bool:
+        """Create a new entry in the database."""
+        return await self._run(self.db.create, key, value)
+
+    async def read(self, key: str) -> Optional[Any]:
+        """Read an entry from the database."""
+        return await self._run(self.db.read, key)
+
+    async def read_section(self, key: str, section: str) -> Optional[Any]:
+        """Read a single section of an entry from the database."""
+        return await self._run(self.db.read_section, key, section)
+
+    async def write_section(self, key: str, section: str, section_value: Any) -> bool:
+        """Update a single section of an existing entry in the database."""
+        return await self._run(self.db.write_section, key, section, section_value)
+
+    async def update(self, key: str, value: Any) -> bool:
+        """Update an entry in the database."""
+        return await self._run(self.db.update, key, value)
+
+    async def delete(self, key: str) -> bool:
+        """Delete an entry from the database."""
+        return await self._run(self.db.delete, key)
+
+    async def find_by_input_hash(self, hashed: str) -> Optional[str]:
+        """Find the latest complete entry generated from inputs with this hash."""
+        return await self._run(self.db.find_by_input_hash, hashed)
+
+    async def list_all(self) -> Dict:
+        """List all entries in the database."""
+        return await self._run(self.db.list_all)
+
+    async def iter_items(
+        self, after: Optional[str] = None, limit: Optional[int] = None, batch_size: int = 50
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Iterate over entries, reading `batch_size` of them at a time on the I/O pool.
+
+        Args:
+            after (str, optional): Only yield entries that come after this key
+            limit (int, optional): Maximum number of entries to yield
+            batch_size (int): Number of entries read per trip to the I/O pool
+        """
+        items = self.db.iter_items(after)
+        remaining = limit
+        try:
+            while remaining is None or remaining > 0:
+                size = batch_size if remaining is None else min(batch_size, remaining)
+                batch = await self._run(lambda: list(islice(items, size)))
+                for item in batch:
+                    yield item
+                if len(batch) < size:
+                    return
+                if remaining is not None:
+                    remaining -= len(batch)
+        finally:
+            await self._run(items.close)
+
+    async def clear(self) -> None:
+        """Clear all entries in the database."""
+        await self._run(self.db.clear)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get statistics about the database and its I/O pool."""
+        return {**self.db.stats(), "io_threads": self.io_threads}
+
+    def close(self) -> None:
+        """Wait for pending I/O and close the database."""
+        self._executor.shutdown(wait=True)
+        self.db.close()
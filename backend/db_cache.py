@@ -0,0 +1,193 @@
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+from db import JsonDB
+
+_MISSING = object()
+
+
+class _CachedEntry:
+    def __init__(self) -> None:
+        self.value: Any = _MISSING
+        self.sections: Dict[str, Any] = {}
+
+
+class CachedJsonDB:
+    """Write-through LRU cache in front of any JsonDB backend.
+
+    Whole entries and individual sections are cached per key, with at most
+    `max_entries` keys kept. Writes go to the backend first and then replace
+    the cached copy. Before every lookup the backend's `generation()` token is
+    compared with the one seen last, and the whole cache is dropped when
+    another process has changed the store underneath it.
+
+    Values are deep-copied on the way in and out so callers can mutate what
+    they get back without corrupting the cache.
+    """
+
+    def __init__(self, db: JsonDB, max_entries: int = 256):
+        self.db = db
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _CachedEntry]" = OrderedDict()
+        self._generation: Optional[Hashable] = db.generation()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # Backend-specific helpers (e.g. compact) pass straight through
+        return getattr(self.db, name)
+
+    def _check_generation(self) -> Hashable:
+        """Drop the cache if the store has changed since it was last seen."""
+        generation = self.db.generation()
+        with self._lock:
+            if generation != self._generation:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._generation = generation
+        return generation
+
+    def _entry(self, key: str) -> _CachedEntry:
+        """Get or add the cache entry for a key, evicting the least recently used keys."""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _CachedEntry()
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, generation: Hashable, value: Any, section: Optional[str] = None) -> None:
+        with self._lock:
+            if generation != self._generation:
+                # The store changed while the value was loaded
+                return
+            entry = self._entry(key)
+            if section is None:
+                entry.value = copy.deepcopy(value)
+                entry.sections.clear()
+            else:
+                entry.sections[section] = copy.deepcopy(value)
+
+    def _after_write(self, key: str, value: Any = _MISSING) -> None:
+        """Refresh the generation after our own write and cache the written value."""
+        generation = self.db.generation()
+        with self._lock:
+            self._generation = generation
+            self._entries.pop(key, None)
+        if value is not _MISSING:
+            self._store(key, generation, value)
+
+    def read(self, key: str) -> Optional[Any]:
+        """Read an entry, from the cache when possible."""
+        generation = self._check_generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.value is not _MISSING:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry.value)
+            self.misses += 1
+
+        value = self.db.read(key)
+        if value is not None:
+            self._store(key, generation, value)
+        return value
+
+    def read_section(self, key: str, section: str) -> Optional[Any]:
+        """Read a single section of an entry, from the cache when possible."""
+        generation = self._check_generation()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.value is not _MISSING:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(entry.value.get(section)) if isinstance(entry.value, dict) else None
+                if section in entry.sections:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(entry.sections[section])
+            self.misses += 1
+
+        value = self.db.read_section(key, section)
+        if value is not None:
+            self._store(key, generation, value, section)
+        return value
+
+    def create(self, key: str, value: Any) -> bool:
+        """Create a new entry and cache it."""
+        self._check_generation()
+        created = self.db.create(key, value)
+        if created:
+            self._after_write(key, value)
+        return created
+
+    def update(self, key: str, value: Any) -> bool:
+        """Update an entry and cache the new value."""
+        self._check_generation()
+        updated = self.db.update(key, value)
+        if updated:
+            self._after_write(key, value)
+        return updated
+
+    def write_section(self, key: str, section: str, section_value: Any) -> bool:
+        """Update a single section of an entry and drop the cached entry."""
+        self._check_generation()
+        written = self.db.write_section(key, section, section_value)
+        if written:
+            self._after_write(key)
+        return written
+
+    def delete(self, key: str) -> bool:
+        """Delete an entry and drop it from the cache."""
+        self._check_generation()
+        deleted = self.db.delete(key)
+        if deleted:
+            self._after_write(key)
+        return deleted
+
+    def delete_many(self, keys: List[str]) -> int:
+        """Delete several entries and drop them from the cache."""
+        self._check_generation()
+        deleted = self.db.delete_many(keys)
+        for key in keys:
+            self._after_write(key)
+        return deleted
+
+    def list_all(self) -> Dict:
+        """List all entries, always from the backend."""
+        return self.db.list_all()
+
+    def clear(self) -> None:
+        """Clear the backend and the cache."""
+        self.db.clear()
+        with self._lock:
+            self._entries.clear()
+            self._generation = self.db.generation()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Backend stats plus cache hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            cache_stats = {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+        return {**self.db.stats(), "cache": cache_stats}
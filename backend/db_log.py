@@ -0,0 +1,413 @@
+import fcntl
+import logging
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from db import JsonDB, decode_value, encode_value
+
+# Record framing: crc32, value length, op, key length, followed by the key and value bytes
+_HEADER = struct.Struct(">IIBH")
+_PUT = 1
+_DELETE = 2
+
+# (file name, offset, record length)
+Location = Tuple[str, int, int]
+
+logger = logging.getLogger(__name__)
+
+
+class LogJsonDB(JsonDB):
+    """JsonDB stored as append-only log segments.
+
+    Every write appends one record to the active segment and updates an
+    in-memory index of key -> record location, so the cost of a write depends
+    on the size of the record rather than the size of the store. Records that
+    have been overwritten or deleted are reclaimed by a background compaction
+    thread that copies the live records into a `.compacted` file.
+
+    The index only lives in memory, so a store can be open in one process at
+    a time; opening it while another process holds it raises RuntimeError.
+
+    Layout of `.data/<db_name>.log/`:
+        - `<id>.seg`: log segments, replayed in id order
+        - `<id>.compacted`: live records of every segment up to and including `<id>`
+    """
+
+    def __init__(
+        self,
+        db_name: str,
+        segment_size: int = 64 * 1024 * 1024,
+        compaction_ratio: float = 0.5,
+        compaction_min_bytes: int = 1024 * 1024,
+        compaction_interval: float = 30.0,
+        codec: str = "json",
+    ):
+        self.codec = codec
+        self.segment_size = segment_size
+        self.compaction_ratio = compaction_ratio
+        self.compaction_min_bytes = compaction_min_bytes
+        self.compaction_interval = compaction_interval
+        super().__init__(db_name)
+
+    def _open(self) -> None:
+        """Replay the log into the index and start the compaction thread."""
+        self.log_dir = self.data_dir / f"{self.db_name}.log"
+        self.log_dir.mkdir(exist_ok=True)
+        self._lock_process()
+        self._lock = threading.RLock()
+        self._compaction_lock = threading.Lock()
+        self._index: Dict[str, Location] = {}
+        self._fds: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._live_bytes = 0
+        self._active_id = 0
+        self._active_file: Optional[BinaryIO] = None
+        self._active_size = 0
+        # Input hash index, built on the first lookup
+        self._reset_hash_index(None)
+        self._load()
+
+        self._closed = threading.Event()
+        self._compaction_requested = threading.Event()
+        self._compactor = threading.Thread(
+            target=self._compaction_loop, name=f"{self.db_name}-compactor", daemon=True
+        )
+        self._compactor.start()
+
+    def _lock_process(self) -> None:
+        """Hold an exclusive lock on the store until `close`, failing if another process holds it."""
+        self._process_lock = open(self.data_dir / f"{self.db_name}.log.lock", "a")
+        try:
+            fcntl.flock(self._process_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._process_lock.close()
+            raise RuntimeError(
+                f"{self.log_dir} is open in another process; the log backend needs a store per process"
+            )
+
+    # Log files
+
+    def _load(self) -> None:
+        """Rebuild the index from the latest compacted file and the segments after it."""
+        for tmp in self.log_dir.glob("*.tmp"):
+            tmp.unlink()
+
+        base_id = 0
+        files: List[Path] = []
+        compacted = sorted(self.log_dir.glob("*.compacted"))
+        if compacted:
+            base_id = int(compacted[-1].stem)
+            for stale in compacted[:-1]:
+                stale.unlink()
+            files.append(compacted[-1])
+
+        for segment in sorted(self.log_dir.glob("*.seg")):
+            if int(segment.stem) <= base_id:
+                # Already folded into the compacted file
+                segment.unlink()
+            else:
+                files.append(segment)
+
+        for path in files:
+            self._replay(path)
+
+        segments = [path for path in files if path.suffix == ".seg"]
+        if segments:
+            self._open_segment(int(segments[-1].stem))
+        else:
+            self._open_segment(base_id + 1)
+
+    def _replay(self, path: Path) -> None:
+        """Apply every record in a log file to the index."""
+        offset = 0
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                checksum, value_length, op, key_length = _HEADER.unpack(header)
+                body = f.read(key_length + value_length)
+                if len(body) < key_length + value_length or zlib.crc32(bytes([op]) + body) != checksum:
+                    break
+                key = body[:key_length].decode("utf-8")
+                length = _HEADER.size + key_length + value_length
+                self._apply(op, key, (path.name, offset, length))
+                self._total_bytes += length
+                offset += length
+
+        if offset < path.stat().st_size:
+            # Torn write from a crash: drop the incomplete tail so appends stay readable
+            logger.warning("Truncating corrupt tail of %s at offset %d", path, offset)
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+
+    def _apply(self, op: int, key: str, location: Location) -> None:
+        """Point the index at a newly written record."""
+        previous = self._index.get(key)
+        if previous is not None:
+            self._live_bytes -= previous[2]
+        if op == _PUT:
+            self._index[key] = location
+            self._live_bytes += location[2]
+        else:
+            self._index.pop(key, None)
+
+    def _open_segment(self, segment_id: int) -> None:
+        """Make `segment_id` the active segment that receives appends."""
+        if self._active_file is not None:
+            self._active_file.close()
+        path = self.log_dir / f"{segment_id:08d}.seg"
+        self._active_id = segment_id
+        self._active_name = path.name
+        self._active_file = open(path, "ab")
+        self._active_size = path.stat().st_size
+
+    def _fd(self, name: str) -> int:
+        """Get a cached read-only descriptor for a log file."""
+        fd = self._fds.get(name)
+        if fd is None:
+            fd = os.open(self.log_dir / name, os.O_RDONLY)
+            self._fds[name] = fd
+        return fd
+
+    def _close_fd(self, name: str) -> None:
+        fd = self._fds.pop(name, None)
+        if fd is not None:
+            os.close(fd)
+
+    def _append(self, op: int, key: str, value: bytes = b"") -> None:
+        """Append a record to the active segment and update the index."""
+        key_bytes = key.encode("utf-8")
+        body = key_bytes + value
+        header = _HEADER.pack(zlib.crc32(bytes([op]) + body), len(value), op, len(key_bytes))
+        record = header + body
+
+        location = (self._active_name, self._active_size, len(record))
+        self._active_file.write(record)
+        self._active_file.flush()
+        self._active_size += len(record)
+        self._total_bytes += len(record)
+        self._apply(op, key, location)
+
+        if self._active_size >= self.segment_size:
+            self._open_segment(self._active_id + 1)
+        if self._needs_compaction():
+            self._compaction_requested.set()
+
+    def _read_record(self, location: Location) -> bytes:
+        name, offset, length = location
+        return os.pread(self._fd(name), length, offset)
+
+    def _encode(self, value: Any) -> bytes:
+        return encode_value(value, self.codec)
+
+    @staticmethod
+    def _decode(record: bytes) -> Any:
+        _, _, _, key_length = _HEADER.unpack_from(record)
+        return decode_value(record[_HEADER.size + key_length:])
+
+    # Public API
+
+    def create(self, key: str, value: Any) -> bool:
+        """Create a new entry in the database."""
+        with self._lock:
+            if key in self._index:
+                return False
+            self._append(_PUT, key, self._encode(value))
+            self._track_hash(key, value)
+            return True
+
+    def read(self, key: str) -> Optional[Any]:
+        """Read an entry from the database."""
+        with self._lock:
+            location = self._index.get(key)
+            if location is None:
+                return None
+            record = self._read_record(location)
+        return self._decode(record)
+
+    def delete_many(self, keys: List[str]) -> int:
+        """Delete several entries. Returns the number deleted."""
+        return sum(self.delete(key) for key in keys)
+
+    def storage_bytes(self) -> int:
+        """Total size of all log files."""
+        with self._lock:
+            return self._total_bytes
+
+    def write_section(self, key: str, section: str, section_value: Any) -> bool:
+        """Update a single section of an existing entry in the database."""
+        with self._lock:
+            return self._write_section_by_update(key, section, section_value)
+
+    def update(self, key: str, value: Any) -> bool:
+        """Update an entry in the database."""
+        with self._lock:
+            if key not in self._index:
+                return False
+            self._append(_PUT, key, self._encode(value))
+            self._track_hash(key, value)
+            return True
+
+    def delete(self, key: str) -> bool:
+        """Delete an entry from the database."""
+        with self._lock:
+            if key not in self._index:
+                return False
+            self._append(_DELETE, key)
+            self._track_hash(key)
+            return True
+
+    def find_by_input_hash(self, hashed: str) -> Optional[str]:
+        """Find the latest complete entry with this `input_hash` in the in-memory hash index."""
+        with self._lock:
+            if self._hashes is None:
+                self._reset_hash_index({})
+                for key, location in self._index.items():
+                    self._track_hash(key, self._decode(self._read_record(location)))
+            return self._latest_with_hash(hashed)
+
+    def list_all(self) -> Dict:
+        """List all entries in the database."""
+        with self._lock:
+            records = [(key, self._read_record(location)) for key, location in self._index.items()]
+        return {key: self._decode(record) for key, record in records}
+
+    def iter_items(self, after: Optional[str] = None) -> Iterator[Tuple[str, Any]]:
+        """Iterate over entries in order of creation, reading one record at a time."""
+        with self._lock:
+            keys = list(self._index)
+        if after is not None:
+            keys = keys[keys.index(after) + 1:] if after in keys else []
+        for key in keys:
+            value = self.read(key)
+            if value is not None:
+                yield key, value
+
+    def clear(self) -> None:
+        """Clear all entries in the database."""
+        with self._compaction_lock, self._lock:
+            next_id = self._active_id + 1
+            self._active_file.close()
+            self._active_file = None
+            for name in list(self._fds):
+                self._close_fd(name)
+            for path in self.log_dir.iterdir():
+                path.unlink()
+            self._index.clear()
+            self._reset_hash_index(None)
+            self._total_bytes = 0
+            self._live_bytes = 0
+            self._open_segment(next_id)
+
+    def close(self) -> None:
+        """Stop the compaction thread and close all log files."""
+        self._closed.set()
+        self._compaction_requested.set()
+        self._compactor.join()
+        with self._lock:
+            if self._active_file is not None:
+                self._active_file.close()
+                self._active_file = None
+            for name in list(self._fds):
+                self._close_fd(name)
+        if not self._process_lock.closed:
+            fcntl.flock(self._process_lock, fcntl.LOCK_UN)
+            self._process_lock.close()
+
+    def generation(self) -> Hashable:
+        """Position of the end of the log, which moves on every write."""
+        with self._lock:
+            return (self._active_name, self._active_size)
+
+    def stats(self) -> Dict[str, Any]:
+        """Log size and garbage statistics."""
+        with self._lock:
+            return {
+                **super().stats(),
+                "codec": self.codec,
+                "entries": len(self._index),
+                "total_bytes": self._total_bytes,
+                "live_bytes": self._live_bytes,
+            }
+
+    # Compaction
+
+    def _needs_compaction(self) -> bool:
+        garbage = self._total_bytes - self._live_bytes
+        return garbage >= self.compaction_min_bytes and garbage >= self.compaction_ratio * self._total_bytes
+
+    def _compaction_loop(self) -> None:
+        while not self._closed.is_set():
+            self._compaction_requested.wait(self.compaction_interval)
+            self._compaction_requested.clear()
+            if self._closed.is_set():
+                break
+            with self._lock:
+                needs_compaction = self._needs_compaction()
+            if needs_compaction:
+                try:
+                    self.compact()
+                except Exception:
+                    logger.exception("Log compaction failed for %s", self.db_name)
+
+    def compact(self) -> int:
+        """Copy live records out of all sealed log files and delete them.
+
+        Writes keep going to a fresh active segment while the sealed files are
+        rewritten, so only the final index swap holds the write lock.
+
+        Returns:
+            int: Number of bytes reclaimed
+        """
+        with self._compaction_lock:
+            with self._lock:
+                if self._total_bytes == self._live_bytes:
+                    # No overwritten or deleted records to reclaim
+                    return 0
+                self._open_segment(self._active_id + 1)
+                base_id = self._active_id - 1
+                sealed = [path for path in self.log_dir.iterdir() if path.name != self._active_name]
+                fds = {path.name: self._fd(path.name) for path in sealed}
+                snapshot = {
+                    key: location
+                    for key, location in self._index.items()
+                    if location[0] != self._active_name
+                }
+
+            target = self.log_dir / f"{base_id:08d}.compacted"
+            tmp = self.log_dir / f"{base_id:08d}.compacted.tmp"
+            moved: Dict[str, Location] = {}
+            offset = 0
+            with open(tmp, "wb") as out:
+                for key, (name, record_offset, length) in snapshot.items():
+                    # Sealed files are only ever closed by compaction, so these reads need no lock
+                    record = os.pread(fds[name], length, record_offset)
+                    out.write(record)
+                    moved[key] = (target.name, offset, len(record))
+                    offset += len(record)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp, target)
+
+            with self._lock:
+                reclaimed = 0
+                for path in sealed:
+                    if path.name == target.name:
+                        continue
+                    reclaimed += path.stat().st_size
+                    self._close_fd(path.name)
+                    path.unlink()
+                self._close_fd(target.name)
+
+                for key, location in moved.items():
+                    if self._index.get(key) == snapshot[key]:
+                        self._index[key] = location
+                self._total_bytes += offset - reclaimed
+                # Records overwritten or deleted during the copy are now garbage in the compacted file
+                self._live_bytes = sum(location[2] for location in self._index.values())
+                return reclaimed - offset
@@ -0,0 +1,194 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from db import JsonDB, encode_value
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionPolicy(BaseModel):
+    """Limits on how much generated content the store keeps.
+
+    Entries are evicted oldest first, by their `timestamp`. A limit of None is
+    not enforced.
+    """
+    ttl_seconds: Optional[float] = None
+    max_entries: Optional[int] = None
+    max_bytes: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return any(limit is not None for limit in (self.ttl_seconds, self.max_entries, self.max_bytes))
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        """Build a policy from the MARKETMIND_RETENTION_* environment variables."""
+        ttl_days = os.getenv("MARKETMIND_RETENTION_TTL_DAYS")
+        max_entries = os.getenv("MARKETMIND_RETENTION_MAX_ENTRIES")
+        max_bytes = os.getenv("MARKETMIND_RETENTION_MAX_BYTES")
+        return cls(
+            ttl_seconds=float(ttl_days) * 86400 if ttl_days else None,
+            max_entries=int(max_entries) if max_entries else None,
+            max_bytes=int(max_bytes) if max_bytes else None,
+        )
+
+
+class RetentionReport(BaseModel):
+    evicted: int
+    bytes_reclaimed: int
+    seconds: float
+    finished_at: str
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    if not isinstance(value, dict) or not isinstance(value.get("timestamp"), str):
+        return None
+    try:
+        return datetime.fromisoformat(value["timestamp"]).timestamp()
+    except ValueError:
+        return None
+
+
+def select_evictions(db: JsonDB, policy: RetentionPolicy, now: Optional[float] = None) -> List[str]:
+    """Pick the keys a policy evicts, oldest first.
+
+    Entries without a readable timestamp are never evicted. For `max_bytes`,
+    the store's real size on disk is shared out over the entries in
+    proportion to their size in the backend's codec.
+
+    Args:
+        db (JsonDB): Database to scan
+        policy (RetentionPolicy): Limits to enforce
+        now (float, optional): Current time as a Unix timestamp. Defaults to `time.time()`.
+
+    Returns:
+        List[str]: Keys to delete
+    """
+    now = time.time() if now is None else now
+    # (timestamp, key, encoded size) of every entry that can be evicted
+    candidates: List[Tuple[float, str, int]] = []
+    kept_entries = 0
+    kept_bytes = 0
+    codec = getattr(db, "codec", "json")
+    for key, value in db.iter_items():
+        size = len(encode_value(value, codec))
+        timestamp = _timestamp(value)
+        if timestamp is None:
+            kept_entries += 1
+            kept_bytes += size
+        else:
+            candidates.append((timestamp, key, size))
+    candidates.sort()
+
+    expired = 0
+    if policy.ttl_seconds is not None:
+        cutoff = now - policy.ttl_seconds
+        while expired < len(candidates) and candidates[expired][0] < cutoff:
+            expired += 1
+    evicted = [key for _, key, _ in candidates[:expired]]
+    candidates = candidates[expired:]
+
+    total_entries = kept_entries + len(candidates)
+    encoded_bytes = kept_bytes + sum(size for _, _, size in candidates)
+    total_bytes = encoded_bytes
+    scale = 1.0
+    if policy.max_bytes is not None and encoded_bytes:
+        total_bytes = db.storage_bytes()
+        scale = total_bytes / encoded_bytes
+    for _, key, size in candidates:
+        over_entries = policy.max_entries is not None and total_entries > policy.max_entries
+        over_bytes = policy.max_bytes is not None and total_bytes > policy.max_bytes
+        if not (over_entries or over_bytes):
+            break
+        evicted.append(key)
+        total_entries -= 1
+        total_bytes -= size * scale
+    return evicted
+
+
+def apply_retention(db: JsonDB, policy: RetentionPolicy) -> RetentionReport:
+    """Evict entries beyond the policy's limits and compact the store.
+
+    The store is only compacted when entries were evicted, or before
+    selecting evictions when it is over `max_bytes`, so that space held by
+    overwritten records is reclaimed before live entries are evicted for it.
+
+    Args:
+        db (JsonDB): Database to clean up
+        policy (RetentionPolicy): Limits to enforce
+
+    Returns:
+        RetentionReport: What was evicted and how much disk space it freed
+    """
+    start = time.perf_counter()
+    before = db.storage_bytes()
+    if policy.max_bytes is not None and before > policy.max_bytes:
+        db.compact()
+    keys = select_evictions(db, policy)
+    evicted = db.delete_many(keys) if keys else 0
+    if evicted:
+        db.compact()
+    return RetentionReport(
+        evicted=evicted,
+        bytes_reclaimed=max(before - db.storage_bytes(), 0),
+        seconds=time.perf_counter() - start,
+        finished_at=datetime.now().isoformat(),
+    )
+
+
+class RetentionCompactor:
+    """Background thread that applies a retention policy every `interval` seconds."""
+
+    def __init__(self, db: JsonDB, policy: RetentionPolicy, interval: float = 3600.0):
+        self.db = db
+        self.policy = policy
+        self.interval = interval
+        self.runs = 0
+        self.total_evicted = 0
+        self.total_bytes_reclaimed = 0
+        self.last_report: Optional[RetentionReport] = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"{db.db_name}-retention", daemon=True)
+
+    def start(self) -> "RetentionCompactor":
+        self._thread.start()
+        return self
+
+    def _loop(self) -> None:
+        while not self._stopped.is_set():
+            self.run_once()
+            self._stopped.wait(self.interval)
+
+    def run_once(self) -> Optional[RetentionReport]:
+        """Apply the policy now. Returns None if the pass failed."""
+        try:
+            report = apply_retention(self.db, self.policy)
+        except Exception:
+            logger.exception("Retention pass failed for %s", self.db.db_name)
+            return None
+        self.runs += 1
+        self.total_evicted += report.evicted
+        self.total_bytes_reclaimed += report.bytes_reclaimed
+        self.last_report = report
+        return report
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy.model_dump(),
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "total_evicted": self.total_evicted,
+            "total_bytes_reclaimed": self.total_bytes_reclaimed,
+            "last_report": self.last_report.model_dump() if self.last_report else None,
+        }
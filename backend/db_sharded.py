@@ -0,0 +1,277 @@
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from db import SECTIONS, JsonDB, decode_value, encode_value, input_hash, join_sections, split_sections
+
+META_FILE = "meta.json"
+# Touched on every write so other processes can tell the store has changed
+GENERATION_FILE = ".generation"
+# Index of complete entries by the hash of their inputs
+HASH_INDEX_DIR = ".hashes"
+
+
+class ShardedJsonDB(JsonDB):
+    """JsonDB that stores each entry as a directory with one file per section.
+
+    Entries that are dictionaries have every key listed in `SECTIONS` written to
+    its own `<section>.json` file and the remaining fields to `meta.json`, so
+    `read_section` only loads and parses the section being asked for.
+
+    Layout of `.data/<db_name>.sharded/<key>/`:
+        - `meta.json`: everything that is not a section
+        - `<section>.json`: one file per section present in the entry, encoded with `codec`
+
+    Complete entries are also indexed by the hash of their inputs in
+    `.hashes/<input hash>/<key>`, a file holding the entry's timestamp, so
+    `find_by_input_hash` only reads the entries with that hash.
+    """
+
+    def __init__(self, db_name: str, codec: str = "json"):
+        self.codec = codec
+        super().__init__(db_name)
+
+    def _open(self) -> None:
+        """Create the shard directory for this database."""
+        self.shard_dir = self.data_dir / f"{self.db_name}.sharded"
+        self.shard_dir.mkdir(exist_ok=True)
+        self._lock = threading.RLock()
+        self._writes = 0
+        self._generation_file = self.shard_dir / GENERATION_FILE
+        self._generation_file.touch()
+        self.hash_dir = self.shard_dir / HASH_INDEX_DIR
+        if not self.hash_dir.exists():
+            self._build_hash_index()
+
+    def _build_hash_index(self) -> None:
+        """Index the entries of a store created before the input hash index existed."""
+        tmp = self.shard_dir / f"{HASH_INDEX_DIR}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        for entry in os.scandir(self.shard_dir):
+            if not entry.name.startswith("."):
+                entry_dir = self.shard_dir / entry.name
+                self._mark(entry.name, entry_dir, self._fields(entry_dir), tmp)
+        try:
+            os.rename(tmp, self.hash_dir)
+        except OSError:
+            # Another process built the index first
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _bump_generation(self) -> None:
+        self._writes += 1
+        os.utime(self._generation_file)
+
+    def generation(self) -> Hashable:
+        """Write counter of this process plus the modification time of the generation file."""
+        return (self._writes, self._generation_file.stat().st_mtime_ns)
+
+    def _entry_dir(self, key: str) -> Optional[Path]:
+        """Get the directory of an entry, or None if the key cannot be used as a directory name."""
+        if not key or key.startswith(".") or "/" in key or os.sep in key:
+            return None
+        return self.shard_dir / key
+
+    @staticmethod
+    def _read_file(path: Path) -> Optional[Any]:
+        try:
+            with open(path, "rb") as f:
+                return decode_value(f.read())
+        except FileNotFoundError:
+            return None
+
+    def _write_file(self, path: Path, value: Any) -> None:
+        """Write a file atomically so readers never see a partial section."""
+        codec = "json" if path.name == META_FILE else self.codec
+        tmp = path.with_name(f".{path.name}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(encode_value(value, codec))
+        os.replace(tmp, path)
+
+    def _fields(self, entry_dir: Path) -> Dict:
+        """Fields of an entry other than its sections, or nothing if it is not a dictionary."""
+        meta = self._read_file(entry_dir / META_FILE)
+        return meta.get("fields", {}) if isinstance(meta, dict) else {}
+
+    def _hash_marker(self, key: str, fields: Dict, hash_dir: Optional[Path] = None) -> Optional[Path]:
+        if "product_info" not in fields:
+            return None
+        hashed = input_hash(fields["product_info"], fields.get("company_info", ""))
+        return (hash_dir or self.hash_dir) / hashed / key
+
+    def _mark(self, key: str, entry_dir: Path, fields: Dict, hash_dir: Optional[Path] = None) -> None:
+        """Add an entry to the input hash index if every section file exists."""
+        marker = self._hash_marker(key, fields, hash_dir)
+        if marker is None or not all((entry_dir / f"{section}.json").exists() for section in SECTIONS):
+            return
+        marker.parent.mkdir(exist_ok=True)
+        marker.write_text(str(fields.get("timestamp") or ""))
+
+    def _unmark(self, key: str, fields: Dict) -> None:
+        """Remove an entry from the input hash index, before it is changed or deleted."""
+        marker = self._hash_marker(key, fields)
+        if marker is not None:
+            try:
+                marker.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _write_entry(self, entry_dir: Path, value: Any) -> None:
+        meta, sections = split_sections(value)
+        self._write_file(entry_dir / META_FILE, meta)
+        for section in SECTIONS:
+            path = entry_dir / f"{section}.json"
+            # A null section has no file, so an entry is complete once every section file exists
+            if sections.get(section) is not None:
+                self._write_file(path, sections[section])
+            elif path.exists():
+                path.unlink()
+
+    def _read_entry(self, entry_dir: Path) -> Optional[Any]:
+        meta = self._read_file(entry_dir / META_FILE)
+        if meta is None:
+            return None
+        sections = {}
+        if "fields" in meta:
+            for section in SECTIONS:
+                section_value = self._read_file(entry_dir / f"{section}.json")
+                if section_value is not None:
+                    sections[section] = section_value
+        return join_sections(meta, sections)
+
+    def create(self, key: str, value: Any) -> bool:
+        """Create a new entry in the database."""
+        entry_dir = self._entry_dir(key)
+        if entry_dir is None:
+            return False
+        with self._lock:
+            try:
+                entry_dir.mkdir()
+            except FileExistsError:
+                return False
+            self._write_entry(entry_dir, value)
+            self._mark(key, entry_dir, self._fields(entry_dir))
+            self._bump_generation()
+            return True
+
+    def read(self, key: str) -> Optional[Any]:
+        """Read an entry from the database."""
+        entry_dir = self._entry_dir(key)
+        if entry_dir is None:
+            return None
+        return self._read_entry(entry_dir)
+
+    def read_section(self, key: str, section: str) -> Optional[Any]:
+        """Read a single section of an entry without loading the rest of it."""
+        entry_dir = self._entry_dir(key)
+        if entry_dir is None:
+            return None
+        if section not in SECTIONS:
+            return super().read_section(key, section)
+        return self._read_file(entry_dir / f"{section}.json")
+
+    def write_section(self, key: str, section: str, section_value: Any) -> bool:
+        """Update a single section of an existing entry without rewriting the rest of it."""
+        entry_dir = self._entry_dir(key)
+        if entry_dir is None:
+            return False
+        if section not in SECTIONS:
+            with self._lock:
+                return self._write_section_by_update(key, section, section_value)
+        with self._lock:
+            meta = self._read_file(entry_dir / META_FILE)
+            if meta is None or "fields" not in meta:
+                return False
+            path = entry_dir / f"{section}.json"
+            if section_value is not None:
+                self._write_file(path, section_value)
+                self._mark(key, entry_dir, meta["fields"])
+            elif path.exists():
+                self._unmark(key, meta["fields"])
+                path.unlink()
+            self._bump_generation()
+            return True
+
+    def update(self, key: str, value: Any) -> bool:
+        """Update an entry in the database."""
+        entry_dir = self._entry_dir(key)
+        if entry_dir is None:
+            return False
+        with self._lock:
+            if not (entry_dir / META_FILE).exists():
+                return False
+            self._unmark(key, self._fields(entry_dir))
+            self._write_entry(entry_dir, value)
+            self._mark(key, entry_dir, self._fields(entry_dir))
+            self._bump_generation()
+            return True
+
+    def delete(self, key: str) -> bool:
+        """Delete an entry from the database."""
+        entry_dir = self._entry_dir(key)
+        if entry_dir is None:
+            return False
+        with self._lock:
+            if not entry_dir.exists():
+                return False
+            self._unmark(key, self._fields(entry_dir))
+            shutil.rmtree(entry_dir)
+            self._bump_generation()
+            return True
+
+    def delete_many(self, keys: List[str]) -> int:
+        """Delete several entries. Returns the number deleted."""
+        return sum(self.delete(key) for key in keys)
+
+    def storage_bytes(self) -> int:
+        """Total size of all shard files."""
+        return sum(path.stat().st_size for path in self.shard_dir.rglob("*") if path.is_file())
+
+    def compact(self) -> int:
+        """Deleting an entry removes its files right away, so there is nothing to reclaim."""
+        return 0
+
+    def find_by_input_hash(self, hashed: str) -> Optional[str]:
+        """Find the latest complete entry with this `input_hash` from the index.
+
+        Entries are ordered by their `timestamp` field, then by key.
+        """
+        if not hashed.isalnum():
+            return None
+        try:
+            markers = list(os.scandir(self.hash_dir / hashed))
+        except FileNotFoundError:
+            return None
+        found: Optional[Tuple[str, str]] = None
+        for marker in markers:
+            try:
+                candidate = (Path(marker.path).read_text(), marker.name)
+            except FileNotFoundError:
+                continue
+            if found is None or candidate > found:
+                found = candidate
+        return None if found is None else found[1]
+
+    def list_all(self) -> Dict:
+        """List all entries in the database, ordered by key."""
+        return dict(self.iter_items())
+
+    def iter_items(self, after: Optional[str] = None) -> Iterator[Tuple[str, Any]]:
+        """Iterate over entries ordered by key, reading one entry at a time."""
+        for name in sorted(entry.name for entry in os.scandir(self.shard_dir)):
+            if name.startswith(".") or (after is not None and name <= after):
+                continue
+            value = self._read_entry(self.shard_dir / name)
+            if value is not None:
+                yield name, value
+
+    def clear(self) -> None:
+        """Clear all entries in the database."""
+        with self._lock:
+            for entry_dir in self.shard_dir.iterdir():
+                if entry_dir.is_dir():
+                    shutil.rmtree(entry_dir)
+            self.hash_dir.mkdir()
+            self._bump_generation()
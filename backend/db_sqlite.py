@@ -0,0 +1,343 @@
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from db import CODECS, SECTIONS, JsonDB, decode_value, encode_value, input_hash, is_complete, join_sections, split_sections
+
+logger = logging.getLogger(__name__)
+
+# `seq` orders entries by creation; unlike the implicit rowid, VACUUM never renumbers it
+_ENTRIES_TABLE = """
+CREATE TABLE IF NOT EXISTS {name} (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_id TEXT NOT NULL UNIQUE,
+    timestamp TEXT,
+    input_hash TEXT,
+    meta TEXT NOT NULL,
+    complete INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+_SCHEMA = _ENTRIES_TABLE.format(name="entries") + """;
+CREATE TABLE IF NOT EXISTS sections (
+    content_id TEXT NOT NULL REFERENCES entries (content_id) ON DELETE CASCADE,
+    section TEXT NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (content_id, section)
+) WITHOUT ROWID;
+"""
+
+# Created once the entries table has its current columns
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS entries_timestamp ON entries (timestamp);
+CREATE INDEX IF NOT EXISTS entries_input_hash_complete ON entries (input_hash, complete);
+"""
+
+# PRAGMA user_version once the legacy JSON file has been imported
+_MIGRATED_VERSION = 1
+
+# A section stored as null, in every codec, does not count towards completing an entry
+_NULL_VALUES = tuple(encode_value(None, codec) for codec in CODECS)
+
+
+class SqliteJsonDB(JsonDB):
+    """JsonDB backed by a SQLite database in WAL mode.
+
+    Metadata lives in the `entries` table with indexed `timestamp` and
+    `input_hash` columns, a `complete` flag set once every section is
+    filled in and a `seq` number giving the order of creation, and each section of an entry is a row in the
+    `sections` table, so point lookups and single-section reads never parse
+    the rest of the store. WAL mode lets any number of readers, including
+    other uvicorn workers, run alongside a writer.
+
+    Section values are stored with `codec`. On first use, entries from the
+    legacy `.data/<db_name>.json` file are imported once; if that file cannot
+    be read, opening the database fails and the import is tried again on the
+    next start.
+    """
+
+    def __init__(self, db_name: str, codec: str = "json"):
+        self.codec = codec
+        super().__init__(db_name)
+
+    def _open(self) -> None:
+        """Create the schema and import the legacy JSON file if needed."""
+        self.db_path = self.data_dir / f"{self.db_name}.sqlite3"
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._writes = 0
+        self._conn().executescript(_SCHEMA)
+        self._migrate_entries()
+        self._conn().executescript(_INDEXES)
+
+        legacy_file = self.data_dir / f"{self.db_name}.json"
+        with self._transaction() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < _MIGRATED_VERSION:
+                if legacy_file.exists():
+                    count = self._import_json(conn, legacy_file)
+                    logger.info("Migrated %d entries from %s to %s", count, legacy_file, self.db_path)
+                conn.execute(f"PRAGMA user_version = {_MIGRATED_VERSION}")
+
+    def _migrate_entries(self) -> None:
+        """Rebuild an entries table from before the `seq` and `complete` columns, keeping its order."""
+        conn = self._conn()
+        # Dropping the old table must not cascade to the sections; the pragma only applies outside a transaction
+        conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            with self._transaction() as conn:
+                columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+                if "seq" in columns:
+                    return
+                conn.execute(_ENTRIES_TABLE.format(name="entries_rebuilt"))
+                conn.execute(
+                    "INSERT INTO entries_rebuilt (seq, content_id, timestamp, input_hash, meta) "
+                    "SELECT rowid, content_id, timestamp, input_hash, meta FROM entries ORDER BY rowid"
+                )
+                conn.execute("DROP TABLE entries")
+                conn.execute("ALTER TABLE entries_rebuilt RENAME TO entries")
+                for (key,) in conn.execute("SELECT content_id FROM entries").fetchall():
+                    self._update_complete(conn, key)
+        finally:
+            conn.execute("PRAGMA foreign_keys = ON")
+
+    def _update_complete(self, conn: sqlite3.Connection, key: str) -> None:
+        """Recompute the `complete` flag of an entry from the sections it has stored."""
+        placeholders = ", ".join("?" * len(_NULL_VALUES))
+        filled = {
+            section
+            for (section,) in conn.execute(
+                f"SELECT section FROM sections WHERE content_id = ? AND value NOT IN ({placeholders})",
+                (key, *_NULL_VALUES),
+            )
+        }
+        conn.execute(
+            "UPDATE entries SET complete = ? WHERE content_id = ?",
+            (all(section in filled for section in SECTIONS), key),
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        """Get the connection of the calling thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA foreign_keys = ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements in a write transaction, taking the write lock up front."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        self._writes += 1
+
+    def generation(self) -> Hashable:
+        """Write counter of this process plus the state of the database and WAL files."""
+        token = [self._writes]
+        for path in (self.db_path, self.db_path.with_name(self.db_path.name + "-wal")):
+            try:
+                stat = path.stat()
+                token += [stat.st_mtime_ns, stat.st_size]
+            except FileNotFoundError:
+                token += [None, None]
+        return tuple(token)
+
+    def _import_json(self, conn: sqlite3.Connection, path) -> int:
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except json.JSONDecodeError as e:
+            # Rolls back the import, so it is tried again once the file is fixed
+            raise ValueError(f"Cannot migrate unreadable database file {path}: {e}")
+        return sum(self._insert(conn, key, value) for key, value in data.items())
+
+    @contextmanager
+    def _snapshot(self) -> Iterator[sqlite3.Connection]:
+        """Run several reads against one consistent snapshot of the database."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    def _insert(self, conn: sqlite3.Connection, key: str, value: Any, replace: bool = False) -> bool:
+        meta, sections = split_sections(value)
+        fields = meta.get("fields", {})
+        hashed = None
+        if "product_info" in fields:
+            hashed = input_hash(fields["product_info"], fields.get("company_info", ""))
+        row = (fields.get("timestamp"), hashed, json.dumps(meta), is_complete(value), key)
+
+        if replace:
+            updated = conn.execute(
+                "UPDATE entries SET timestamp = ?, input_hash = ?, meta = ?, complete = ? WHERE content_id = ?", row
+            ).rowcount
+            if not updated:
+                return False
+            conn.execute("DELETE FROM sections WHERE content_id = ?", (key,))
+        else:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO entries (timestamp, input_hash, meta, complete, content_id) VALUES (?, ?, ?, ?, ?)",
+                row,
+            ).rowcount
+            if not inserted:
+                return False
+
+        conn.executemany(
+            "INSERT INTO sections (content_id, section, value) VALUES (?, ?, ?)",
+            [(key, section, encode_value(section_value, self.codec)) for section, section_value in sections.items()],
+        )
+        return True
+
+    def _load(self, conn: sqlite3.Connection, key: str, meta: str) -> Any:
+        sections = {
+            section: decode_value(value)
+            for section, value in conn.execute(
+                "SELECT section, value FROM sections WHERE content_id = ?", (key,)
+            )
+        }
+        return join_sections(json.loads(meta), sections)
+
+    def create(self, key: str, value: Any) -> bool:
+        """Create a new entry in the database."""
+        with self._transaction() as conn:
+            return self._insert(conn, key, value)
+
+    def read(self, key: str) -> Optional[Any]:
+        """Read an entry from the database."""
+        with self._snapshot() as conn:
+            row = conn.execute("SELECT meta FROM entries WHERE content_id = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            return self._load(conn, key, row[0])
+
+    def read_section(self, key: str, section: str) -> Optional[Any]:
+        """Read a single section of an entry with one indexed lookup."""
+        if section not in SECTIONS:
+            return super().read_section(key, section)
+        row = self._conn().execute(
+            "SELECT value FROM sections WHERE content_id = ? AND section = ?", (key, section)
+        ).fetchone()
+        return None if row is None else decode_value(row[0])
+
+    def write_section(self, key: str, section: str, section_value: Any) -> bool:
+        """Update a single section of an existing entry."""
+        if section not in SECTIONS:
+            return self._write_section_by_update(key, section, section_value)
+        with self._transaction() as conn:
+            row = conn.execute("SELECT meta FROM entries WHERE content_id = ?", (key,)).fetchone()
+            if row is None or "fields" not in json.loads(row[0]):
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO sections (content_id, section, value) VALUES (?, ?, ?)",
+                (key, section, encode_value(section_value, self.codec)),
+            )
+            self._update_complete(conn, key)
+            return True
+
+    def update(self, key: str, value: Any) -> bool:
+        """Update an entry in the database."""
+        with self._transaction() as conn:
+            return self._insert(conn, key, value, replace=True)
+
+    def delete(self, key: str) -> bool:
+        """Delete an entry from the database."""
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM entries WHERE content_id = ?", (key,)).rowcount > 0
+
+    def delete_many(self, keys: List[str]) -> int:
+        """Delete several entries in one transaction. Returns the number deleted."""
+        with self._transaction() as conn:
+            return sum(
+                conn.execute("DELETE FROM entries WHERE content_id = ?", (key,)).rowcount for key in keys
+            )
+
+    def storage_bytes(self) -> int:
+        """Size of the database file plus its write-ahead log."""
+        total = 0
+        for path in (self.db_path, self.db_path.with_name(self.db_path.name + "-wal")):
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def compact(self) -> int:
+        """Checkpoint the WAL and VACUUM free pages back to the filesystem.
+
+        Returns:
+            int: Number of bytes reclaimed
+        """
+        before = self.storage_bytes()
+        conn = self._conn()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._writes += 1
+        return max(before - self.storage_bytes(), 0)
+
+    def find_by_input_hash(self, hashed: str) -> Optional[str]:
+        """Find the latest complete entry with this `input_hash` using its index."""
+        row = self._conn().execute(
+            "SELECT content_id FROM entries WHERE input_hash = ? AND complete = 1 ORDER BY seq DESC LIMIT 1",
+            (hashed,),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def list_all(self) -> Dict:
+        """List all entries in the database in order of creation."""
+        with self._snapshot() as conn:
+            return {
+                key: self._load(conn, key, meta)
+                for key, meta in conn.execute("SELECT content_id, meta FROM entries ORDER BY seq").fetchall()
+            }
+
+    def iter_items(self, after: Optional[str] = None, batch_size: int = 100) -> Iterator[Tuple[str, Any]]:
+        """Iterate over entries in order of creation, fetching `batch_size` rows at a time."""
+        conn = self._conn()
+        last_seq = -1
+        if after is not None:
+            row = conn.execute("SELECT seq FROM entries WHERE content_id = ?", (after,)).fetchone()
+            if row is None:
+                return
+            last_seq = row[0]
+        while True:
+            with self._snapshot() as conn:
+                rows = conn.execute(
+                    "SELECT seq, content_id, meta FROM entries WHERE seq > ? ORDER BY seq LIMIT ?",
+                    (last_seq, batch_size),
+                ).fetchall()
+                batch = [(key, self._load(conn, key, meta)) for _, key, meta in rows]
+            yield from batch
+            if len(rows) < batch_size:
+                return
+            last_seq = rows[-1][0]
+
+    def clear(self) -> None:
+        """Clear all entries in the database."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries")
+
+    def close(self) -> None:
+        """Close every connection opened by this database."""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
@@ -0,0 +1,206 @@
+"""
+Maintenance tools for the content store.
+
+Usage:
+    python db_tools.py convert marketmind_content --from json --to log --codec zlib
+    python db_tools.py bench --entries 200
+"""
+import os
+import random
+import shutil
+import argparse
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from db import CODECS, open_db
+
+BACKENDS = ("json", "log", "sharded", "sqlite")
+
+_WORDS = (
+    "market campaign customer brand growth strategy audience digital engagement product "
+    "launch channel revenue retention segment value pricing social content analytics "
+    "partnership conversion loyalty awareness premium sustainable innovative platform "
+    "experience trust community data insight competitive launch quarter target"
+).split()
+
+
+def convert(db_name: str, source: str, target: str, codec: str, target_name: str = None) -> int:
+    """Copy every entry of a store into a store with another backend or codec.
+
+    Args:
+        db_name (str): Name of the source database
+        source (str): Backend of the source database
+        target (str): Backend of the target database
+        codec (str): Codec for records in the target database
+        target_name (str, optional): Name of the target database. Defaults to `db_name`.
+
+    Returns:
+        int: Number of entries copied
+    """
+    target_name = target_name or db_name
+    if source == target and target_name == db_name:
+        raise ValueError("Converting a store onto itself needs a different target name")
+
+    source_db = open_db(db_name, backend=source, cache_size=0)
+    target_db = open_db(target_name, backend=target, cache_size=0, codec=codec)
+    count = 0
+    try:
+        for key, value in source_db.iter_items():
+            if target_db.create(key, value) or target_db.update(key, value):
+                count += 1
+    finally:
+        source_db.close()
+        target_db.close()
+    return count
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _paragraph(rng: random.Random, sentences: int = 4) -> str:
+    return " ".join(_sentence(rng, rng.randint(8, 20)) for _ in range(sentences))
+
+
+def sample_generation(seed: int) -> Dict[str, Any]:
+    """Build a generation shaped like the output of /generate, filled with prose-like text."""
+    rng = random.Random(seed)
+    campaign = {
+        "name": _sentence(rng, 3),
+        "slogan": _sentence(rng, 6),
+        "concept": _paragraph(rng, 2),
+        "target_audience": _sentence(rng, 10),
+        "key_message": _sentence(rng, 12),
+        "image_url": f"https://fal.media/files/sample/{seed}.jpg",
+    }
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "product_info": _paragraph(rng),
+        "company_info": _paragraph(rng),
+        "campaigns": [dict(campaign, name=_sentence(rng, 3)) for _ in range(5)],
+        "detailed_campaign": {
+            **campaign,
+            **{field: _paragraph(rng) for field in (
+                "brand_positioning", "creative_strategy", "budget_allocation", "timeline",
+                "competitive_analysis", "risk_assessment",
+            )},
+            **{field: [_sentence(rng, 8) for _ in range(5)] for field in (
+                "campaign_objectives", "media_channels", "key_performance_indicators", "success_metrics",
+            )},
+        },
+        "gtm_plan": {field: _paragraph(rng, 6) for field in (
+            "title", "executive_summary", "market_analysis", "value_proposition", "competitive_strategy",
+            "marketing_strategy", "sales_and_pricing", "launch_plan", "risk_and_resources", "growth_strategy",
+        )},
+        "personas": [
+            {
+                "name": _sentence(rng, 2),
+                "age": rng.randint(18, 70),
+                "interests": [_sentence(rng, 3) for _ in range(4)],
+                "pain_points": [_sentence(rng, 6) for _ in range(4)],
+                "chat_system_prompt": _paragraph(rng, 12),
+                "image_url": f"https://fal.media/files/sample/persona-{seed}.jpg",
+                "messages": [{"role": "assistant", "content": _sentence(rng, 6)}],
+            }
+            for _ in range(4)
+        ],
+        "market_research": {
+            "title": _sentence(rng, 5),
+            "competitors": [{"name": _sentence(rng, 2), "description": _paragraph(rng, 3)} for _ in range(6)],
+            "summary": _paragraph(rng, 3),
+        },
+        "executive_brief": {field: _paragraph(rng, 3) for field in (
+            "title", "executive_summary", "business_opportunity", "investment_required", "expected_roi",
+            "recommendation",
+        )},
+    }
+
+
+def _disk_usage(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def bench(entries: int, reads: int) -> List[Dict[str, Any]]:
+    """Compare size, write and read times of every backend and codec on sample generations."""
+    samples = [sample_generation(i) for i in range(entries)]
+    keys = [f"bench-{i}" for i in range(entries)]
+    rng = random.Random(0)
+    read_keys = [rng.choice(keys) for _ in range(reads)]
+    results = []
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="marketmind-bench-")
+    try:
+        os.chdir(workdir)
+        for backend in BACKENDS:
+            for codec in (("json",) if backend == "json" else CODECS):
+                db_name = f"bench_{backend}_{codec}"
+                db = open_db(db_name, backend=backend, cache_size=0, codec=codec)
+
+                start = time.perf_counter()
+                for key, sample in zip(keys, samples):
+                    db.create(key, sample)
+                write_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                for key in read_keys:
+                    db.read(key)
+                read_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                for key in read_keys:
+                    db.read_section(key, "personas")
+                section_time = time.perf_counter() - start
+
+                db.close()
+                size = sum(_disk_usage(path) for path in Path(".data").glob(f"{db_name}*"))
+                results.append({
+                    "backend": backend,
+                    "codec": codec,
+                    "size_bytes": size,
+                    "write_ms": write_time / entries * 1000,
+                    "read_ms": read_time / reads * 1000,
+                    "section_read_ms": section_time / reads * 1000,
+                })
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert_parser = commands.add_parser("convert", help="Copy a store into another backend or codec")
+    convert_parser.add_argument("db_name")
+    convert_parser.add_argument("--from", dest="source", choices=BACKENDS, default="json")
+    convert_parser.add_argument("--to", dest="target", choices=BACKENDS, required=True)
+    convert_parser.add_argument("--codec", choices=CODECS, default="json")
+    convert_parser.add_argument("--target-name", default=None)
+
+    bench_parser = commands.add_parser("bench", help="Compare backends and codecs on sample generations")
+    bench_parser.add_argument("--entries", type=int, default=200)
+    bench_parser.add_argument("--reads", type=int, default=500)
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        count = convert(args.db_name, args.source, args.target, args.codec, args.target_name)
+        print(f"Copied {count} entries from {args.source} to {args.target} ({args.codec})")
+    else:
+        results = bench(args.entries, args.reads)
+        print(f"{'backend':<8} {'codec':<5} {'size (KB)':>10} {'write (ms)':>11} {'read (ms)':>10} {'section (ms)':>13}")
+        for r in results:
+            print(
+                f"{r['backend']:<8} {r['codec']:<5} {r['size_bytes'] / 1024:>10.1f} {r['write_ms']:>11.2f} "
+                f"{r['read_ms']:>10.3f} {r['section_read_ms']:>13.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
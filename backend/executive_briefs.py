@@ -1,6 +1,8 @@
+import asyncio
 from typing import List
 from pydantic import BaseModel
-from models.llms import llm_call
+from models.llms import llm_call_async
+from models.schema_registry import schema_registry
 from make_campaigns import DetailedCampaign
 from generate_gtm import GTMPlan
 
@@ -16,7 +18,9 @@ class ExecutiveBrief(BaseModel):
     recommendation: str
     next_steps: List[str]
 
-def generate_executive_brief(campaign: DetailedCampaign, gtm_plan: GTMPlan) -> ExecutiveBrief:
+schema_registry.register(ExecutiveBrief)
+
+async def generate_executive_brief_async(campaign: DetailedCampaign, gtm_plan: GTMPlan) -> ExecutiveBrief:
     """
     Generate a concise executive brief combining campaign and GTM plan information.
     """
@@ -60,7 +64,7 @@ def generate_executive_brief(campaign: DetailedCampaign, gtm_plan: GTMPlan) -> E
 
     Focus on business impact and strategic value while keeping the content concise and actionable."""
 
-    structured_response = llm_call(
+    structured_response = await llm_call_async(
         prompt,
         system_prompt=system_prompt,
         response_format=ExecutiveBrief
@@ -68,6 +72,10 @@ def generate_executive_brief(campaign: DetailedCampaign, gtm_plan: GTMPlan) -> E
     
     return structured_response
 
+def generate_executive_brief(campaign: DetailedCampaign, gtm_plan: GTMPlan) -> ExecutiveBrief:
+    """Blocking wrapper around `generate_executive_brief_async`."""
+    return asyncio.run(generate_executive_brief_async(campaign, gtm_plan))
+
 def format_executive_brief(brief: ExecutiveBrief):
     """Format the executive brief for console output"""
     print("\n" + "="*50)
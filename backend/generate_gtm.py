@@ -1,6 +1,8 @@
+import asyncio
 from typing import List
 from pydantic import BaseModel
-from models.llms import llm_call
+from models.llms import llm_call_async
+from models.schema_registry import schema_registry
 from make_campaigns import DetailedCampaign
 # from rich.console import Console
 # from rich.panel import Panel
@@ -22,7 +24,9 @@ class GTMPlan(BaseModel):
     risk_and_resources: str
     growth_strategy: str
 
-def generate_gtm_plan(campaign: 'DetailedCampaign') -> GTMPlan:
+schema_registry.register(GTMPlan)
+
+async def generate_gtm_plan_async(campaign: 'DetailedCampaign') -> GTMPlan:
     """
     Generate a comprehensive go-to-market plan based on a DetailedCampaign.
     """
@@ -58,7 +62,7 @@ def generate_gtm_plan(campaign: 'DetailedCampaign') -> GTMPlan:
 
     Ensure each section is detailed, actionable, and aligned with the campaign's objectives."""
 
-    response = llm_call(
+    response = await llm_call_async(
         prompt,
         system_prompt=system_prompt,
         response_format=GTMPlan
@@ -66,6 +70,10 @@ def generate_gtm_plan(campaign: 'DetailedCampaign') -> GTMPlan:
     
     return response
 
+def generate_gtm_plan(campaign: 'DetailedCampaign') -> GTMPlan:
+    """Blocking wrapper around `generate_gtm_plan_async`."""
+    return asyncio.run(generate_gtm_plan_async(campaign))
+
 def format_gtm_plan(gtm_plan: GTMPlan):
     """Format the GTM plan for console output"""
     print("\n=== EXECUTIVE SUMMARY ===")
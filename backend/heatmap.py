@@ -9,6 +9,12 @@ import numpy as np
 import matplotlib.pyplot as plt
 from scipy.ndimage import gaussian_filter
 from fastapi import HTTPException
+from models.schema_registry import schema_registry
+
+class Score(BaseModel):
+    score: int
+
+schema_registry.register(Score)
 
 def segment_image_into_16_sections(base64_image):
     """
@@ -147,9 +153,6 @@ def evaluate_section(section_base64: Image.Image, description: str):
         }
     ]
 
-    class Score(BaseModel):
-        score: int
-
     response = llm_call_messages(messages, model="openai/gpt-4.1-nano", response_format=Score)
     return response.score
 
@@ -0,0 +1,91 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from models.images import IMAGE_PLACEHOLDER, generate_image_or_placeholder_async, image_model
+
+
+class ImageTask(BaseModel):
+    """An image to generate for one item of a stored section, e.g. the second campaign."""
+    content_id: str
+    section: str  # campaigns or personas
+    index: int
+    prompt: str
+    model: str = image_model
+    status: str = "pending"  # pending, running, done, failed
+    image_url: str = IMAGE_PLACEHOLDER
+
+
+# Called with every finished task, done or failed, to store its image
+ImageListener = Callable[[ImageTask], Awaitable[None]]
+
+
+class ImageQueue:
+    """Generates images in the background, apart from the text they illustrate.
+
+    Tasks are worked on first in, first out by `workers` coroutines, started on
+    the first `submit`. Each finished task is handed to `on_image`. Only tasks
+    that are still pending or running are kept, so they can be looked up by
+    content id until their image has been stored.
+    """
+
+    def __init__(self, on_image: ImageListener, workers: int = 4, timeout: Optional[float] = None):
+        self.on_image = on_image
+        self.workers = workers
+        self.timeout = timeout
+        self._queue: "asyncio.Queue[ImageTask]" = asyncio.Queue()
+        self._workers: List["asyncio.Task[Any]"] = []
+        self._unfinished: Dict[str, "OrderedDict[Tuple[str, int], ImageTask]"] = {}
+        self.submitted = 0
+        self.done = 0
+        self.failed = 0
+
+    def submit(self, task: ImageTask) -> None:
+        """Queue an image; must be called from the event loop the workers should run on."""
+        if not self._workers:
+            self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+        self._unfinished.setdefault(task.content_id, OrderedDict())[(task.section, task.index)] = task
+        self.submitted += 1
+        self._queue.put_nowait(task)
+
+    def tasks_for(self, content_id: str) -> List[ImageTask]:
+        """Get the pending and running tasks of a generation."""
+        return list(self._unfinished.get(content_id, {}).values())
+
+    async def _work(self) -> None:
+        while True:
+            task = await self._queue.get()
+            try:
+                task.status = "running"
+                task.image_url = await generate_image_or_placeholder_async(task.prompt, task.model, self.timeout)
+                task.status = "done" if task.image_url != IMAGE_PLACEHOLDER else "failed"
+                if task.status == "done":
+                    self.done += 1
+                else:
+                    self.failed += 1
+                await self.on_image(task)
+            except Exception as e:
+                print(f"Error storing image {task.index} of {task.section} for {task.content_id}: {e}")
+            finally:
+                tasks = self._unfinished.get(task.content_id)
+                if tasks is not None:
+                    tasks.pop((task.section, task.index), None)
+                    if not tasks:
+                        del self._unfinished[task.content_id]
+                self._queue.task_done()
+
+    async def join(self) -> None:
+        """Wait until every queued image has been generated and stored."""
+        await self._queue.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize(),
+            "unfinished": sum(len(tasks) for tasks in self._unfinished.values()),
+            "submitted": self.submitted,
+            "done": self.done,
+            "failed": self.failed,
+        }
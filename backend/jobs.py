@@ -0,0 +1,347 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+from db_async import AsyncJsonDB
+
+
+class StageStatus(BaseModel):
+    status: str = "pending"  # pending, running, done, failed
+    started_at: Optional[float] = None  # seconds since the job started running
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+
+class JobStatus(BaseModel):
+    id: str
+    status: str = "queued"  # queued, running, done, failed
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+    stages: Dict[str, StageStatus] = {}
+    critical_path: List[str] = []
+
+
+class Job:
+    """A generation running in the background, with the status of each of its stages.
+
+    Progress is also recorded as a log of events, numbered from 0, that any
+    number of listeners can follow with `stream`. The log ends with a "done"
+    or "failed" event.
+    """
+
+    def __init__(self, job_id: str, key: Optional[str], stages: Iterable[str]):
+        self.id = job_id
+        self.key = key
+        self.status = JobStatus(
+            id=job_id,
+            created_at=datetime.now().isoformat(),
+            stages={name: StageStatus() for name in stages},
+        )
+        self.task: Optional["asyncio.Task[Any]"] = None
+        self.events: List[Dict[str, Any]] = []
+        # Set once the event payloads have been dropped to save memory
+        self.events_released = False
+        self._subscribers: List["asyncio.Queue[Dict[str, Any]]"] = []
+        self._origin = time.perf_counter()
+        # Set whenever the status changes, so it is stored without waiting for the next heartbeat
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status.status in ("done", "failed")
+
+    def mark_running(self) -> None:
+        self.status.status = "running"
+        self.status.started_at = datetime.now().isoformat()
+        self._origin = time.perf_counter()
+        self._changed.set()
+
+    def stage_update(self, name: str, event: str, result: Any = None) -> None:
+        """Record a stage starting ("running"), finishing ("done") or failing ("failed").
+
+        Args:
+            name (str): Name of the stage
+            event (str): New status of the stage
+            result (Any, optional): Result of the stage, or the exception it failed with
+        """
+        stage = self.status.stages.setdefault(name, StageStatus())
+        stage.status = event
+        now = time.perf_counter() - self._origin
+        if event == "running":
+            stage.started_at = now
+        else:
+            stage.finished_at = now
+        if event == "failed":
+            stage.error = str(result)
+        self._changed.set()
+        self.emit("stage", {"name": name, **stage.model_dump()})
+
+    def emit(self, event: str, data: Any = None) -> None:
+        """Append an event to the log and wake up everyone streaming it.
+
+        Args:
+            event (str): Type of the event
+            data (Any, optional): JSON-serializable payload
+        """
+        record = {"id": len(self.events), "event": event, "data": data}
+        self.events.append(record)
+        for queue in self._subscribers:
+            queue.put_nowait(record)
+
+    async def stream(
+        self, after: Optional[int] = None, keepalive: float = 15.0
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Follow the event log until the job has finished.
+
+        Yields the events logged so far, then new ones as they happen, and None
+        whenever `keepalive` seconds pass without an event.
+
+        Args:
+            after (int, optional): Only yield events with a higher id, to resume a stream
+            keepalive (float): Seconds to wait before yielding None
+        """
+        queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        # Snapshot and subscribe without awaiting in between, so no event is missed or repeated
+        backlog = self.events[(after + 1 if after is not None else 0):]
+        self._subscribers.append(queue)
+        try:
+            for record in backlog:
+                yield record
+                if record["event"] in ("done", "failed"):
+                    return
+            while True:
+                try:
+                    record = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield record
+                if record["event"] in ("done", "failed"):
+                    return
+        finally:
+            self._subscribers.remove(queue)
+
+    async def wait(self) -> Any:
+        """Wait for the job and return its result, without cancelling it if the caller goes away."""
+        return await asyncio.shield(self.task)
+
+
+class StoredJob:
+    """A job run by another process, followed through the record it keeps in the store."""
+
+    def __init__(self, manager: "JobManager", status: JobStatus):
+        self.id = status.id
+        self.status = status
+        self._manager = manager
+
+    @property
+    def finished(self) -> bool:
+        return self.status.status in ("done", "failed")
+
+    async def wait(self) -> None:
+        """Poll the stored record until the job has finished; raises if it failed."""
+        while not self.finished:
+            await asyncio.sleep(self._manager.poll_interval)
+            status = await self._manager.load(self.id)
+            if status is None:
+                # Records are dropped once their job succeeds
+                self.status.status = "done"
+            else:
+                self.status = status
+        if self.status.status == "failed":
+            raise RuntimeError(self.status.error)
+
+
+class JobManager:
+    """Runs generation jobs in the background and keeps their status for polling.
+
+    At most `max_running` jobs run at once; the rest wait in the "queued"
+    state. Finished jobs are kept until `max_finished` newer ones have finished,
+    but only the `max_event_logs` most recent keep the payloads of their events.
+    Active jobs can also be looked up by a caller-chosen key, such as the hash
+    of their inputs, so identical requests can join them.
+
+    With a `store` shared between processes, each job also keeps a record of
+    its status there, rewritten whenever it changes and at least every
+    `heartbeat_interval` seconds, so other processes can report and join the
+    jobs this one runs. A record whose heartbeat is older than three intervals
+    belongs to a process that died, and its job is reported as failed. Records
+    are dropped once their job succeeds, so whatever the job produced has to
+    show that it is done. The store must write from a single I/O thread, so
+    the records of a job land in the order they were written.
+    """
+
+    def __init__(
+        self,
+        max_running: int = 8,
+        max_finished: int = 1000,
+        max_event_logs: int = 50,
+        store: Optional[AsyncJsonDB] = None,
+        heartbeat_interval: float = 5.0,
+        poll_interval: float = 1.0,
+    ):
+        self.max_running = max_running
+        self.max_finished = max_finished
+        self.max_event_logs = max_event_logs
+        self.store = store
+        self.heartbeat_interval = heartbeat_interval
+        # Seconds between reads of the store when following a job run by another process
+        self.poll_interval = poll_interval
+        self._slots = asyncio.Semaphore(max_running)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active_by_key: Dict[str, Job] = {}
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    def submit(
+        self,
+        job_id: str,
+        run: Callable[[Job], Awaitable[Any]],
+        stages: Iterable[str] = (),
+        key: Optional[str] = None,
+    ) -> Job:
+        """Start a job in the background.
+
+        Args:
+            job_id (str): Id of the job, also the content id it generates
+            run (Callable): Coroutine function doing the work, called with the job
+            stages (Iterable[str]): Names of the stages reported in the job status
+            key (str, optional): Key under which `find_active` finds the job while it runs
+
+        Returns:
+            Job: The submitted job
+        """
+        job = Job(job_id, key, stages)
+        self._jobs[job_id] = job
+        if key is not None:
+            self._active_by_key[key] = job
+        self.submitted += 1
+        job.task = asyncio.ensure_future(self._run(job, run))
+        # Failures are reported through the job status; nobody has to await a background job
+        job.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return job
+
+    async def _run(self, job: Job, run: Callable[[Job], Awaitable[Any]]) -> Any:
+        heartbeat = None
+        if self.store is not None:
+            # Stored before the job does any work, so other processes never see its output without it
+            await self._save(job)
+            heartbeat = asyncio.ensure_future(self._heartbeat(job))
+        try:
+            async with self._slots:
+                job.mark_running()
+                result = await run(job)
+            job.status.status = "done"
+            self.succeeded += 1
+            job.emit("done", job.status.model_dump())
+            return result
+        except BaseException as e:
+            job.status.status = "failed"
+            job.status.error = str(e) or type(e).__name__
+            self.failed += 1
+            print(f"Job {job.id} failed: {job.status.error}")
+            job.emit("failed", job.status.model_dump())
+            raise
+        finally:
+            job.status.finished_at = datetime.now().isoformat()
+            if job.key is not None and self._active_by_key.get(job.key) is job:
+                del self._active_by_key[job.key]
+            self._trim()
+            if heartbeat is not None:
+                job._changed.set()
+                await heartbeat
+                await self._save(job)
+
+    async def _heartbeat(self, job: Job) -> None:
+        """Store the job's status whenever it changes, and at least every `heartbeat_interval` seconds."""
+        while True:
+            try:
+                await asyncio.wait_for(job._changed.wait(), self.heartbeat_interval)
+            except asyncio.TimeoutError:
+                pass
+            job._changed.clear()
+            if job.finished:
+                return
+            await self._save(job)
+
+    async def _save(self, job: Job) -> None:
+        """Write the job's record, or drop it once the job has succeeded."""
+        try:
+            if job.status.status == "done":
+                await self.store.delete(job.id)
+                return
+            record = {**job.status.model_dump(), "key": job.key, "heartbeat": time.time()}
+            if not await self.store.update(job.id, record):
+                await self.store.create(job.id, record)
+        except Exception as e:
+            print(f"Storing the status of job {job.id} failed: {e}")
+
+    def _stored_status(self, record: Dict[str, Any]) -> JobStatus:
+        status = JobStatus(**record)
+        if status.status in ("queued", "running") and time.time() - record["heartbeat"] > 3 * self.heartbeat_interval:
+            status.status = "failed"
+            status.error = "Job was interrupted"
+            for stage in status.stages.values():
+                if stage.status == "running":
+                    stage.status = "failed"
+        return status
+
+    def _trim(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[: max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job_id]
+        for job_id in finished[: max(len(finished) - self.max_event_logs, 0)]:
+            job = self._jobs.get(job_id)
+            if job is not None and not job.events_released:
+                job.events = []
+                job.events_released = True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a running or recently finished job."""
+        return self._jobs.get(job_id)
+
+    def find_active(self, key: str) -> Optional[Job]:
+        """Get the queued or running job submitted with `key`."""
+        return self._active_by_key.get(key)
+
+    async def load(self, job_id: str) -> Optional[JobStatus]:
+        """Get the stored status of a job, from whichever process runs it.
+
+        Returns:
+            The status, failed if the job's process stopped updating it, or None if the job has no record
+        """
+        if self.store is None:
+            return None
+        record = await self.store.read(job_id)
+        return self._stored_status(record) if isinstance(record, dict) else None
+
+    async def find_stored(self, key: str) -> Optional[StoredJob]:
+        """Get a queued or running job submitted with `key` by another process."""
+        if self.store is None:
+            return None
+        async for job_id, record in self.store.iter_items():
+            if isinstance(record, dict) and record.get("key") == key and job_id not in self._jobs:
+                status = self._stored_status(record)
+                if status.status in ("queued", "running"):
+                    return StoredJob(self, status)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {"queued": 0, "running": 0}
+        for job in self._jobs.values():
+            if job.status.status in counts:
+                counts[job.status.status] += 1
+        return {
+            **counts,
+            "max_running": self.max_running,
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+        }
@@ -1,22 +1,44 @@
 from heatmap import generate_heatmap
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Any, Callable, List, Optional, Dict, Tuple, Union
 import uvicorn
 import uuid
+import os
+import json
 from datetime import datetime
 import asyncio
+import time
 
 import random
 
-from make_campaigns import Campaign, CampaignList, DetailedCampaign, generate_campaign_ideas, generate_detailed_campaign
-from generate_gtm import GTMPlan, generate_gtm_plan
-from make_personas import Persona, PersonaList, generate_personas
-from market_research import MarketResearch, conduct_market_research
-from executive_briefs import ExecutiveBrief, generate_executive_brief
-from models.llms import llm_call_messages_async
-from db import JsonDB
+from make_campaigns import (
+    Campaign,
+    CampaignList,
+    DetailedCampaign,
+    campaign_image_prompt,
+    generate_base_campaigns_async,
+    generate_campaign_images_async,
+    generate_detailed_campaign_async,
+)
+from generate_gtm import GTMPlan, generate_gtm_plan_async
+from make_personas import Persona, PersonaList, generate_personas_async, persona_image_prompt, prompt_stats
+from market_research import MarketResearch, conduct_market_research_async
+from executive_briefs import ExecutiveBrief, generate_executive_brief_async
+from models.llms import llm_cache, llm_call_messages_async, llm_retrier, llm_stream_messages_async, model_limiter
+from models.streaming import StreamMetrics, stream_stats
+from models.images import IMAGE_PLACEHOLDER, image_stats
+from models.budget import budget_stats
+from models.http_pool import pool_stats
+from models.schema_registry import schema_registry
+from db import SECTIONS, input_hash, is_complete, open_db
+from db_async import AsyncJsonDB
+from db_retention import RetentionCompactor, RetentionPolicy
+from scheduler import GraphRun, StageListener, TaskGraph
+from jobs import Job, JobManager, JobStatus, StageStatus, StoredJob
+from image_queue import ImageQueue, ImageTask
 
 app = FastAPI(title="MarketMind API", description="API for marketing campaign generation and analysis")
 
@@ -29,16 +51,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize database
-db = JsonDB("marketmind_content")
+# Initialize database; every call runs on a dedicated I/O thread pool
+db = AsyncJsonDB(
+    open_db("marketmind_content"),
+    io_threads=int(os.getenv("MARKETMIND_DB_IO_THREADS", "4")),
+)
+
+# Progress of /generate/batch requests, so an interrupted batch can be resumed
+batches = AsyncJsonDB(open_db("marketmind_batches"), io_threads=1)
+
+# Compile the structured-output schemas of every generator once, before the first request
+schema_registry.warm()
+
+# Status of the generation jobs each worker runs, so every worker can report and join them.
+# Not cached, since other workers rewrite the records.
+job_records = AsyncJsonDB(open_db("marketmind_jobs", cache_size=0), io_threads=1)
+
+# Every generation runs as a background job, even when the request waits for it
+jobs = JobManager(
+    max_running=int(os.getenv("MARKETMIND_MAX_RUNNING_JOBS", "8")),
+    store=job_records,
+    heartbeat_interval=float(os.getenv("MARKETMIND_JOB_HEARTBEAT_S", "5")),
+)
+
+# Evict old generations in the background when a retention limit is configured
+retention_policy = RetentionPolicy.from_env()
+retention = None
+if retention_policy.enabled:
+    retention = RetentionCompactor(
+        db.db,
+        retention_policy,
+        interval=float(os.getenv("MARKETMIND_RETENTION_INTERVAL_S", "3600")),
+    ).start()
 
 class ProductInfo(BaseModel):
     product_info: str
     company_info: str
+    force_regenerate: bool = False
+    # Return the content id right away and generate in the background; poll /jobs/{id} for progress
+    background: bool = False
+    # Store campaigns and personas without images and fill them in from the image queue; see /content/{id}/images
+    defer_images: bool = False
 
 class CampaignDescription(BaseModel):
     campaign_description: str
 
+class DetailedCampaignRequest(BaseModel):
+    productInfo: str
+    campaign: Campaign
+    companyInfo: str = ""
+
 class ExecutiveBriefInput(BaseModel):
     campaign: DetailedCampaign
     gtm_plan: GTMPlan
@@ -46,6 +108,11 @@ class ExecutiveBriefInput(BaseModel):
 class GenerationResponse(BaseModel):
     id: str
     timestamp: str
+    deduplicated: bool = False
+    status: str = "done"
+
+# Model the personas chat with, in /chat, /chat/stream and /group-chat
+CHAT_MODEL = "google/gemini-2.5-flash-preview"
 
 class ChatMessage(BaseModel):
     role: str
@@ -70,136 +137,569 @@ class PersonaResponse(BaseModel):
 class GroupChatResponse(BaseModel):
     responses: List[PersonaResponse]
 
-async def generate_parallel(product_info: str, company_info: str):
-    """Run all content generation in parallel"""
-    # First level of parallelization
-    market_research_task = asyncio.to_thread(conduct_market_research, product_info, company_info)
-    campaigns_task = asyncio.to_thread(generate_campaign_ideas, product_info, company_info)
-    
-    market_research, campaigns = await asyncio.gather(market_research_task, campaigns_task)
-    
-    # Generate detailed campaign (needs campaigns result)
-    detailed_campaign = generate_detailed_campaign(product_info, campaigns.campaigns[0])
-    
-    # Second level of parallelization
-    gtm_plan_task = asyncio.to_thread(generate_gtm_plan, detailed_campaign)
-    personas_task = asyncio.to_thread(generate_personas, detailed_campaign.concept)
-    
-    gtm_plan, personas = await asyncio.gather(gtm_plan_task, personas_task)
-    
-    # Generate executive brief (needs both detailed campaign and GTM plan)
-    executive_brief = generate_executive_brief(detailed_campaign, gtm_plan)
-    
-    return {
-        "campaigns": campaigns,
-        "detailed_campaign": detailed_campaign,
-        "gtm_plan": gtm_plan,
-        "personas": personas,
-        "market_research": market_research,
-        "executive_brief": executive_brief
-    }
+class BatchRequest(BaseModel):
+    items: List[ProductInfo] = []
+    # Id of an earlier batch to resume instead; its stored items are used and finished ones are skipped
+    batch_id: Optional[str] = None
+
+class BatchItem(BaseModel):
+    index: int
+    id: Optional[str] = None
+    status: str = "pending"  # pending, running, done, failed
+    deduplicated: bool = False
+    error: Optional[str] = None
+
+class ImageSlot(BaseModel):
+    section: str
+    index: int
+    name: str
+    status: str  # pending, running, done, missing
+    image_url: str
+
+class ContentImages(BaseModel):
+    id: str
+    pending: int
+    images: List[ImageSlot]
+
+# Timings of the most recent generate_parallel run, for /debug/metrics
+last_generation_run: Optional[Dict] = None
+
+# Called with the type and JSON-serializable payload of each piece of content as it is generated
+ProgressListener = Callable[[str, Any], None]
+
+def to_jsonable(value):
+    """Convert generated models, or lists of them, to plain JSON values"""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, list):
+        return [to_jsonable(item) for item in value]
+    return value
+
+def build_generation_graph(
+    product_info: str,
+    company_info: str,
+    on_progress: Optional[ProgressListener] = None,
+    defer_images: bool = False,
+) -> TaskGraph:
+    """Build the graph of generation stages; each stage starts as soon as its inputs are ready.
+    With `defer_images`, campaigns and personas are produced without images."""
+    def report(event: str, data):
+        if on_progress is not None:
+            on_progress(event, data)
+
+    async def market_research():
+        return await conduct_market_research_async(
+            product_info,
+            company_info,
+            on_progress=lambda part, value: report("market_research", {"part": part, "data": to_jsonable(value)}),
+        )
+
+    async def base_campaigns():
+        return await generate_base_campaigns_async(product_info, company_info)
+
+    async def campaigns(base_campaigns):
+        if defer_images:
+            return CampaignList(campaigns=[
+                Campaign(**campaign.model_dump(), image_url=IMAGE_PLACEHOLDER) for campaign in base_campaigns.campaigns
+            ])
+        campaigns = await generate_campaign_images_async(
+            base_campaigns.campaigns,
+            on_campaign=lambda index, campaign: report("campaign_image", {"index": index, "campaign": campaign.model_dump()}),
+        )
+        return CampaignList(campaigns=campaigns)
+
+    async def detailed_campaign_text(base_campaigns):
+        # Only the first campaign's text is needed; its image is filled in once ready
+        campaign = Campaign(**base_campaigns.campaigns[0].model_dump(), image_url="")
+        return await generate_detailed_campaign_async(campaign, product_info, company_info)
+
+    async def detailed_campaign(detailed_campaign_text, campaigns):
+        return detailed_campaign_text.model_copy(update={"image_url": campaigns.campaigns[0].image_url})
+
+    async def gtm_plan(detailed_campaign_text):
+        return await generate_gtm_plan_async(detailed_campaign_text)
+
+    async def personas(detailed_campaign_text):
+        return await generate_personas_async(
+            detailed_campaign_text.concept,
+            on_progress=lambda index, persona: report("persona", {"index": index, "persona": persona.model_dump()}),
+            with_images=not defer_images,
+        )
+
+    async def executive_brief(detailed_campaign_text, gtm_plan):
+        return await generate_executive_brief_async(detailed_campaign_text, gtm_plan)
+
+    graph = TaskGraph()
+    graph.add("market_research", market_research)
+    graph.add("base_campaigns", base_campaigns)
+    graph.add("campaigns", campaigns, deps=["base_campaigns"])
+    graph.add("detailed_campaign_text", detailed_campaign_text, deps=["base_campaigns"])
+    graph.add("detailed_campaign", detailed_campaign, deps=["detailed_campaign_text", "campaigns"])
+    graph.add("gtm_plan", gtm_plan, deps=["detailed_campaign_text"])
+    graph.add("personas", personas, deps=["detailed_campaign_text"])
+    graph.add("executive_brief", executive_brief, deps=["detailed_campaign_text", "gtm_plan"])
+    return graph
+
+async def generate_parallel(
+    product_info: str,
+    company_info: str,
+    on_stage: Optional[StageListener] = None,
+    on_progress: Optional[ProgressListener] = None,
+    defer_images: bool = False,
+) -> GraphRun:
+    """Run all content generation, reporting each stage to `on_stage` as it starts and finishes
+    and each piece of content within a stage to `on_progress`"""
+    global last_generation_run
+    run = await build_generation_graph(product_info, company_info, on_progress, defer_images).run(on_stage)
+    last_generation_run = run.summary()
+    print(f"Generation finished in {run.seconds:.1f}s, critical path: {' -> '.join(run.critical_path)}")
+    return run
+
+def serialize_section(section: str, value):
+    """Convert a generated section into the form it is stored in"""
+    if section == "campaigns":
+        return [campaign.model_dump() for campaign in value.campaigns]
+    if section == "personas":
+        return [persona.model_dump() for persona in value.personas]
+    return value.model_dump()
 
 @app.post("/generate", response_model=GenerationResponse)
 async def generate_all(product_info: ProductInfo):
-    """Generate all marketing content based on product and company information"""
+    """Generate all marketing content based on product and company information.
+
+    Identical inputs (ignoring case and whitespace) return the stored generation,
+    or join the one already running, unless `force_regenerate` is set. With
+    `background` set, the content id is returned immediately and each section
+    is stored as soon as it is generated.
+    """
+    response, job = await start_generation(product_info)
+    if job is not None and not product_info.background:
+        await job.wait()
+        response.status = job.status.status
+    return response
+
+async def start_generation(product_info: ProductInfo) -> Tuple[GenerationResponse, Optional[Union[Job, StoredJob]]]:
+    """Find the stored or running generation for some inputs, or start a new one.
+
+    A generation running in another worker is joined through its job record.
+
+    Returns:
+        The response for the request, and the job generating the content if it is still running
+    """
+    hashed = input_hash(product_info.product_info, product_info.company_info)
+    if not product_info.force_regenerate:
+        existing_id = await db.find_by_input_hash(hashed)
+        if existing_id is not None:
+            timestamp = await db.read_section(existing_id, "timestamp")
+            return GenerationResponse(id=existing_id, timestamp=timestamp, deduplicated=True), None
+        job = jobs.find_active(hashed)
+        if job is None:
+            stored = await jobs.find_stored(hashed)
+            # An identical request may have started a job while the store was read
+            job = jobs.find_active(hashed) or stored
+        if job is not None:
+            return GenerationResponse(
+                id=job.id, timestamp=job.status.created_at, deduplicated=True, status=job.status.status
+            ), job
+
     content_id = str(uuid.uuid4())
-    timestamp = datetime.now().isoformat()
-    
+    job = jobs.submit(
+        content_id,
+        lambda job: run_generation_job(job, product_info),
+        stages=build_generation_graph(product_info.product_info, product_info.company_info).stage_names,
+        key=hashed,
+    )
+    return GenerationResponse(id=content_id, timestamp=job.status.created_at, status=job.status.status), job
+
+@app.post("/generate/batch")
+async def generate_batch(request: BatchRequest):
+    """Generate content for many products, streaming an NDJSON line as each one finishes.
+
+    Every item runs as its own generation job, so the batch shares the
+    running-job limit and the per-provider concurrency budgets with all other
+    generations. The first line carries the batch id; post it back as
+    `batch_id` to resume an interrupted batch without regenerating the items
+    that already finished.
+    """
+    if request.batch_id is not None:
+        batch = await batches.read(request.batch_id)
+        if not isinstance(batch, dict):
+            raise HTTPException(status_code=404, detail="Batch not found")
+        batch_id = request.batch_id
+    else:
+        if not request.items:
+            raise HTTPException(status_code=400, detail="A batch needs at least one item")
+        batch_id = str(uuid.uuid4())
+        batch = {
+            "timestamp": datetime.now().isoformat(),
+            "items": [item.model_dump() for item in request.items],
+            "results": [BatchItem(index=index).model_dump() for index in range(len(request.items))],
+        }
+        await batches.create(batch_id, batch)
+
+    items = [ProductInfo(**item) for item in batch["items"]]
+    results = [BatchItem(**result) for result in batch["results"]]
+    save_lock = asyncio.Lock()
+
+    async def save() -> None:
+        # Whoever saves last under the lock writes the latest results
+        async with save_lock:
+            batch["results"] = [result.model_dump() for result in results]
+            await batches.update(batch_id, batch)
+
+    async def run_item(index: int) -> BatchItem:
+        result = results[index]
+        if result.status == "done":
+            return result
+        try:
+            job = jobs.get(result.id) if result.id else None
+            if result.id and job is None and is_complete(await db.read(result.id)):
+                result.status = "done"
+                return result
+            if job is None or job.status.status == "failed":
+                response, job = await start_generation(items[index])
+                result.id = response.id
+                result.deduplicated = response.deduplicated
+            result.status = "running"
+            result.error = None
+            await save()
+            if job is not None:
+                await job.wait()
+            result.status = "done"
+        except Exception as e:
+            result.status = "failed"
+            result.error = str(e) or type(e).__name__
+        return result
+
+    async def stream():
+        yield json.dumps({"event": "batch", "batch_id": batch_id, "total": len(items)}) + "\n"
+        tasks = [asyncio.ensure_future(run_item(index)) for index in range(len(items))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                await save()
+                yield json.dumps({"event": "item", **result.model_dump()}) + "\n"
+        finally:
+            # Jobs keep running if the client goes away; resuming the batch picks them up
+            for task in tasks:
+                task.cancel()
+        yield json.dumps({
+            "event": "done",
+            "batch_id": batch_id,
+            "succeeded": sum(result.status == "done" for result in results),
+            "failed": sum(result.status == "failed" for result in results),
+        }) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+async def run_generation_job(job: Job, product_info: ProductInfo) -> None:
+    """Generate content for a job, storing each section as soon as it is ready"""
     # Store initial entry in database
-    db.create(content_id, {
-        "timestamp": timestamp,
+    await db.create(job.id, {
+        "timestamp": job.status.created_at,
         "product_info": product_info.product_info,
         "company_info": product_info.company_info
     })
-    
-    # Generate content in parallel
-    content = await generate_parallel(
-        product_info.product_info, product_info.company_info
+
+    async def on_stage(name: str, event: str, result):
+        job.stage_update(name, event, result)
+        if event == "done" and name in SECTIONS:
+            section = serialize_section(name, result)
+            async with image_slots_lock:
+                if name == "detailed_campaign":
+                    # The first campaign's image may already have landed from the image queue
+                    campaigns = await db.read_section(job.id, "campaigns")
+                    if campaigns:
+                        section["image_url"] = campaigns[0]["image_url"]
+                await db.write_section(job.id, name, section)
+            # Deferred images, and images that failed or timed out, are generated in the background
+            queue_images(job.id, name, result)
+            job.emit("section", {"section": name, "data": section})
+
+    run = await generate_parallel(
+        product_info.product_info,
+        product_info.company_info,
+        on_stage,
+        job.emit,
+        defer_images=product_info.defer_images,
+    )
+    job.status.critical_path = run.critical_path
+
+def queue_images(content_id: str, section: str, value) -> None:
+    """Queue the missing images of a stored campaigns or personas section"""
+    if section == "campaigns":
+        prompts = [
+            (index, campaign_image_prompt(campaign))
+            for index, campaign in enumerate(value.campaigns)
+            if campaign.image_url == IMAGE_PLACEHOLDER
+        ]
+    elif section == "personas":
+        prompts = [
+            (index, persona_image_prompt(persona))
+            for index, persona in enumerate(value.personas)
+            if persona.image_url == IMAGE_PLACEHOLDER
+        ]
+    else:
+        return
+    for index, prompt in prompts:
+        image_queue.submit(ImageTask(content_id=content_id, section=section, index=index, prompt=prompt))
+
+async def store_image(task: ImageTask) -> None:
+    """Fill a finished image into the section it belongs to"""
+    if task.status == "done":
+        async with image_slots_lock:
+            items = await db.read_section(task.content_id, task.section)
+            if not items or task.index >= len(items):
+                return
+            items[task.index]["image_url"] = task.image_url
+            await db.write_section(task.content_id, task.section, items)
+            if task.section == "campaigns" and task.index == 0:
+                # The detailed campaign shows the first campaign's image
+                detailed_campaign = await db.read_section(task.content_id, "detailed_campaign")
+                if detailed_campaign is not None:
+                    detailed_campaign["image_url"] = task.image_url
+                    await db.write_section(task.content_id, "detailed_campaign", detailed_campaign)
+    job = jobs.get(task.content_id)
+    if job is not None and not job.finished:
+        job.emit("image", task.model_dump(include={"section", "index", "status", "image_url"}))
+
+# Images of generations with defer_images set, and images that failed during generation, generated after the text
+image_queue = ImageQueue(store_image, workers=int(os.getenv("MARKETMIND_IMAGE_WORKERS", "4")))
+# Serializes the read-modify-write of sections that deferred images are filled into
+image_slots_lock = asyncio.Lock()
+
+def sse_message(record: Optional[Dict]) -> str:
+    """Format an event log record as a Server-Sent Event; None becomes a keep-alive comment"""
+    if record is None:
+        return ": keep-alive\n\n"
+    return f"id: {record['id']}\nevent: {record['event']}\ndata: {json.dumps(record['data'])}\n\n"
+
+@app.get("/generate/{content_id}/events")
+async def generation_events(content_id: str, last_event_id: Optional[str] = Header(None)):
+    """Stream the progress of a generation as Server-Sent Events.
+
+    Every generated section, campaign image, market research part and persona
+    is pushed with its payload as soon as it is ready, followed by a final
+    "done" or "failed" event. Reconnecting clients resume after Last-Event-ID.
+    A generation run by another worker, or one that finished a while ago, is
+    followed through the store instead, with a "section" event per stored section.
+    """
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    job = jobs.get(content_id)
+
+    if job is not None and not job.events_released:
+        async def stream():
+            async for record in job.stream(after):
+                yield sse_message(record)
+    else:
+        # The job runs in another worker, or is gone from memory; follow what makes it into the store
+        await get_job(content_id)
+
+        async def stream():
+            sent = set()
+            index = 0
+            quiet_since = time.monotonic()
+            while True:
+                try:
+                    # Read before the sections, so a finished job's sections are all there
+                    status = await get_job(content_id)
+                except HTTPException:
+                    return
+                for section in SECTIONS:
+                    if section in sent:
+                        continue
+                    value = await db.read_section(content_id, section)
+                    if value is not None:
+                        sent.add(section)
+                        if after is None or index > after:
+                            yield sse_message({"id": index, "event": "section", "data": {"section": section, "data": value}})
+                            quiet_since = time.monotonic()
+                        index += 1
+                if status.status in ("done", "failed"):
+                    if after is None or index > after:
+                        yield sse_message({"id": index, "event": status.status, "data": status.model_dump()})
+                    return
+                if time.monotonic() - quiet_since >= 15.0:
+                    yield sse_message(None)
+                    quiet_since = time.monotonic()
+                await asyncio.sleep(jobs.poll_interval)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """Get the status and per-stage timings of a generation job"""
+    job = jobs.get(job_id)
+    if job is not None:
+        return job.status
+    # Queued, running and failed jobs of every worker keep a record
+    status = await jobs.load(job_id)
+    if status is not None:
+        return status
+
+    # Records of succeeded jobs are dropped; fall back to what made it into the store
+    content = await db.read(job_id)
+    if not isinstance(content, dict):
+        raise HTTPException(status_code=404, detail="Job not found")
+    complete = is_complete(content)
+    return JobStatus(
+        id=job_id,
+        status="done" if complete else "failed",
+        created_at=content.get("timestamp", ""),
+        error=None if complete else "Generation was interrupted",
+        # A section that was never stored may not have been reached, so it is not reported as failed
+        stages={
+            section: StageStatus(status="done" if content.get(section) is not None else "pending")
+            for section in SECTIONS
+        },
     )
-    
-    # Update database with generated content
-    db.update(content_id, {
-        "timestamp": timestamp,
-        "product_info": product_info.product_info,
-        "company_info": product_info.company_info,
-        "campaigns": [campaign.dict() for campaign in content["campaigns"].campaigns],
-        "detailed_campaign": content["detailed_campaign"].dict(),
-        "gtm_plan": content["gtm_plan"].dict(),
-        "personas": [persona.dict() for persona in content["personas"].personas],
-        "market_research": content["market_research"].dict(),
-        "executive_brief": content["executive_brief"].dict()
-    })
-    
-    return GenerationResponse(id=content_id, timestamp=timestamp)
+
+@app.get("/content/{content_id}/images", response_model=ContentImages)
+async def get_images(content_id: str):
+    """Get the campaign and persona images of a generation, including ones still being generated.
+
+    Images of generations with `defer_images` set, and images that failed or
+    timed out during generation, are retried from the image queue and land
+    here one by one after the text. An image that failed again, or was lost
+    to a restart, is "missing".
+    """
+    content = await db.read(content_id)
+    if not isinstance(content, dict):
+        raise HTTPException(status_code=404, detail="Content not found")
+    unfinished = {(task.section, task.index): task for task in image_queue.tasks_for(content_id)}
+
+    images = []
+    for section in ("campaigns", "personas"):
+        for index, item in enumerate(content.get(section) or []):
+            task = unfinished.get((section, index))
+            if task is not None:
+                status = task.status
+            else:
+                status = "done" if item.get("image_url") else "missing"
+            images.append(ImageSlot(
+                section=section, index=index, name=item.get("name", ""), status=status, image_url=item.get("image_url", "")
+            ))
+    return ContentImages(id=content_id, pending=len(unfinished), images=images)
 
 @app.post("/generate_detailed_campaign", response_model=DetailedCampaign)
-async def generate_detailed_campaign(product_info: str, campaign: Campaign):
+async def generate_detailed_campaign_endpoint(request: DetailedCampaignRequest):
     """Generate detailed campaign based on product and company information"""
-    
-    # Generate content in parallel
-    content = await generate_detailed_campaign(
-        product_info.product_info, campaign
-    )
-    
-    return content
+    return await generate_detailed_campaign_async(request.campaign, request.productInfo, request.companyInfo)
 
 @app.get("/content/{content_id}/campaigns", response_model=CampaignList)
 async def get_campaigns(content_id: str):
     """Get generated campaigns"""
-    content = db.read(content_id)
-    if not content or "campaigns" not in content:
+    campaigns = await db.read_section(content_id, "campaigns")
+    if campaigns is None:
         raise HTTPException(status_code=404, detail="Content not found")
-    return CampaignList(campaigns=[Campaign(**campaign) for campaign in content["campaigns"]])
+    return CampaignList(campaigns=[Campaign(**campaign) for campaign in campaigns])
 
 @app.get("/content/{content_id}/detailed-campaign", response_model=DetailedCampaign)
 async def get_detailed_campaign(content_id: str):
     """Get detailed campaign"""
-    content = db.read(content_id)
-    if not content or "detailed_campaign" not in content:
+    detailed_campaign = await db.read_section(content_id, "detailed_campaign")
+    if detailed_campaign is None:
         raise HTTPException(status_code=404, detail="Content not found")
-    return DetailedCampaign(**content["detailed_campaign"])
+    return DetailedCampaign(**detailed_campaign)
 
 @app.get("/content/{content_id}/gtm-plan", response_model=GTMPlan)
 async def get_gtm_plan(content_id: str):
     """Get GTM plan"""
-    content = db.read(content_id)
-    if not content or "gtm_plan" not in content:
+    gtm_plan = await db.read_section(content_id, "gtm_plan")
+    if gtm_plan is None:
         raise HTTPException(status_code=404, detail="Content not found")
-    return GTMPlan(**content["gtm_plan"])
+    return GTMPlan(**gtm_plan)
 
 @app.get("/content/{content_id}/personas", response_model=PersonaList)
 async def get_personas(content_id: str):
     """Get personas"""
-    content = db.read(content_id)
-    if not content or "personas" not in content:
+    personas = await db.read_section(content_id, "personas")
+    if personas is None:
         raise HTTPException(status_code=404, detail="Content not found")
-    return PersonaList(personas=[Persona(**persona) for persona in content["personas"]])
+    return PersonaList(personas=[Persona(**persona) for persona in personas])
 
 @app.get("/content/{content_id}/market-research", response_model=MarketResearch)
 async def get_market_research(content_id: str):
     """Get market research"""
-    content = db.read(content_id)
-    if not content or "market_research" not in content:
+    market_research = await db.read_section(content_id, "market_research")
+    if market_research is None:
         raise HTTPException(status_code=404, detail="Content not found")
-    return MarketResearch(**content["market_research"])
+    return MarketResearch(**market_research)
 
 @app.get("/content/{content_id}/executive-brief", response_model=ExecutiveBrief)
 async def get_executive_brief(content_id: str):
     """Get executive brief"""
-    content = db.read(content_id)
-    if not content or "executive_brief" not in content:
+    executive_brief = await db.read_section(content_id, "executive_brief")
+    if executive_brief is None:
         raise HTTPException(status_code=404, detail="Content not found")
-    return ExecutiveBrief(**content["executive_brief"])
-
-@app.get("/debug/content", response_model=Dict[str, Dict])
-async def get_all_content():
-    """Debug endpoint to view all generated content"""
-    return db.list_all()
+    return ExecutiveBrief(**executive_brief)
+
+def project_fields(content, fields: Optional[List[str]]):
+    """Keep only the requested top-level fields of a stored generation"""
+    if not fields or not isinstance(content, dict):
+        return content
+    return {field: content[field] for field in fields if field in content}
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    return [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+
+@app.get("/debug/content")
+async def get_all_content(cursor: Optional[str] = None, limit: Optional[int] = None, fields: Optional[str] = None):
+    """Debug endpoint to view generated content as a stream of id -> content
+
+    Pass the last id of a page as `cursor` to get the next page; a page with
+    fewer than `limit` entries is the last one. `fields` is a comma-separated
+    list of top-level fields to include.
+    """
+    field_list = parse_fields(fields)
+
+    async def stream():
+        yield "{"
+        separator = ""
+        async for content_id, content in db.iter_items(after=cursor, limit=limit):
+            yield f"{separator}{json.dumps(content_id)}: {json.dumps(project_fields(content, field_list))}"
+            separator = ", "
+        yield "}"
+
+    return StreamingResponse(stream(), media_type="application/json")
+
+@app.get("/debug/content/export")
+async def export_content(cursor: Optional[str] = None, fields: Optional[str] = None):
+    """Stream all generated content as NDJSON, one {"id", "content"} object per line, for backups"""
+    field_list = parse_fields(fields)
+
+    async def stream():
+        async for content_id, content in db.iter_items(after=cursor):
+            yield json.dumps({"id": content_id, "content": project_fields(content, field_list)}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/debug/metrics")
+async def get_metrics():
+    """Debug endpoint to view storage and cache statistics"""
+    return {
+        "db": db.stats(),
+        "retention": retention.stats() if retention else None,
+        "last_generation": last_generation_run,
+        "jobs": jobs.stats(),
+        "images": {**image_stats, "queue": image_queue.stats()},
+        "persona_prompts": prompt_stats,
+        "providers": budget_stats(),
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "schemas": schema_registry.stats(),
+        "http": pool_stats(),
+        "rate_limits": model_limiter.stats(),
+        "retries": llm_retrier.stats(),
+        "chat_streams": stream_stats.stats(),
+    }
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_with_persona(chat_request: ChatRequest):
-    """Chat with a persona using their system prompt"""
-    content = db.read(chat_request.content_id)
+async def persona_chat_messages(chat_request: ChatRequest) -> List[Dict[str, str]]:
+    """Build the LLM messages of a persona chat: the persona's system prompt, then the conversation"""
+    content = await db.read(chat_request.content_id)
     if not content:
         print(f"Content not found: {chat_request.content_id}")
         raise HTTPException(status_code=404, detail=f"Content not found: {chat_request.content_id}")
@@ -220,16 +720,51 @@ async def chat_with_persona(chat_request: ChatRequest):
     # Add user messages
     for msg in chat_request.messages:
         messages.append({"role": msg.role, "content": msg.content})
-    
+    return messages
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat_with_persona(chat_request: ChatRequest):
+    """Chat with a persona using their system prompt"""
+    messages = await persona_chat_messages(chat_request)
+
     # Get response from LLM
-    response = await llm_call_messages_async(messages, model="google/gemini-2.5-flash-preview")
+    response = await llm_call_messages_async(messages, model=CHAT_MODEL, cache=False)
     
     return ChatResponse(response=response)
 
+@app.post("/chat/stream")
+async def stream_chat_with_persona(chat_request: ChatRequest):
+    """Chat with a persona, streaming the response as Server-Sent Events.
+
+    Each "token" event carries the next piece of text as soon as the model
+    produces it. A final "done" event reports the time to first token and
+    tokens per second of the request, or an "error" event if the stream broke.
+    """
+    messages = await persona_chat_messages(chat_request)
+
+    async def stream():
+        metrics = StreamMetrics(model=CHAT_MODEL)
+        index = 0
+        try:
+            async for text in llm_stream_messages_async(messages, model=CHAT_MODEL, metrics=metrics):
+                yield sse_message({"id": index, "event": "token", "data": {"text": text}})
+                index += 1
+        except Exception as e:
+            print(f"Chat stream failed: {e}")
+            yield sse_message({"id": index, "event": "error", "data": {"detail": str(e)}})
+            return
+        yield sse_message({"id": index, "event": "done", "data": metrics.model_dump()})
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.post("/group-chat", response_model=GroupChatResponse)
 async def group_chat(chat_request: GroupChatRequest):
     """Generate responses from all personas for a given message"""
-    content = db.read(chat_request.content_id)
+    content = await db.read(chat_request.content_id)
     if not content:
         raise HTTPException(status_code=404, detail=f"Content not found: {chat_request.content_id}")
     
@@ -249,7 +784,7 @@ async def group_chat(chat_request: GroupChatRequest):
         ] + saved_messages
         
         # Get response from LLM
-        response = await llm_call_messages_async(messages, model="google/gemini-2.5-flash-preview")
+        response = await llm_call_messages_async(messages, model=CHAT_MODEL, cache=False)
         
         responses.append(PersonaResponse(
             persona_name=persona["name"],
@@ -269,7 +804,7 @@ class HeatmapResponse(BaseModel):
 @app.post("/heatmap", response_model=HeatmapResponse)
 async def heatmap(heatmap_request: HeatmapRequest):
     """Generate a heatmap for a given image and description"""
-    base64_heatmap = generate_heatmap(heatmap_request.image_url, heatmap_request.description)
+    base64_heatmap = await asyncio.to_thread(generate_heatmap, heatmap_request.image_url, heatmap_request.description)
     return HeatmapResponse(base64_heatmap=base64_heatmap)   
 
 
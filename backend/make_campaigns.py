@@ -1,7 +1,13 @@
-from models.llms import llm_call
-from models.images import generate_image
+import asyncio
+from models.llms import llm_call_async
+from models.schema_registry import schema_registry
+from models.images import generate_image_or_placeholder_async
+from concurrency import bounded, gather_cancelling, limit_from_env
 from pydantic import BaseModel
-from typing import List
+from typing import Callable, List, Optional
+
+# Maximum number of campaign images generated at once
+IMAGE_CONCURRENCY = limit_from_env("MARKETMIND_IMAGE_CONCURRENCY", 5)
 
 class BaseCampaign(BaseModel):
     name: str
@@ -37,7 +43,9 @@ class DetailedCampaign(BaseModel):
     risk_assessment: str
     success_metrics: List[str]
 
-def generate_base_campaigns(product_info: str, company_info: str) -> BaseCampaignList:
+schema_registry.register(BaseCampaignList, DetailedCampaign)
+
+async def generate_base_campaigns_async(product_info: str, company_info: str) -> BaseCampaignList:
     prompt = f"""Generate 5 unique and creative ad campaign ideas for the following product and company:
 
     Product Information:
@@ -59,7 +67,7 @@ def generate_base_campaigns(product_info: str, company_info: str) -> BaseCampaig
     Each campaign should be distinct and cover different marketing approaches while maintaining brand consistency.
     Focus on modern, relevant concepts that would resonate with the target audience and highlight the product's unique selling points."""
     
-    structured_response = llm_call(
+    structured_response = await llm_call_async(
         prompt,
         system_prompt=system_prompt,
         response_format=BaseCampaignList
@@ -67,9 +75,13 @@ def generate_base_campaigns(product_info: str, company_info: str) -> BaseCampaig
     
     return structured_response
 
-def generate_campaign_with_image(base_campaign: BaseCampaign) -> Campaign:
-    # Generate image prompt based on campaign details
-    image_prompt = f"""Create a single, focused image that captures the essence of this campaign:
+def generate_base_campaigns(product_info: str, company_info: str) -> BaseCampaignList:
+    """Blocking wrapper around `generate_base_campaigns_async`."""
+    return asyncio.run(generate_base_campaigns_async(product_info, company_info))
+
+def campaign_image_prompt(base_campaign: BaseCampaign) -> str:
+    """Image prompt based on campaign details"""
+    return f"""Create a single, focused image that captures the essence of this campaign:
     Name: {base_campaign.name}
     Concept: {base_campaign.concept}
 
@@ -77,9 +89,13 @@ def generate_campaign_with_image(base_campaign: BaseCampaign) -> Campaign:
     Keep the composition simple and impactful - one main subject with a complementary background that tells the story.
     
     IMPORTANT: The image must be purely visual with no text, words, or numbers. Focus on a single, powerful visual that conveys the message through composition and visual elements only."""
+
+async def generate_campaign_with_image_async(base_campaign: BaseCampaign, timeout: Optional[float] = None) -> Campaign:
+    # Generate image prompt based on campaign details
+    image_prompt = campaign_image_prompt(base_campaign)
     
-    # Generate image with specific model
-    image_url = generate_image(image_prompt, model="fal-ai/flux/schnell")
+    # Generate image with specific model; a failed or slow image gets a placeholder
+    image_url = await generate_image_or_placeholder_async(image_prompt, model="fal-ai/flux/schnell", timeout=timeout)
     
     # Create Campaign object with image URL
     return Campaign(
@@ -91,19 +107,52 @@ def generate_campaign_with_image(base_campaign: BaseCampaign) -> Campaign:
         image_url=image_url
     )
 
-def generate_campaign_ideas(product_info: str, company_info: str) -> CampaignList:
+def generate_campaign_with_image(base_campaign: BaseCampaign, timeout: Optional[float] = None) -> Campaign:
+    """Blocking wrapper around `generate_campaign_with_image_async`."""
+    return asyncio.run(generate_campaign_with_image_async(base_campaign, timeout))
+
+async def generate_campaign_images_async(
+    base_campaigns: List[BaseCampaign],
+    concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    on_campaign: Optional[Callable[[int, Campaign], None]] = None,
+) -> List[Campaign]:
+    """
+    Generate the images of several campaigns at once.
+
+    Args:
+        base_campaigns (List[BaseCampaign]): Campaigns to illustrate
+        concurrency (int, optional): Maximum number of images generated at once. Defaults to IMAGE_CONCURRENCY.
+        timeout (float, optional): Seconds to wait for each image before using a placeholder
+        on_campaign (Callable, optional): Called with the index and campaign as each image is ready
+
+    Returns:
+        List[Campaign]: Campaigns with their images, in the order of `base_campaigns`
+    """
+    limit = asyncio.Semaphore(concurrency or IMAGE_CONCURRENCY)
+
+    async def with_image(index: int, base_campaign: BaseCampaign) -> Campaign:
+        campaign = await bounded(limit, generate_campaign_with_image_async(base_campaign, timeout))
+        if on_campaign is not None:
+            on_campaign(index, campaign)
+        return campaign
+
+    return await gather_cancelling(*(with_image(index, campaign) for index, campaign in enumerate(base_campaigns)))
+
+async def generate_campaign_ideas_async(product_info: str, company_info: str) -> CampaignList:
     # First generate base campaigns
-    base_campaigns = generate_base_campaigns(product_info, company_info)
+    base_campaigns = await generate_base_campaigns_async(product_info, company_info)
     
-    # Then generate images for each campaign
-    campaigns_with_images = []
-    for base_campaign in base_campaigns.campaigns:
-        campaign_with_image = generate_campaign_with_image(base_campaign)
-        campaigns_with_images.append(campaign_with_image)
+    # Then generate images for all campaigns at once
+    campaigns_with_images = await generate_campaign_images_async(base_campaigns.campaigns)
     
     return CampaignList(campaigns=campaigns_with_images)
 
-def generate_detailed_campaign(campaign: Campaign, product_info: str, company_info: str) -> DetailedCampaign:
+def generate_campaign_ideas(product_info: str, company_info: str) -> CampaignList:
+    """Blocking wrapper around `generate_campaign_ideas_async`."""
+    return asyncio.run(generate_campaign_ideas_async(product_info, company_info))
+
+async def generate_detailed_campaign_async(campaign: Campaign, product_info: str, company_info: str) -> DetailedCampaign:
     prompt = f"""Generate a detailed marketing campaign plan for the following campaign, product, and company:
 
     Campaign Information:
@@ -136,7 +185,7 @@ def generate_detailed_campaign(campaign: Campaign, product_info: str, company_in
     Focus on practical implementation while maintaining creative excellence and brand consistency.
     Provide specific, measurable, and realistic recommendations that leverage the product's unique selling points."""
     
-    structured_response = llm_call(
+    structured_response = await llm_call_async(
         prompt,
         system_prompt=system_prompt,
         response_format=DetailedCampaign
@@ -144,6 +193,10 @@ def generate_detailed_campaign(campaign: Campaign, product_info: str, company_in
     
     return structured_response
 
+def generate_detailed_campaign(campaign: Campaign, product_info: str, company_info: str) -> DetailedCampaign:
+    """Blocking wrapper around `generate_detailed_campaign_async`."""
+    return asyncio.run(generate_detailed_campaign_async(campaign, product_info, company_info))
+
 if __name__ == "__main__":
     # Example product and company information as strings
     product_info = """
@@ -1,7 +1,19 @@
+import asyncio
+import os
+import openai
 from pydantic import BaseModel
-from typing import Dict, List
-from models.llms import llm_call
-from models.images import generate_image
+from typing import Callable, Dict, List, Optional, Tuple
+from models.llms import llm_call_async
+from models.schema_registry import schema_registry
+from models.images import IMAGE_PLACEHOLDER, generate_image_or_placeholder_async
+from concurrency import bounded, gather_cancelling, limit_from_env
+
+# Maximum number of chat prompt and image calls in flight while enriching personas
+PERSONA_CONCURRENCY = limit_from_env("MARKETMIND_PERSONA_CONCURRENCY", 6)
+# Seconds to wait for each attempt at a persona's chat system prompt, once the call has a slot
+PROMPT_TIMEOUT_S = float(os.getenv("MARKETMIND_PERSONA_PROMPT_TIMEOUT_S", "60"))
+# Outcomes of chat system prompt generation, for /debug/metrics
+prompt_stats = {"generated": 0, "failed": 0, "timed_out": 0}
 
 class BasePersona(BaseModel):
     name: str
@@ -19,6 +31,8 @@ class Persona(BasePersona):
     chat_system_prompt: str
     image_url: str
     messages: List[Dict[str, str]]
+    # done, or timed_out / failed when chat_system_prompt is the fallback from the persona's fields
+    chat_prompt_status: str = "done"
 
 class BasePersonaList(BaseModel):
     personas: List[BasePersona]
@@ -26,7 +40,9 @@ class BasePersonaList(BaseModel):
 class PersonaList(BaseModel):
     personas: List[Persona]
 
-def generate_base_personas(campaign_description: str) -> BasePersonaList:
+schema_registry.register(BasePersonaList)
+
+async def generate_base_personas_async(campaign_description: str) -> BasePersonaList:
     """
     Generate a list of base personas based on the campaign description.
     
@@ -66,18 +82,23 @@ def generate_base_personas(campaign_description: str) -> BasePersonaList:
     
     """
     
-    return llm_call(
+    return await llm_call_async(
         prompt=persona_prompt,
         system_prompt=persona_system_prompt,
         response_format=BasePersonaList
     )
 
-def generate_chat_system_prompt(persona: BasePersona) -> str:
+def generate_base_personas(campaign_description: str) -> BasePersonaList:
+    """Blocking wrapper around `generate_base_personas_async`."""
+    return asyncio.run(generate_base_personas_async(campaign_description))
+
+async def generate_chat_system_prompt_async(persona: BasePersona, timeout: Optional[float] = None) -> str:
     """
     Generate a chat system prompt for a given persona.
     
     Args:
         persona (BasePersona): The base persona to generate a chat prompt for
+        timeout (Optional[float]): Seconds to wait for each attempt at the LLM call, not counting time queued for a slot
         
     Returns:
         str: The generated chat system prompt
@@ -119,7 +140,17 @@ def generate_chat_system_prompt(persona: BasePersona) -> str:
     - Avoids AI-like behaviors (excessive helpfulness, question-asking)
     - Produces interactions that feel like chatting with a real consumer"""
 
-    response_guidelines = """
+    response = await llm_call_async(
+        prompt=chat_prompt,
+        system_prompt=chat_system_prompt,
+        timeout=timeout,
+    )
+
+    response += RESPONSE_GUIDELINES
+
+    return response
+
+RESPONSE_GUIDELINES = """
     IMPLEMENTATION RULES:
     1. RESPONSES: Brief (1-3 sentences), match vocabulary to demographic, include occasional filler words
     2. INFORMATION: Only share personal details when asked, reveal preferences gradually
@@ -129,66 +160,115 @@ def generate_chat_system_prompt(persona: BasePersona) -> str:
 
     The persona represents a specific consumer, not an assistant. Responses should mirror how this real person would naturally communicate.
     """
-    
-    response = llm_call(
-        prompt=chat_prompt,
-        system_prompt=chat_system_prompt
-    )
 
-    response += response_guidelines
+def fallback_chat_system_prompt(persona: BasePersona) -> str:
+    """Chat system prompt built from the persona's fields, for when generating one fails"""
+    return f"""You are {persona.name}, a {persona.age}-year-old {persona.occupation} with a {persona.income_level} income.
+    Your interests are {', '.join(persona.interests)}. Your pain points are {', '.join(persona.pain_points)}.
+    Your goals are {', '.join(persona.goals)}. You hear about products through {', '.join(persona.preferred_channels)}.
+    Buying behavior: {persona.buying_behavior}. Brands you like: {', '.join(persona.brand_preferences)}.
+    You are chatting as yourself, a real consumer, never as an assistant.
+    """ + RESPONSE_GUIDELINES
 
-    return response
+def generate_chat_system_prompt(persona: BasePersona) -> str:
+    """Blocking wrapper around `generate_chat_system_prompt_async`."""
+    return asyncio.run(generate_chat_system_prompt_async(persona))
 
-def generate_persona_image(persona: BasePersona, model: str = "fal-ai/flux/schnell") -> str:
-    """
-    Generate an image for a given persona.
-    
-    Args:
-        persona (BasePersona): The persona to generate an image for
-        model (str): The model to use for image generation. Defaults to "fal-ai/flux/schnell"
-        
-    Returns:
-        str: URL of the generated image
-    """
+def persona_image_prompt(persona: BasePersona) -> str:
+    """Portrait prompt for a persona, with any special characters removed"""
     # Clean any special characters from the persona fields
     clean_name = ''.join(c for c in persona.name if ord(c) < 128)
     clean_occupation = ''.join(c for c in persona.occupation if ord(c) < 128)
     clean_income = ''.join(c for c in persona.income_level if ord(c) < 128)
     clean_interests = [''.join(c for c in interest if ord(c) < 128) for interest in persona.interests]
     
-    image_prompt = f"""
+    return f"""
     Create a realistic portrait of {clean_name}, a {persona.age}-year-old {clean_occupation.lower()}.
     They should appear {clean_income.lower()} and have a personality that matches their interests: {', '.join(clean_interests)}.
     The image should be professional and suitable for a marketing persona.
     Make sure to accurately represent their demographic characteristics based on their name.
     """
+
+async def generate_persona_image_async(
+    persona: BasePersona, model: str = "fal-ai/flux/schnell", timeout: Optional[float] = None
+) -> str:
+    """
+    Generate an image for a given persona.
     
-    image_url = generate_image(image_prompt, model="fal-ai/flux/schnell")
+    Args:
+        persona (BasePersona): The persona to generate an image for
+        model (str): The model to use for image generation. Defaults to "fal-ai/flux/schnell"
+        timeout (float, optional): Seconds to wait for the image before using a placeholder
+        
+    Returns:
+        str: URL of the generated image, or a placeholder if it failed or timed out
+    """
+    image_prompt = persona_image_prompt(persona)
+    image_url = await generate_image_or_placeholder_async(image_prompt, model="fal-ai/flux/schnell", timeout=timeout)
     return image_url
 
-def generate_personas(campaign_description: str) -> PersonaList:
+def generate_persona_image(persona: BasePersona, model: str = "fal-ai/flux/schnell") -> str:
+    """Blocking wrapper around `generate_persona_image_async`."""
+    return asyncio.run(generate_persona_image_async(persona, model))
+
+async def generate_personas_async(
+    campaign_description: str,
+    on_progress: Optional[Callable[[int, Persona], None]] = None,
+    concurrency: Optional[int] = None,
+    with_images: bool = True,
+) -> PersonaList:
     """
     Generate a list of personas with chat system prompts and images based on the campaign description.
     
     Args:
         campaign_description (str): Description of the ad campaign
+        on_progress (Callable, optional): Called with the index and value of each persona as it completes
+        concurrency (int, optional): Maximum number of prompt and image calls at once. Defaults to PERSONA_CONCURRENCY.
+        with_images (bool): Generate portraits; otherwise every image_url is IMAGE_PLACEHOLDER, to be filled in later
         
+    A persona whose chat system prompt fails or times out is kept with a
+    prompt built from its fields, and `chat_prompt_status` says why.
+
     Returns:
-        PersonaList: List of generated personas with chat system prompts and images
+        PersonaList: List of generated personas with chat system prompts and images, in the order the base personas were generated
     """
     # First generate base personas
-    base_personas = generate_base_personas(campaign_description)
+    base_personas = await generate_base_personas_async(campaign_description)
     
-    # Then create full personas with chat system prompts and images
-    personas = []
-    for base_persona in base_personas.personas:
-        chat_system_prompt = generate_chat_system_prompt(base_persona)
-        image_url = generate_persona_image(base_persona)
+    # Then enrich every persona at once, with its chat system prompt and image also generated side by side
+    limit = asyncio.Semaphore(concurrency or PERSONA_CONCURRENCY)
+
+    async def chat_system_prompt_for(base_persona: BasePersona) -> Tuple[str, str]:
+        """The persona's chat system prompt and its status; a failed or slow prompt falls back to the persona's fields"""
+        try:
+            chat_system_prompt = await generate_chat_system_prompt_async(base_persona, timeout=PROMPT_TIMEOUT_S)
+        except openai.APITimeoutError:
+            print(f"Chat system prompt for {base_persona.name} timed out ({PROMPT_TIMEOUT_S}s per attempt), using a fallback")
+            prompt_stats["timed_out"] += 1
+            return fallback_chat_system_prompt(base_persona), "timed_out"
+        except Exception as e:
+            print(f"Error generating chat system prompt for {base_persona.name}, using a fallback: {e}")
+            prompt_stats["failed"] += 1
+            return fallback_chat_system_prompt(base_persona), "failed"
+        prompt_stats["generated"] += 1
+        return chat_system_prompt, "done"
+
+    async def image_for(base_persona: BasePersona) -> str:
+        if not with_images:
+            return IMAGE_PLACEHOLDER
+        return await bounded(limit, generate_persona_image_async(base_persona))
+
+    async def enrich(index: int, base_persona: BasePersona) -> Persona:
+        (chat_system_prompt, chat_prompt_status), image_url = await gather_cancelling(
+            bounded(limit, chat_system_prompt_for(base_persona)),
+            image_for(base_persona),
+        )
         
         # Create a new Persona by extending the base persona with the chat system prompt and image
         persona = Persona(
             **base_persona.model_dump(),
             chat_system_prompt=chat_system_prompt,
+            chat_prompt_status=chat_prompt_status,
             image_url=image_url,
             messages=[
                 {
@@ -197,10 +277,20 @@ def generate_personas(campaign_description: str) -> PersonaList:
                 },
             ]
         )
-        personas.append(persona)
+        if on_progress is not None:
+            on_progress(index, persona)
+        return persona
+
+    personas = await gather_cancelling(
+        *(enrich(index, base_persona) for index, base_persona in enumerate(base_personas.personas))
+    )
     
     return PersonaList(personas=personas)
 
+def generate_personas(campaign_description: str) -> PersonaList:
+    """Blocking wrapper around `generate_personas_async`."""
+    return asyncio.run(generate_personas_async(campaign_description))
+
 if __name__ == "__main__":
     # Example usage
     campaign = """
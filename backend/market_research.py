@@ -1,8 +1,15 @@
+import asyncio
 from models.agents import Agent
 from models.tool_registry import tool_registry
-from models.llms import llm_call
+from models.llms import llm_call_async
+from models.schema_registry import schema_registry
+from concurrency import bounded, gather_cancelling, limit_from_env
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Awaitable, Callable, List, Optional
+
+
+# Maximum number of research calls conduct_market_research runs at once
+RESEARCH_CONCURRENCY = limit_from_env("MARKETMIND_RESEARCH_CONCURRENCY", 4)
 
 
 class Competitor(BaseModel):
@@ -73,9 +80,12 @@ class MarketResearch(BaseModel):
     influencers: MarketInfluencers
     summary: str
 
+schema_registry.register(
+    CompetitorList, MarketSize, MarketDemographics, RegulatoryEnvironment, MarketTrends, PainPoints, MarketInfluencers
+)
 
 
-def research_competitors(product_description: str, company_description: str) -> List[Competitor]:
+async def research_competitors_async(product_description: str, company_description: str) -> List[Competitor]:
     prompt = f"""
     Based on the following product and company descriptions, identify and analyze key competitors (both current and past).
     For each competitor, provide concise information, where each idea is in as few words as possible following this exact structure:
@@ -107,14 +117,18 @@ def research_competitors(product_description: str, company_description: str) ->
     If market share is unknown, provide a reasonable estimate based on available information.
     For defunct competitors, provide detailed reasons for their failure."""
     
-    competitor_list = llm_call(
+    competitor_list = await llm_call_async(
         prompt=prompt,
         system_prompt=system_prompt,
         response_format=CompetitorList
     )
     return competitor_list.competitor
 
-def research_market_size(product_description: str) -> MarketSize:
+def research_competitors(product_description: str, company_description: str) -> List[Competitor]:
+    """Blocking wrapper around `research_competitors_async`."""
+    return asyncio.run(research_competitors_async(product_description, company_description))
+
+async def research_market_size_async(product_description: str) -> MarketSize:
     prompt = f"""
     Analyze the market size and growth potential for the following product, providing concise information following this exact structure:
     
@@ -148,7 +162,7 @@ def research_market_size(product_description: str) -> MarketSize:
         tools=[tool_registry.get_tool("web_search")]
     )
     
-    agent_response = search_agent.call(prompt)
+    agent_response = await search_agent.call_async(prompt)
 
     json_parser_prompt = f"""
     Parse the following response into a MarketSize object with the following structure:
@@ -162,13 +176,17 @@ def research_market_size(product_description: str) -> MarketSize:
     {agent_response} 
     """
 
-    return llm_call(
+    return await llm_call_async(
         prompt=json_parser_prompt,
         response_format=MarketSize
     )
+
+def research_market_size(product_description: str) -> MarketSize:
+    """Blocking wrapper around `research_market_size_async`."""
+    return asyncio.run(research_market_size_async(product_description))
         
 
-def research_demographics(product_description: str) -> MarketDemographics:
+async def research_demographics_async(product_description: str) -> MarketDemographics:
     prompt = f"""
     Analyze the target demographics for the following product, providing concise information following this exact structure:
     
@@ -190,13 +208,17 @@ def research_demographics(product_description: str) -> MarketDemographics:
     Ensure all lists contain meaningful, specific entries.
     Include a diverse range of demographic segments where applicable."""
     
-    return llm_call(
+    return await llm_call_async(
         prompt=prompt,
         system_prompt=system_prompt,
         response_format=MarketDemographics
     )
 
-def research_regulatory_environment(product_description: str) -> RegulatoryEnvironment:
+def research_demographics(product_description: str) -> MarketDemographics:
+    """Blocking wrapper around `research_demographics_async`."""
+    return asyncio.run(research_demographics_async(product_description))
+
+async def research_regulatory_environment_async(product_description: str) -> RegulatoryEnvironment:
     prompt = f"""
     Analyze the regulatory environment for the following product, providing concise information following this exact structure:
     
@@ -225,7 +247,7 @@ def research_regulatory_environment(product_description: str) -> RegulatoryEnvir
         tools=[tool_registry.get_tool("web_search")]
     )
 
-    agent_response = search_agent.call(prompt)
+    agent_response = await search_agent.call_async(prompt)
 
     json_parser_prompt = f"""
     Parse the following response into a RegulatoryEnvironment object with the following structure:
@@ -238,12 +260,16 @@ def research_regulatory_environment(product_description: str) -> RegulatoryEnvir
     {agent_response} 
     """
 
-    return llm_call(
+    return await llm_call_async(
         prompt=json_parser_prompt,
         response_format=RegulatoryEnvironment
     )
 
-def research_trends(product_description: str) -> MarketTrends:
+def research_regulatory_environment(product_description: str) -> RegulatoryEnvironment:
+    """Blocking wrapper around `research_regulatory_environment_async`."""
+    return asyncio.run(research_regulatory_environment_async(product_description))
+
+async def research_trends_async(product_description: str) -> MarketTrends:
     prompt = f"""
     Analyze current and emerging trends relevant to the following product, providing concise information following this exact structure:
     
@@ -273,7 +299,7 @@ def research_trends(product_description: str) -> MarketTrends:
         tools=[tool_registry.get_tool("web_search")]
     )
     
-    agent_response = search_agent.call(prompt)
+    agent_response = await search_agent.call_async(prompt)
 
     json_parser_prompt = f"""
     Parse the following response into a MarketTrends object with the following structure. Each trend should be a string of max 80 characters:
@@ -286,12 +312,16 @@ def research_trends(product_description: str) -> MarketTrends:
     {agent_response} 
     """
 
-    return llm_call(
+    return await llm_call_async(
         prompt=json_parser_prompt,
         response_format=MarketTrends
     )
 
-def research_pain_points(product_description: str) -> PainPoints:
+def research_trends(product_description: str) -> MarketTrends:
+    """Blocking wrapper around `research_trends_async`."""
+    return asyncio.run(research_trends_async(product_description))
+
+async def research_pain_points_async(product_description: str) -> PainPoints:
     prompt = f"""
     Analyze the pain points and problems in the market for the following product, providing information following this exact structure:
     
@@ -313,13 +343,17 @@ def research_pain_points(product_description: str) -> PainPoints:
     Ensure all lists contain specific, concise, and actionable problems and solutions.
     Focus on both immediate and systemic issues."""
     
-    return llm_call(
+    return await llm_call_async(
         prompt=prompt,
         system_prompt=system_prompt,
         response_format=PainPoints
     )
 
-def research_influencers(product_description: str) -> MarketInfluencers:
+def research_pain_points(product_description: str) -> PainPoints:
+    """Blocking wrapper around `research_pain_points_async`."""
+    return asyncio.run(research_pain_points_async(product_description))
+
+async def research_influencers_async(product_description: str) -> MarketInfluencers:
     prompt = f"""
     Identify key influencers and opinion leaders in the market for the following product, providing information following this exact structure:
     
@@ -341,19 +375,30 @@ def research_influencers(product_description: str) -> MarketInfluencers:
     Ensure all lists contain specific, concise, and relevant influencers and outlets.
     Include both traditional and digital influencers where applicable."""
     
-    return llm_call(
+    return await llm_call_async(
         prompt=prompt,
         system_prompt=system_prompt,
         response_format=MarketInfluencers
     )
 
-def conduct_market_research(product_description: str, company_description: str) -> MarketResearch:
+def research_influencers(product_description: str) -> MarketInfluencers:
+    """Blocking wrapper around `research_influencers_async`."""
+    return asyncio.run(research_influencers_async(product_description))
+
+async def conduct_market_research_async(
+    product_description: str,
+    company_description: str,
+    on_progress: Optional[Callable[[str, Any], None]] = None,
+    concurrency: Optional[int] = None,
+) -> MarketResearch:
     """
     Conduct comprehensive market research for a product and company.
     
     Args:
         product_description (str): Description of the product
         company_description (str): Description of the company
+        on_progress (Callable, optional): Called with the field name and value of each part of the research as it completes
+        concurrency (int, optional): Maximum number of parts researched at once. Defaults to RESEARCH_CONCURRENCY.
         
     Returns:
         MarketResearch: Comprehensive market research data
@@ -370,46 +415,66 @@ def conduct_market_research(product_description: str, company_description: str)
     DO NOT SAY "Market Research" or "Market Research Report" or anything similar.
     """
     
-    system_prompt = """You are a market research expert specializing in creating clear and descriptive titles.
+    title_system_prompt = """You are a market research expert specializing in creating clear and descriptive titles.
     Create a concise title that accurately represents the market being researched."""
-    
-    title = llm_call(
-        prompt=title_prompt,
-        system_prompt=system_prompt
+
+    # Every part is independent except the summary, so they all run at once, at most `concurrency` at a time
+    limit = asyncio.Semaphore(concurrency or RESEARCH_CONCURRENCY)
+
+    async def research(part: str, call: Awaitable[Any]) -> Any:
+        value = await bounded(limit, call)
+        if on_progress is not None:
+            on_progress(part, value)
+        return value
+
+    title = asyncio.ensure_future(
+        research("title", llm_call_async(prompt=title_prompt, system_prompt=title_system_prompt))
     )
-    
-    competitors = research_competitors(product_description, company_description)
-    market_size = research_market_size(product_description)
-    demographics = research_demographics(product_description)
-    regulatory_environment = research_regulatory_environment(product_description)
-    trends = research_trends(product_description)
-    pain_points = research_pain_points(product_description)
-    influencers = research_influencers(product_description)
-    
-    # Generate a summary of the research
-    summary_prompt = f"""
-    Create a brief market summary:
-    
-    Product: {product_description}
-    Company: {company_description}
-    
-    Market Size: {market_size.model_dump_json()}
-    Demographics: {demographics.model_dump_json()}
-    Regulatory Environment: {regulatory_environment.model_dump_json()}
-    Trends: {trends.model_dump_json()}
-    Pain Points: {pain_points.model_dump_json()}
-    Influencers: {influencers.model_dump_json()}
-    
-    Keep it under 3 sentences.
-    """
-    
-    system_prompt = """You are a market research expert specializing in creating comprehensive research summaries.
-    Create a detailed, well-structured summary that highlights the most important findings and insights."""
-    
-    summary = llm_call(
-        prompt=summary_prompt,
-        system_prompt=system_prompt
+    competitors = asyncio.ensure_future(
+        research("competitors", research_competitors_async(product_description, company_description))
     )
+    summary_inputs = [
+        asyncio.ensure_future(research(part, call))
+        for part, call in (
+            ("market_size", research_market_size_async(product_description)),
+            ("demographics", research_demographics_async(product_description)),
+            ("regulatory_environment", research_regulatory_environment_async(product_description)),
+            ("trends", research_trends_async(product_description)),
+            ("pain_points", research_pain_points_async(product_description)),
+            ("influencers", research_influencers_async(product_description)),
+        )
+    ]
+
+    async def summarize() -> str:
+        # Starts as soon as its inputs are in, even if the title or competitors are still running
+        market_size, demographics, regulatory_environment, trends, pain_points, influencers = await asyncio.gather(
+            *summary_inputs
+        )
+
+        # Generate a summary of the research
+        summary_prompt = f"""
+        Create a brief market summary:
+        
+        Product: {product_description}
+        Company: {company_description}
+        
+        Market Size: {market_size.model_dump_json()}
+        Demographics: {demographics.model_dump_json()}
+        Regulatory Environment: {regulatory_environment.model_dump_json()}
+        Trends: {trends.model_dump_json()}
+        Pain Points: {pain_points.model_dump_json()}
+        Influencers: {influencers.model_dump_json()}
+        
+        Keep it under 3 sentences.
+        """
+        
+        summary_system_prompt = """You are a market research expert specializing in creating comprehensive research summaries.
+        Create a detailed, well-structured summary that highlights the most important findings and insights."""
+
+        return await research("summary", llm_call_async(prompt=summary_prompt, system_prompt=summary_system_prompt))
+
+    title, competitors, summary, *sections = await gather_cancelling(title, competitors, summarize(), *summary_inputs)
+    market_size, demographics, regulatory_environment, trends, pain_points, influencers = sections
     
     return MarketResearch(
         title=title,
@@ -423,6 +488,10 @@ def conduct_market_research(product_description: str, company_description: str)
         summary=summary
     )
 
+def conduct_market_research(product_description: str, company_description: str) -> MarketResearch:
+    """Blocking wrapper around `conduct_market_research_async`."""
+    return asyncio.run(conduct_market_research_async(product_description, company_description))
+
 if __name__ == "__main__":
     # Example usage
     product_description = """
@@ -0,0 +1,73 @@
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+from concurrency import limit_from_env
+
+
+class ProviderBudget:
+    """Caps how many calls to one provider are in flight at once, across every generation.
+
+    Like the async clients, the semaphore is kept per event loop, since the
+    sync wrappers run each call in a loop of its own.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_in_flight = 0
+        self.calls = 0
+        self.wait_seconds = 0.0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the provider's slots for the duration of a call."""
+        semaphore = self._semaphore()
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.wait_seconds += time.perf_counter() - start
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "calls": self.calls,
+            "wait_seconds": self.wait_seconds,
+        }
+
+
+openrouter_budget = ProviderBudget("openrouter", limit_from_env("MARKETMIND_OPENROUTER_CONCURRENCY", 16))
+fal_budget = ProviderBudget("fal", limit_from_env("MARKETMIND_FAL_CONCURRENCY", 8))
+
+
+def budget_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats of every provider budget, for /debug/metrics."""
+    return {budget.name: budget.stats() for budget in (openrouter_budget, fal_budget)}
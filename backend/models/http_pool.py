@@ -0,0 +1,134 @@
+import importlib.util
+import os
+import threading
+import weakref
+from typing import Any, Dict
+
+import httpx
+
+# HTTP/2 multiplexes concurrent calls over one connection, but needs the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def pool_limits() -> httpx.Limits:
+    """Connection pool limits from the MARKETMIND_HTTP_* environment variables."""
+    return httpx.Limits(
+        max_connections=int(os.getenv("MARKETMIND_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("MARKETMIND_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("MARKETMIND_HTTP_KEEPALIVE_EXPIRY_S", "60")),
+    )
+
+
+def default_timeout() -> httpx.Timeout:
+    """Timeouts of every call that does not set its own."""
+    return httpx.Timeout(
+        float(os.getenv("MARKETMIND_HTTP_TIMEOUT_S", "120")),
+        connect=float(os.getenv("MARKETMIND_HTTP_CONNECT_TIMEOUT_S", "10")),
+    )
+
+
+def use_http2() -> bool:
+    return HTTP2_AVAILABLE and os.getenv("MARKETMIND_HTTP2", "1").lower() not in ("0", "false", "no")
+
+
+class PoolStats:
+    """Counts requests and new connections of the clients sharing a pool name.
+
+    Connections opened are counted from httpcore's trace events, so the
+    difference from the request count is how many requests reused a warm
+    connection.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.clients = 0
+        self._lock = threading.Lock()
+        self._pools: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+    def _count(self, event: str) -> None:
+        with self._lock:
+            if event == "connection.connect_tcp.complete":
+                self.connections_opened += 1
+            elif event == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def _on_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def sync_client(self) -> httpx.Client:
+        """Create a pooled client whose traffic counts towards these stats."""
+        def trace(event: str, info: Dict[str, Any]) -> None:
+            self._count(event)
+
+        def on_request(request: httpx.Request) -> None:
+            self._on_request(request)
+            request.extensions["trace"] = trace
+
+        client = httpx.Client(
+            limits=pool_limits(), timeout=default_timeout(), http2=use_http2(), event_hooks={"request": [on_request]}
+        )
+        self._track(client)
+        return client
+
+    def async_client(self) -> httpx.AsyncClient:
+        """Async version of `sync_client`."""
+        async def trace(event: str, info: Dict[str, Any]) -> None:
+            self._count(event)
+
+        async def on_request(request: httpx.Request) -> None:
+            self._on_request(request)
+            request.extensions["trace"] = trace
+
+        client = httpx.AsyncClient(
+            limits=pool_limits(), timeout=default_timeout(), http2=use_http2(), event_hooks={"request": [on_request]}
+        )
+        self._track(client)
+        return client
+
+    def _track(self, client: Any) -> None:
+        with self._lock:
+            self.clients += 1
+            # httpx does not expose its pool, so open connections are read from the transport when available
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            if pool is not None:
+                self._pools.add(pool)
+
+    def stats(self) -> Dict[str, Any]:
+        open_connections = 0
+        idle_connections = 0
+        with self._lock:
+            for pool in list(self._pools):
+                for connection in getattr(pool, "connections", []):
+                    if connection.is_closed():
+                        continue
+                    open_connections += 1
+                    idle_connections += connection.is_idle()
+            reused = self.requests - self.connections_opened
+            return {
+                "clients": self.clients,
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "tls_handshakes": self.tls_handshakes,
+                "reuse_rate": max(reused, 0) / self.requests if self.requests else 0.0,
+                "open_connections": open_connections,
+                "idle_connections": idle_connections,
+            }
+
+
+openrouter_pool = PoolStats("openrouter")
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Pool settings and stats, for /debug/metrics."""
+    limits = pool_limits()
+    return {
+        "http2": use_http2(),
+        "max_connections": limits.max_connections,
+        "max_keepalive_connections": limits.max_keepalive_connections,
+        "keepalive_expiry": limits.keepalive_expiry,
+        openrouter_pool.name: openrouter_pool.stats(),
+    }
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import fal_client
 from pydantic import BaseModel, Field
@@ -11,10 +12,17 @@ import os
 import time
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
+from models.budget import fal_budget
 
 
 # text_model = "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo"
 image_model = "fal-ai/flux/schnell"
+# Seconds to wait for a single image before giving up on it
+image_timeout = float(os.getenv("MARKETMIND_IMAGE_TIMEOUT_S", "60"))
+# Image URL of content whose image failed or timed out, so it can be filled in later
+IMAGE_PLACEHOLDER = ""
+# Outcomes of generate_image_or_placeholder_async, for /debug/metrics
+image_stats = {"generated": 0, "failed": 0, "timed_out": 0}
 # image_to_image_model = "fal-ai/flux/schnell/redux"
 
 # client = Together()
@@ -81,6 +89,72 @@ def generate_image(prompt: str, model: str = image_model):
 
 
 
+async def generate_image_async(prompt: str, model: str = image_model, timeout: float = None):
+    """
+    Generate an image using fal.ai's async client, without blocking the event loop.
+    
+    Args:
+        prompt (str): The text prompt describing the image to generate
+        model (str): The model to use for generation
+        timeout (float, optional): Seconds to wait for the image once the fal budget has a free slot
+        
+    Returns:
+        str: URL of the generated image
+    """
+
+    def on_queue_update(update):
+        if isinstance(update, fal_client.InProgress):
+            for log in update.logs:
+                print(log["message"])
+
+    try:
+        async with fal_budget.slot():
+            result = await asyncio.wait_for(
+                fal_client.subscribe_async(
+                    model,
+                    arguments={"prompt": prompt},
+                    with_logs=True,
+                    on_queue_update=on_queue_update
+                ),
+                timeout,
+            )
+        return result["images"][0]["url"]
+
+    except asyncio.TimeoutError:
+        raise
+
+    except Exception as e:
+        print(f"Error generating image: {str(e)}")
+        raise
+
+
+async def generate_image_or_placeholder_async(prompt: str, model: str = image_model, timeout: float = None) -> str:
+    """
+    Generate an image, settling for IMAGE_PLACEHOLDER if it fails or takes too long.
+    
+    Args:
+        prompt (str): The text prompt describing the image to generate
+        model (str): The model to use for generation
+        timeout (float, optional): Seconds to wait for the image. Defaults to image_timeout.
+        
+    Returns:
+        str: URL of the generated image, or IMAGE_PLACEHOLDER
+    """
+    timeout = image_timeout if timeout is None else timeout
+    try:
+        image_url = await generate_image_async(prompt, model=model, timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"Image generation timed out after {timeout}s, using a placeholder")
+        image_stats["timed_out"] += 1
+        return IMAGE_PLACEHOLDER
+    except Exception:
+        image_stats["failed"] += 1
+        return IMAGE_PLACEHOLDER
+    image_stats["generated"] += 1
+    return image_url
+
+
+
 # def generate_image_to_image(image_url: str, model: str = image_to_image_model):
 #     def on_queue_update(update):
 #         if isinstance(update, fal_client.InProgress):
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from openai.types.chat import ChatCompletion
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def cache_key(request: dict[str, Any]) -> str:
+    """Hash of everything sent with a chat completion: model, messages, response format and sampling params."""
+    encoded = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Chat completion responses cached in a SQLite file.
+
+    The file is opened in WAL mode, so every uvicorn worker pointed at the same
+    path shares it. Responses older than `ttl_seconds` are never served, and
+    once there are more than `max_entries` the least recently used are evicted.
+    """
+
+    def __init__(self, path: str | Path, max_entries: int = 10000, ttl_seconds: float | None = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.bypasses = 0
+        self._conn().executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> "LLMCache | None":
+        """Open the cache configured by the MARKETMIND_LLM_CACHE* environment variables, if it is enabled."""
+        if os.getenv("MARKETMIND_LLM_CACHE", "").lower() not in ("1", "true", "yes"):
+            return None
+        ttl = os.getenv("MARKETMIND_LLM_CACHE_TTL_S", str(7 * 86400))
+        return cls(
+            os.getenv("MARKETMIND_LLM_CACHE_PATH", ".data/llm_cache.sqlite3"),
+            max_entries=int(os.getenv("MARKETMIND_LLM_CACHE_MAX_ENTRIES", "10000")),
+            ttl_seconds=float(ttl) if ttl else None,
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key: str) -> ChatCompletion | None:
+        """Get a cached response and mark it as recently used.
+
+        Args:
+            key (str): Key from `cache_key`
+
+        Returns:
+            ChatCompletion | None: The response, or None if it is missing or expired
+        """
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl_seconds is not None and row[1] < now - self.ttl_seconds):
+            self._count("misses")
+            return None
+        conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        self._count("hits")
+        return ChatCompletion.model_validate_json(row[0])
+
+    def put(self, key: str, response: ChatCompletion) -> None:
+        """Cache a response, evicting expired and least recently used ones."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, response.model_dump_json(), now, now),
+            )
+            evicted = 0
+            if self.ttl_seconds is not None:
+                evicted += conn.execute(
+                    "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+                ).rowcount
+            excess = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                evicted += conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                ).rowcount
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        with self._lock:
+            self.writes += 1
+            self.evictions += evicted
+
+    def bypass(self) -> None:
+        """Count a call that skipped the cache."""
+        self._count("bypasses")
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM responses")
+
+    def stats(self) -> dict[str, Any]:
+        entries = self._conn().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": str(self.path),
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "bypasses": self.bypasses,
+            }
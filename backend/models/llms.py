@@ -1,13 +1,23 @@
+import asyncio
 import json
-from openai import OpenAI, AsyncOpenAI, ChatCompletion
+import weakref
+from openai import APIStatusError, OpenAI, AsyncOpenAI, RateLimitError
+from openai.types.chat import ChatCompletion
 from pydantic import BaseModel, Field
 import tiktoken
-from typing import Any
+from typing import Any, AsyncIterator
 import os
 import dotenv
 from exa_py import Exa
 from models.tools import Tool
 from models.tool_registry import tool_registry
+from models.budget import openrouter_budget
+from models.http_pool import openrouter_pool
+from models.rate_limiter import ModelRateLimiter
+from models.retry import CallRetrier, HedgePolicy, RetryPolicy
+from models.llm_cache import LLMCache, cache_key
+from models.schema_registry import schema_registry
+from models.streaming import StreamMetrics, stream_stats
 dotenv.load_dotenv()
 
 text_model = "openai/gpt-4.1-mini"
@@ -15,16 +25,127 @@ text_model = "openai/gpt-4.1-mini"
 client = OpenAI(
     base_url="https://openrouter.ai/api/v1",
     api_key=os.getenv("OPENROUTER_API_KEY"),
+    http_client=openrouter_pool.sync_client(),
+    max_retries=0,
 )
 
 exa = Exa(
     api_key=os.getenv("EXA_API_KEY"),
 )
 
-async_client = AsyncOpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-)
+# Opt-in cache of chat completion responses, shared by every worker; see LLMCache.from_env
+llm_cache = LLMCache.from_env()
+
+# httpx connections are bound to the event loop that opened them, and the sync
+# wrappers around async generators run each call in a new loop, so every loop
+# gets its own async client
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> AsyncOpenAI:
+    """Get the async OpenRouter client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    async_client = _async_clients.get(loop)
+    if async_client is None:
+        async_client = AsyncOpenAI(
+            base_url="https://openrouter.ai/api/v1",
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            http_client=openrouter_pool.async_client(),
+            max_retries=0,
+        )
+        _async_clients[loop] = async_client
+    return async_client
+
+
+def _is_overload(error: BaseException) -> bool:
+    """Whether OpenRouter is pushing back: rate limited (429) or failing (5xx)."""
+    return isinstance(error, RateLimitError) or (isinstance(error, APIStatusError) and error.status_code >= 500)
+
+
+# Token bucket plus adaptive concurrency limit per model, shared by every caller in the process
+model_limiter = ModelRateLimiter.from_env(_is_overload)
+
+
+# Retries with jittered backoff, and optional hedging of slow async calls; the clients themselves never retry
+llm_retrier = CallRetrier(RetryPolicy.from_env(), HedgePolicy.from_env())
+
+
+def _complete(**kwargs: Any) -> ChatCompletion:
+    """Create a chat completion, retrying under `llm_retrier`; each attempt waits for the model's rate limiter."""
+    def attempt() -> ChatCompletion:
+        with model_limiter.slot(kwargs["model"]):
+            return client.chat.completions.create(**kwargs)
+
+    return llm_retrier.call(kwargs["model"], attempt)
+
+
+async def _complete_async(**kwargs: Any) -> ChatCompletion:
+    """Async version of `_complete`; attempts also wait for the OpenRouter budget and may be hedged."""
+    async def attempt() -> ChatCompletion:
+        async with model_limiter.slot_async(kwargs["model"]):
+            async with openrouter_budget.slot():
+                return await get_async_client().chat.completions.create(**kwargs)
+
+    return await llm_retrier.call_async(kwargs["model"], attempt)
+
+
+def _cache_lookup(kwargs: dict[str, Any], cache: bool) -> tuple[str | None, ChatCompletion | None]:
+    """Cache key and cached response of a request; no key if the cache is off or bypassed."""
+    if llm_cache is None:
+        return None, None
+    if not cache:
+        llm_cache.bypass()
+        return None, None
+    key = cache_key(kwargs)
+    return key, llm_cache.get(key)
+
+
+def _create(cache: bool, timeout: float | None = None, **kwargs: Any) -> ChatCompletion:
+    """Create a chat completion, served from the response cache when it is enabled and `cache` is set.
+    `timeout` overrides the client's default for this call only and is not part of the cache key."""
+    key, response = _cache_lookup(kwargs, cache)
+    if response is None:
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        response = _complete(**kwargs)
+        if key is not None:
+            llm_cache.put(key, response)
+    return response
+
+
+async def _create_async(cache: bool, timeout: float | None = None, **kwargs: Any) -> ChatCompletion:
+    """Async version of `_create`; cache reads and writes run in a worker thread."""
+    key, response = await asyncio.to_thread(_cache_lookup, kwargs, cache) if llm_cache else (None, None)
+    if response is None:
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        response = await _complete_async(**kwargs)
+        if key is not None:
+            await asyncio.to_thread(llm_cache.put, key, response)
+    return response
+
+
+def _prompt_messages(prompt: str, system_prompt: str | None) -> list[dict[str, str]]:
+    messages = [
+        {"role": "system", "content": system_prompt} if system_prompt else None,
+        {"role": "user", "content": prompt},
+    ]
+    return [msg for msg in messages if msg is not None]
+
+
+def _parse_structured(response: ChatCompletion, response_format: BaseModel) -> BaseModel:
+    if not response.choices or not response.choices[0].message.content:
+        raise ValueError(
+            "No valid response content received from the API", response
+        )
+
+    try:
+        return response_format.model_validate_json(
+            response.choices[0].message.content
+        )
+    except Exception as e:
+        print("Failed to parse response:", response.choices[0].message.content)
+        raise ValueError(f"Failed to parse response: {e}")
 
 
 def llm_call(
@@ -32,6 +153,8 @@ def llm_call(
     system_prompt: str | None = None,
     response_format: BaseModel | None = None,
     model: str = text_model,
+    cache: bool = True,
+    timeout: float | None = None,
 ) -> str | BaseModel:
     """
     Make a LLM call
@@ -41,86 +164,61 @@ def llm_call(
         `system_prompt` (`str`, optional): System-level instructions for the LLM. Defaults to None.
         `response_format` (`BaseModel`, optional): Pydantic model for structured responses. Defaults to None.
         `model` (`str`, optional): Model identifier to use. Defaults to "gpt-4o-mini".
+        `cache` (`bool`, optional): Serve and store the response through the LLM response cache, if it is enabled. Defaults to True.
+        `timeout` (`float`, optional): Seconds to wait for this call. Defaults to the client's MARKETMIND_HTTP_TIMEOUT_S.
 
     ### Returns:
         The LLM's response, either as raw text or as a parsed object according to `response_format`.
     """
-    messages = [
-        {"role": "system", "content": system_prompt} if system_prompt else None,
-        {"role": "user", "content": prompt},
-    ]
-    messages = [msg for msg in messages if msg is not None]
-
-    kwargs: dict[str, Any] = {"model": model, "messages": messages}
+    kwargs: dict[str, Any] = {"model": model, "messages": _prompt_messages(prompt, system_prompt)}
 
     if response_format is not None:
-        schema = response_format.model_json_schema()
-        # print("schema", schema)
-
-        def process_schema(schema_dict: dict[str, Any]) -> dict[str, Any]:
-            if schema_dict.get("type") not in ["object", "array"]:
-                return schema_dict
-
-            processed = {
-                "type": schema_dict.get("type", "object"),
-                "additionalProperties": False,
-            }
-
-            # Process definitions
-            if "$defs" in schema_dict:
-                processed["$defs"] = {}
-                for def_name, def_schema in schema_dict["$defs"].items():
-                    processed["$defs"][def_name] = process_schema(def_schema)
-
-            if "required" in schema_dict:
-                processed["required"] = schema_dict["required"]
-
-            if "title" in schema_dict:
-                processed["title"] = schema_dict["title"]
+        kwargs["response_format"] = schema_registry.response_format(response_format)
+        response = _create(cache, timeout, **kwargs)
+        return _parse_structured(response, response_format)
 
-            if "properties" in schema_dict:
-                processed["properties"] = {}
-                for prop_name, prop_schema in schema_dict["properties"].items():
-                    processed["properties"][prop_name] = process_schema(prop_schema)
+    return _create(cache, timeout, **kwargs).choices[0].message.content
 
-            if "items" in schema_dict:
-                processed["items"] = process_schema(schema_dict["items"])
 
-            return processed
-
-        processed_schema = process_schema(schema)
-
-        kwargs["response_format"] = {
-            "type": "json_schema",
-            "json_schema": {
-                "name": response_format.__name__,
-                "strict": True,
-                "schema": processed_schema,
-            },
-        }
+async def llm_call_async(
+    prompt: str,
+    system_prompt: str | None = None,
+    response_format: BaseModel | None = None,
+    model: str = text_model,
+    cache: bool = True,
+    timeout: float | None = None,
+) -> str | BaseModel:
+    """
+    Make a LLM call without blocking the event loop
 
-        response = client.chat.completions.create(**kwargs)
+    ### Args:
+        `prompt` (`str`): The user prompt to send to the LLM.
+        `system_prompt` (`str`, optional): System-level instructions for the LLM. Defaults to None.
+        `response_format` (`BaseModel`, optional): Pydantic model for structured responses. Defaults to None.
+        `model` (`str`, optional): Model identifier to use. Defaults to "gpt-4o-mini".
+        `cache` (`bool`, optional): Serve and store the response through the LLM response cache, if it is enabled. Defaults to True.
+        `timeout` (`float`, optional): Seconds to wait for this call. Defaults to the client's MARKETMIND_HTTP_TIMEOUT_S.
 
-        if not response.choices or not response.choices[0].message.content:
-            raise ValueError(
-                "No valid response content received from the API", response
-            )
+    ### Returns:
+        The LLM's response, either as raw text or as a parsed object according to `response_format`.
+    """
+    kwargs: dict[str, Any] = {"model": model, "messages": _prompt_messages(prompt, system_prompt)}
 
-        try:
-            return response_format.model_validate_json(
-                response.choices[0].message.content
-            )
-        except Exception as e:
-            print("Failed to parse response:", response.choices[0].message.content)
-            raise ValueError(f"Failed to parse response: {e}")
+    if response_format is not None:
+        kwargs["response_format"] = schema_registry.response_format(response_format)
+        response = await _create_async(cache, timeout, **kwargs)
+        return _parse_structured(response, response_format)
 
-    return client.chat.completions.create(**kwargs).choices[0].message.content
+    response = await _create_async(cache, timeout, **kwargs)
+    return response.choices[0].message.content
 
 
 def llm_call_messages(
     messages: list[dict[str, str]],
     response_format: BaseModel = None,
     model: str = text_model,
+    cache: bool = True,
+    timeout: float | None = None,
 ) -> str | BaseModel:
     """
     Make a LLM call with a list of messages instead of a prompt + system prompt
@@ -129,33 +227,22 @@ def llm_call_messages(
         `messages` (`list[dict]`): The list of messages to send to the LLM.
         `response_format` (`BaseModel`, optional): Pydantic model for structured responses. Defaults to None.
         `model` (`str`, optional): Model identifier to use. Defaults to "quasar-alpha".
+        `cache` (`bool`, optional): Serve and store the response through the LLM response cache, if it is enabled. Defaults to True.
+        `timeout` (`float`, optional): Seconds to wait for this call. Defaults to the client's MARKETMIND_HTTP_TIMEOUT_S.
     """
     kwargs: dict[str, Any] = {"model": model, "messages": messages}
 
     if response_format is not None:
-        schema = response_format.schema()
-        kwargs["response_format"] = {
-            "type": "json_schema",
-            "json_schema": {
-                "name": response_format.__name__,
-                "strict": True,
-                "schema": {
-                    "type": "object",
-                    "properties": schema["properties"],
-                    "required": schema["required"],
-                    "additionalProperties": False,
-                },
-            },
-        }
-
-        response = client.chat.completions.create(**kwargs)
+        kwargs["response_format"] = schema_registry.response_format(response_format)
+
+        response = _create(cache, timeout, **kwargs)
         try:
-            return response_format.parse_raw(response.choices[0].message.content)
+            return response_format.model_validate_json(response.choices[0].message.content)
         except Exception as e:
             print("Failed to parse response:", response)
             raise ValueError(f"Failed to parse response: {e}")
 
-    response = client.chat.completions.create(**kwargs)
+    response = _create(cache, timeout, **kwargs)
     try:
         return response.choices[0].message.content
     except Exception as e:
@@ -169,7 +256,7 @@ def _llm_call_tools(
     """
     Simple LLM call with tools. No structured response.
     """
-    resp = client.chat.completions.create(
+    resp = _complete(
         model=model, tools=[tool.to_openai_tool() for tool in tools], messages=msgs
     )
     try:
@@ -211,6 +298,8 @@ async def llm_call_messages_async(
     messages: list[dict[str, str]],
     response_format: BaseModel = None,
     model: str = text_model,
+    cache: bool = True,
+    timeout: float | None = None,
 ) -> str | BaseModel:
     """
     Make a LLM call with a list of messages instead of a prompt + system prompt
@@ -219,33 +308,22 @@ async def llm_call_messages_async(
         `messages` (`list[dict]`): The list of messages to send to the LLM.
         `response_format` (`BaseModel`, optional): Pydantic model for structured responses. Defaults to None.
         `model` (`str`, optional): Model identifier to use. Defaults to "quasar-alpha".
+        `cache` (`bool`, optional): Serve and store the response through the LLM response cache, if it is enabled. Defaults to True.
+        `timeout` (`float`, optional): Seconds to wait for this call. Defaults to the client's MARKETMIND_HTTP_TIMEOUT_S.
     """
     kwargs: dict[str, Any] = {"model": model, "messages": messages}
 
     if response_format is not None:
-        schema = response_format.schema()
-        kwargs["response_format"] = {
-            "type": "json_schema",
-            "json_schema": {
-                "name": response_format.__name__,
-                "strict": True,
-                "schema": {
-                    "type": "object",
-                    "properties": schema["properties"],
-                    "required": schema["required"],
-                    "additionalProperties": False,
-                },
-            },
-        }
-
-        response = await async_client.chat.completions.create(**kwargs)
+        kwargs["response_format"] = schema_registry.response_format(response_format)
+
+        response = await _create_async(cache, timeout, **kwargs)
         try:
-            return response_format.parse_raw(response.choices[0].message.content)
+            return response_format.model_validate_json(response.choices[0].message.content)
         except Exception as e:
             print("Failed to parse response:", response)
             raise ValueError(f"Failed to parse response: {e}")
 
-    response = await async_client.chat.completions.create(**kwargs)
+    response = await _create_async(cache, timeout, **kwargs)
     try:
         return response.choices[0].message.content
     except Exception as e:
@@ -253,6 +331,58 @@ async def llm_call_messages_async(
         raise ValueError(f"Failed to parse response: {e}")
 
 
+async def llm_stream_messages_async(
+    messages: list[dict[str, str]],
+    model: str = text_model,
+    metrics: StreamMetrics | None = None,
+    timeout: float | None = None,
+) -> AsyncIterator[str]:
+    """
+    Stream a LLM response to a list of messages, yielding text as it arrives
+
+    The model's rate limiter slot and the OpenRouter budget are held until the
+    stream ends. Streams are neither cached, retried nor hedged, since part of
+    the response may already have been shown.
+
+    ### Args:
+        `messages` (`list[dict]`): The list of messages to send to the LLM.
+        `model` (`str`, optional): Model identifier to use. Defaults to `text_model`.
+        `metrics` (`StreamMetrics`, optional): Filled in with time-to-first-token and tokens/sec as the stream runs.
+        `timeout` (`float`, optional): Seconds to wait for the stream. Defaults to the client's MARKETMIND_HTTP_TIMEOUT_S.
+    """
+    metrics = metrics or StreamMetrics(model=model)
+    kwargs: dict[str, Any] = {
+        "model": model,
+        "messages": messages,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+
+    failed = True
+    completion_tokens = None
+    metrics.start()
+    try:
+        async with model_limiter.slot_async(model):
+            async with openrouter_budget.slot():
+                stream = await get_async_client().chat.completions.create(**kwargs)
+                try:
+                    async for chunk in stream:
+                        if chunk.usage is not None:
+                            completion_tokens = chunk.usage.completion_tokens
+                        text = chunk.choices[0].delta.content if chunk.choices else None
+                        if text:
+                            metrics.token()
+                            yield text
+                finally:
+                    await stream.close()
+        failed = False
+    finally:
+        metrics.finish(completion_tokens)
+        stream_stats.record(metrics, failed)
+
+
 def num_tokens_from_messages(
     messages: list[dict[str, str]], model: str = text_model
 ) -> int:
@@ -278,7 +408,7 @@ def search_web(query: str) -> str:
     return search_results
 
 def search_web_structured_output(query: str, response_format: BaseModel) -> str:
-    schema = response_format.schema()
+    schema = response_format.model_json_schema()
     result_with_structured_summary = exa.search_and_contents(
         query,
         summary={
@@ -0,0 +1,271 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, Optional
+
+
+def _resolve(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class _Waiter:
+    """A caller waiting for a concurrency slot, either a thread or a coroutine on some event loop."""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+
+    def wake(self) -> None:
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+class ModelLimit:
+    """Token bucket plus AIMD concurrency limit for one model.
+
+    Every call takes a token, refilled at `rate` per second up to `burst`,
+    and then one of `limit` concurrency slots. The limit grows by one slot
+    per `limit` successful calls and is cut by `decrease_factor` on overload
+    errors, at most once per `cooldown` seconds so one burst of 429s only
+    counts once. Threads and coroutines queue for slots in one FIFO line.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        rate: float,
+        burst: float,
+        initial_limit: float,
+        min_limit: float,
+        max_limit: float,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0,
+    ):
+        self.model = model
+        self.rate = rate
+        self.burst = burst
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._refilled_at = time.monotonic()
+        self._last_decrease = 0.0
+        self._waiters: Deque[_Waiter] = deque()
+        self.in_flight = 0
+        self.waiting_for_tokens = 0
+        self.max_queue_depth = 0
+        self.calls = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.successes = 0
+        self.overloads = 0
+        self.decreases = 0
+
+    def _take_token(self, waiting: bool) -> float:
+        """Take a token if one is available, otherwise return the seconds until one is.
+        `waiting` tells whether the caller is already counted in `waiting_for_tokens`."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.waiting_for_tokens -= waiting
+                return 0.0
+            self.waiting_for_tokens += not waiting
+            return (1 - self._tokens) / self.rate
+
+    def _try_acquire(self, waiter: Optional[_Waiter] = None) -> bool:
+        """Take a slot right away if nobody is queued ahead, otherwise queue `waiter`. Call with the lock held."""
+        if not self._waiters and self.in_flight < max(math.floor(self.limit), 1):
+            self.in_flight += 1
+            return True
+        if waiter is not None:
+            self._waiters.append(waiter)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        return False
+
+    def _grant(self) -> None:
+        """Hand free slots to queued callers. Call with the lock held."""
+        while self._waiters and self.in_flight < max(math.floor(self.limit), 1):
+            self.in_flight += 1
+            self._waiters.popleft().wake()
+
+    def release(self, outcome: Optional[bool]) -> None:
+        """Free a slot and adjust the limit: True for success, False for overload, None for neither."""
+        with self._lock:
+            self.in_flight -= 1
+            if outcome is True:
+                self.successes += 1
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif outcome is False:
+                self.overloads += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self.decreases += 1
+            self._grant()
+
+    def _record_wait(self, start: float) -> None:
+        waited = time.monotonic() - start
+        with self._lock:
+            self.calls += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def acquire(self) -> None:
+        """Wait for a token and a slot, blocking the calling thread."""
+        start = time.monotonic()
+        delay = self._take_token(False)
+        while delay > 0:
+            time.sleep(delay)
+            delay = self._take_token(True)
+        waiter = _Waiter()
+        with self._lock:
+            acquired = self._try_acquire(waiter)
+        if not acquired:
+            waiter.event.wait()
+        self._record_wait(start)
+
+    async def acquire_async(self) -> None:
+        """Wait for a token and a slot without blocking the event loop."""
+        start = time.monotonic()
+        delay = self._take_token(False)
+        try:
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self._take_token(True)
+        except asyncio.CancelledError:
+            with self._lock:
+                self.waiting_for_tokens -= 1
+            raise
+        waiter = _Waiter(asyncio.get_running_loop())
+        with self._lock:
+            acquired = self._try_acquire(waiter)
+        if not acquired:
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                with self._lock:
+                    if not waiter.granted:
+                        self._waiters.remove(waiter)
+                        raise
+                # The slot was handed over just as the wait was cancelled
+                self.release(None)
+                raise
+        self._record_wait(start)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting_for_tokens + len(self._waiters),
+                "waiting_for_tokens": self.waiting_for_tokens,
+                "waiting_for_slots": len(self._waiters),
+                "max_queue_depth": self.max_queue_depth,
+                "calls": self.calls,
+                "wait_seconds": self.wait_seconds,
+                "avg_wait_seconds": self.wait_seconds / self.calls if self.calls else 0.0,
+                "max_wait_seconds": self.max_wait_seconds,
+                "successes": self.successes,
+                "overloads": self.overloads,
+                "decreases": self.decreases,
+            }
+
+
+class ModelRateLimiter:
+    """Process-wide `ModelLimit`s, one per model, created on first use.
+
+    `is_overload` decides which exceptions count as the provider pushing
+    back (429s and 5xx); other exceptions leave the limit unchanged.
+    """
+
+    def __init__(
+        self,
+        is_overload: Callable[[BaseException], bool],
+        rate: float = 10.0,
+        burst: float = 20.0,
+        initial_limit: float = 8.0,
+        min_limit: float = 1.0,
+        max_limit: float = 32.0,
+    ):
+        self.is_overload = is_overload
+        self.rate = rate
+        self.burst = burst
+        self.initial_limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self._lock = threading.Lock()
+        self._limits: Dict[str, ModelLimit] = {}
+
+    @classmethod
+    def from_env(cls, is_overload: Callable[[BaseException], bool]) -> "ModelRateLimiter":
+        """Build a limiter from the MARKETMIND_LLM_* environment variables."""
+        return cls(
+            is_overload,
+            rate=float(os.getenv("MARKETMIND_LLM_RATE_PER_S", "10")),
+            burst=float(os.getenv("MARKETMIND_LLM_BURST", "20")),
+            initial_limit=float(os.getenv("MARKETMIND_LLM_INITIAL_CONCURRENCY", "8")),
+            min_limit=float(os.getenv("MARKETMIND_LLM_MIN_CONCURRENCY", "1")),
+            max_limit=float(os.getenv("MARKETMIND_LLM_MAX_CONCURRENCY", "32")),
+        )
+
+    def for_model(self, model: str) -> ModelLimit:
+        with self._lock:
+            limit = self._limits.get(model)
+            if limit is None:
+                limit = self._limits[model] = ModelLimit(
+                    model, self.rate, self.burst, self.initial_limit, self.min_limit, self.max_limit
+                )
+            return limit
+
+    def _outcome(self, error: Optional[BaseException]) -> Optional[bool]:
+        if error is None:
+            return True
+        return False if self.is_overload(error) else None
+
+    @contextmanager
+    def slot(self, model: str) -> Iterator[None]:
+        """Hold a slot of `model` for the duration of a blocking call."""
+        limit = self.for_model(model)
+        limit.acquire()
+        try:
+            yield
+        except BaseException as e:
+            limit.release(self._outcome(e))
+            raise
+        limit.release(True)
+
+    @asynccontextmanager
+    async def slot_async(self, model: str) -> AsyncIterator[None]:
+        """Hold a slot of `model` for the duration of an async call."""
+        limit = self.for_model(model)
+        await limit.acquire_async()
+        try:
+            yield
+        except BaseException as e:
+            limit.release(self._outcome(e))
+            raise
+        limit.release(True)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            limits = list(self._limits.values())
+        return {limit.model: limit.stats() for limit in limits}
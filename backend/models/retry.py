@@ -0,0 +1,244 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import openai
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+class RetryPolicy(BaseModel):
+    """Which failed calls to retry, how often, and how long to back off in between.
+
+    The wait before retry n (from 1) is drawn uniformly from zero up to
+    `base_delay * 2 ** (n - 1)`, capped at `max_delay` ("full jitter"), but is
+    never shorter than a Retry-After header sent with the error.
+    """
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    retry_statuses: tuple[int, ...] = (408, 409, 429, 500, 502, 503, 504)
+    retry_connection_errors: bool = True
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        """Build a policy from the MARKETMIND_LLM_RETRY_* environment variables."""
+        return cls(
+            max_attempts=max(int(os.getenv("MARKETMIND_LLM_RETRY_ATTEMPTS", "3")), 1),
+            base_delay=float(os.getenv("MARKETMIND_LLM_RETRY_BASE_DELAY_S", "0.5")),
+            max_delay=float(os.getenv("MARKETMIND_LLM_RETRY_MAX_DELAY_S", "8")),
+        )
+
+    def is_retryable(self, error: BaseException) -> bool:
+        if isinstance(error, openai.APIConnectionError):  # includes timeouts
+            return self.retry_connection_errors
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in self.retry_statuses
+        return False
+
+    def delay(self, retry: int, error: BaseException) -> float:
+        """Seconds to wait before retry number `retry`, counting from 1."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            return max(delay, min(float(retry_after), self.max_delay)) if retry_after else delay
+        except ValueError:
+            return delay
+
+
+class HedgePolicy(BaseModel):
+    """When to send a duplicate of a slow async call and take whichever succeeds first.
+
+    A call is hedged once it has run longer than the `percentile` of the
+    model's recent latencies, and only after `min_samples` latencies are known.
+    """
+    enabled: bool = False
+    percentile: float = 0.95
+    min_samples: int = 20
+    window: int = 200
+
+    @classmethod
+    def from_env(cls) -> "HedgePolicy":
+        """Build a policy from the MARKETMIND_LLM_HEDGE* environment variables."""
+        return cls(
+            enabled=os.getenv("MARKETMIND_LLM_HEDGE", "").lower() in ("1", "true", "yes"),
+            percentile=float(os.getenv("MARKETMIND_LLM_HEDGE_PERCENTILE", "0.95")),
+            min_samples=int(os.getenv("MARKETMIND_LLM_HEDGE_MIN_SAMPLES", "20")),
+        )
+
+
+class _ModelStats:
+    def __init__(self, window: int):
+        # Per attempt, for the hedging threshold; attempts cancelled before finishing count with their elapsed time
+        self.latencies: Deque[float] = deque(maxlen=window)
+        # Per call, from the first attempt to the result, including backoff and hedges
+        self.call_latencies: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.recovered = 0  # calls that succeeded after a retry
+        self.failed = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def percentile(self, q: float, calls: bool = False) -> Optional[float]:
+        samples = self.call_latencies if calls else self.latencies
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class CallRetrier:
+    """Runs provider calls under a retry policy and, for async calls, a hedging policy.
+
+    Latencies of attempts are kept per model to pick the hedging threshold,
+    and latencies of whole calls to report p50/p99 in `stats`.
+    """
+
+    def __init__(self, retry: RetryPolicy, hedge: HedgePolicy):
+        self.retry = retry
+        self.hedge = hedge
+        self._lock = threading.Lock()
+        self._models: Dict[str, _ModelStats] = {}
+
+    def _stats(self, model: str) -> _ModelStats:
+        with self._lock:
+            stats = self._models.get(model)
+            if stats is None:
+                stats = self._models[model] = _ModelStats(self.hedge.window)
+            return stats
+
+    def _record(self, stats: _ModelStats, counter: str) -> None:
+        with self._lock:
+            setattr(stats, counter, getattr(stats, counter) + 1)
+
+    def call(self, model: str, attempt: Callable[[], T]) -> T:
+        """Call `attempt` until it succeeds, retrying retryable errors after a backoff.
+
+        Args:
+            model (str): Model the call goes to, for latency tracking
+            attempt (Callable): Makes one attempt at the call
+
+        Returns:
+            The result of the first successful attempt
+        """
+        stats = self._stats(model)
+        self._record(stats, "calls")
+        call_start = time.perf_counter()
+        for number in range(1, self.retry.max_attempts + 1):
+            self._record(stats, "attempts")
+            start = time.perf_counter()
+            try:
+                result = attempt()
+            except Exception as e:
+                if number == self.retry.max_attempts or not self.retry.is_retryable(e):
+                    self._record(stats, "failed")
+                    raise
+                self._record(stats, "retries")
+                time.sleep(self.retry.delay(number, e))
+                continue
+            end = time.perf_counter()
+            with self._lock:
+                stats.latencies.append(end - start)
+                stats.call_latencies.append(end - call_start)
+                stats.recovered += number > 1
+            return result
+        raise AssertionError("unreachable")
+
+    async def call_async(self, model: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Async version of `call`, with each attempt hedged when the hedging policy is enabled."""
+        stats = self._stats(model)
+        self._record(stats, "calls")
+        call_start = time.perf_counter()
+        for number in range(1, self.retry.max_attempts + 1):
+            try:
+                result = await self._hedged(stats, attempt)
+            except Exception as e:
+                if number == self.retry.max_attempts or not self.retry.is_retryable(e):
+                    self._record(stats, "failed")
+                    raise
+                self._record(stats, "retries")
+                await asyncio.sleep(self.retry.delay(number, e))
+                continue
+            with self._lock:
+                stats.call_latencies.append(time.perf_counter() - call_start)
+                stats.recovered += number > 1
+            return result
+        raise AssertionError("unreachable")
+
+    async def _timed(self, stats: _ModelStats, attempt: Callable[[], Awaitable[T]]) -> T:
+        self._record(stats, "attempts")
+        start = time.perf_counter()
+        try:
+            result = await attempt()
+        except asyncio.CancelledError:
+            # An attempt that lost to a hedge took at least this long; leaving it out
+            # would bias the samples towards fast attempts and keep lowering the threshold
+            with self._lock:
+                stats.latencies.append(time.perf_counter() - start)
+            raise
+        with self._lock:
+            stats.latencies.append(time.perf_counter() - start)
+        return result
+
+    async def _hedged(self, stats: _ModelStats, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Make one attempt, plus a duplicate if it outlives the hedging threshold; the first success wins."""
+        with self._lock:
+            threshold = (
+                stats.percentile(self.hedge.percentile)
+                if self.hedge.enabled and len(stats.latencies) >= self.hedge.min_samples
+                else None
+            )
+        if threshold is None:
+            return await self._timed(stats, attempt)
+
+        primary = asyncio.ensure_future(self._timed(stats, attempt))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=threshold)
+            if done:
+                return primary.result()
+
+            self._record(stats, "hedges")
+            hedge = asyncio.ensure_future(self._timed(stats, attempt))
+            pending.add(hedge)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._record(stats, "hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Also reached when the caller is cancelled, so no attempt outlives the call
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = {
+                model: {
+                    "calls": stats.calls,
+                    "attempts": stats.attempts,
+                    "retries": stats.retries,
+                    "recovered": stats.recovered,
+                    "failed": stats.failed,
+                    "hedges": stats.hedges,
+                    "hedge_wins": stats.hedge_wins,
+                    "p50_seconds": stats.percentile(0.5, calls=True),
+                    "p99_seconds": stats.percentile(0.99, calls=True),
+                    "attempt_p99_seconds": stats.percentile(0.99),
+                }
+                for model, stats in self._models.items()
+            }
+        return {"retry": self.retry.model_dump(), "hedge": self.hedge.model_dump(), "models": models}
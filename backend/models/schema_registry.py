@@ -0,0 +1,108 @@
+import threading
+from typing import Any, Dict, Set, Type
+
+from pydantic import BaseModel
+
+
+def process_schema(schema_dict: dict[str, Any]) -> dict[str, Any]:
+    """Rewrite a JSON schema for strict structured outputs: closed objects, no extra keywords."""
+    if schema_dict.get("type") not in ["object", "array"]:
+        return schema_dict
+
+    processed = {
+        "type": schema_dict.get("type", "object"),
+        "additionalProperties": False,
+    }
+
+    # Process definitions
+    if "$defs" in schema_dict:
+        processed["$defs"] = {}
+        for def_name, def_schema in schema_dict["$defs"].items():
+            processed["$defs"][def_name] = process_schema(def_schema)
+
+    if "required" in schema_dict:
+        processed["required"] = schema_dict["required"]
+
+    if "title" in schema_dict:
+        processed["title"] = schema_dict["title"]
+
+    if "properties" in schema_dict:
+        processed["properties"] = {}
+        for prop_name, prop_schema in schema_dict["properties"].items():
+            processed["properties"][prop_name] = process_schema(prop_schema)
+
+    if "items" in schema_dict:
+        processed["items"] = process_schema(schema_dict["items"])
+
+    return processed
+
+
+class SchemaRegistry:
+    """Strict structured-output `response_format` payloads, compiled once per Pydantic model.
+
+    Models can be registered up front and compiled together with `warm`;
+    any other model is compiled the first time it is used. The payloads are
+    shared between calls and must not be modified.
+    """
+
+    def __init__(self) -> None:
+        self._models: Set[Type[BaseModel]] = set()
+        self._formats: Dict[Type[BaseModel], dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.compiled = 0
+
+    def register(self, *models: Type[BaseModel]) -> None:
+        """Register models to compile on `warm`. Models are told apart by class, so two
+        models that share a name are both registered.
+
+        Args:
+            models (Type[BaseModel]): The structured-output models to register
+        """
+        self._models.update(models)
+
+    def warm(self) -> int:
+        """Compile every registered model that is not compiled yet.
+
+        Returns:
+            int: Number of models compiled
+        """
+        return sum(self._compile(model) for model in list(self._models) if model not in self._formats)
+
+    def _compile(self, model: Type[BaseModel]) -> bool:
+        with self._lock:
+            if model in self._formats:
+                return False
+            self._formats[model] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": model.__name__,
+                    "strict": True,
+                    "schema": process_schema(model.model_json_schema()),
+                },
+            }
+            self.compiled += 1
+            return True
+
+    def response_format(self, model: Type[BaseModel]) -> dict[str, Any]:
+        """Get the `response_format` argument for structured output in the shape of `model`.
+
+        Args:
+            model (Type[BaseModel]): The Pydantic model the response must match
+
+        Returns:
+            dict[str, Any]: The compiled payload, shared between calls
+        """
+        response_format = self._formats.get(model)
+        if response_format is None:
+            self._compile(model)
+            return self._formats[model]
+        self.hits += 1
+        return response_format
+
+    def stats(self) -> dict[str, Any]:
+        return {"registered": len(self._models), "compiled": self.compiled, "hits": self.hits}
+
+
+# Global registry instance
+schema_registry = SchemaRegistry()
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from pydantic import BaseModel
+
+
+class StreamMetrics(BaseModel):
+    """Timings of one streamed completion.
+
+    Tokens per second is measured from the first token to the last, so it is
+    the generation speed the user sees once text starts arriving.
+    """
+    model: str
+    ttft_seconds: Optional[float] = None
+    seconds: float = 0.0
+    tokens: int = 0
+    tokens_per_second: float = 0.0
+    _started: float = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+
+    def token(self) -> None:
+        """Note a content chunk as it arrives."""
+        if self.ttft_seconds is None:
+            self.ttft_seconds = time.perf_counter() - self._started
+        self.tokens += 1
+
+    def finish(self, completion_tokens: Optional[int] = None) -> None:
+        """Stop the clock, preferring the provider's token count over the number of chunks."""
+        self.seconds = time.perf_counter() - self._started
+        if completion_tokens:
+            self.tokens = completion_tokens
+        generating = self.seconds - (self.ttft_seconds or 0.0)
+        self.tokens_per_second = self.tokens / generating if self.ttft_seconds is not None and generating > 0 else 0.0
+
+
+class StreamStats:
+    """Time-to-first-token and tokens per second over recent streamed completions."""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._ttfts: Deque[float] = deque(maxlen=window)
+        self._speeds: Deque[float] = deque(maxlen=window)
+        self.streams = 0
+        self.completed = 0
+        self.failed = 0
+        self.tokens = 0
+
+    def record(self, metrics: StreamMetrics, failed: bool) -> None:
+        with self._lock:
+            self.streams += 1
+            self.tokens += metrics.tokens
+            if failed:
+                self.failed += 1
+                return
+            self.completed += 1
+            if metrics.ttft_seconds is not None:
+                self._ttfts.append(metrics.ttft_seconds)
+            if metrics.tokens_per_second:
+                self._speeds.append(metrics.tokens_per_second)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ttfts = sorted(self._ttfts)
+            speeds = list(self._speeds)
+            return {
+                "streams": self.streams,
+                "completed": self.completed,
+                "failed": self.failed,
+                "tokens": self.tokens,
+                "p50_ttft_seconds": ttfts[len(ttfts) // 2] if ttfts else None,
+                "p99_ttft_seconds": ttfts[min(int(0.99 * len(ttfts)), len(ttfts) - 1)] if ttfts else None,
+                "avg_tokens_per_second": sum(speeds) / len(speeds) if speeds else None,
+            }
+
+
+stream_stats = StreamStats()
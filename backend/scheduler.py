@@ -0,0 +1,152 @@
+import asyncio
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+
+class StageTiming(BaseModel):
+    start: float
+    end: float
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+
+class GraphRun(BaseModel):
+    """Results and timings of one run of a TaskGraph.
+
+    Times are in seconds since the run started. The critical path is the chain
+    of stages, ending with the last one to finish, in which each stage was held
+    up by the dependency before it.
+    """
+    results: Dict[str, Any]
+    timings: Dict[str, StageTiming]
+    critical_path: List[str]
+    seconds: float
+
+    def summary(self) -> Dict[str, Any]:
+        """Timings without the stage results, for logging and metrics."""
+        return {
+            "seconds": self.seconds,
+            "critical_path": self.critical_path,
+            "stages": {name: timing.model_dump() for name, timing in self.timings.items()},
+        }
+
+
+# Called with the stage name, its new status ("running", "done" or "failed") and its result or exception
+StageListener = Callable[[str, str, Any], Union[None, Awaitable[None]]]
+
+
+class _Stage:
+    def __init__(self, name: str, fn: Callable[..., Any], deps: Tuple[str, ...]):
+        self.name = name
+        self.fn = fn
+        self.deps = deps
+
+
+class TaskGraph:
+    """Runs pipeline stages as soon as the stages they depend on have finished.
+
+    Each stage is called with the results of its dependencies as keyword
+    arguments named after them. Coroutine functions are awaited on the event
+    loop and plain functions run in a worker thread.
+
+    Example:
+        graph = TaskGraph()
+        graph.add("campaigns", lambda: generate_base_campaigns(product_info, company_info))
+        graph.add("gtm_plan", lambda campaigns: ..., deps=["campaigns"])
+        run = await graph.run()
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, _Stage] = {}
+
+    def add(self, name: str, fn: Callable[..., Any], deps: Iterable[str] = ()) -> None:
+        """Add a stage to the graph.
+
+        Args:
+            name (str): Name of the stage, also the keyword its result is passed to dependents as
+            fn (Callable): Function computing the stage from its dependencies' results
+            deps (Iterable[str]): Names of stages that must finish first; they must already be added
+        """
+        if name in self._stages:
+            raise ValueError(f"Stage {name!r} is already in the graph")
+        deps = tuple(deps)
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage {name!r} depends on unknown stage {dep!r}")
+        self._stages[name] = _Stage(name, fn, deps)
+
+    @property
+    def stage_names(self) -> List[str]:
+        return list(self._stages)
+
+    async def run(self, on_stage: Optional[StageListener] = None) -> GraphRun:
+        """Run every stage and wait for all of them.
+
+        If a stage fails, the stages still running are cancelled and its
+        exception is raised.
+
+        Args:
+            on_stage (StageListener, optional): Called whenever a stage starts, finishes or fails.
+                Dependents of a stage start once the listener has returned for its result.
+
+        Returns:
+            GraphRun: Result of every stage plus timings and the critical path
+        """
+        origin = time.perf_counter()
+        timings: Dict[str, StageTiming] = {}
+        tasks: Dict[str, "asyncio.Task[Any]"] = {}
+
+        async def notify(name: str, event: str, payload: Any = None) -> None:
+            if on_stage is not None:
+                result = on_stage(name, event, payload)
+                if inspect.isawaitable(result):
+                    await result
+
+        async def run_stage(stage: _Stage) -> Any:
+            inputs = {dep: await tasks[dep] for dep in stage.deps}
+            start = time.perf_counter() - origin
+            await notify(stage.name, "running")
+            try:
+                if inspect.iscoroutinefunction(stage.fn):
+                    result = await stage.fn(**inputs)
+                else:
+                    result = await asyncio.to_thread(stage.fn, **inputs)
+            except Exception as e:
+                await notify(stage.name, "failed", e)
+                raise
+            timings[stage.name] = StageTiming(start=start, end=time.perf_counter() - origin)
+            await notify(stage.name, "done", result)
+            return result
+
+        # Stages are added after their dependencies, so every awaited task already exists
+        for stage in self._stages.values():
+            tasks[stage.name] = asyncio.create_task(run_stage(stage), name=stage.name)
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return GraphRun(
+            results={name: task.result() for name, task in tasks.items()},
+            timings=timings,
+            critical_path=self._critical_path(timings),
+            seconds=time.perf_counter() - origin,
+        )
+
+    def _critical_path(self, timings: Dict[str, StageTiming]) -> List[str]:
+        """Walk back from the last stage to finish through the dependency that finished last."""
+        current: Optional[str] = max(timings, key=lambda name: timings[name].end, default=None)
+        path: List[str] = []
+        while current is not None:
+            path.append(current)
+            deps = self._stages[current].deps
+            current = max(deps, key=lambda name: timings[name].end, default=None)
+        return list(reversed(path))
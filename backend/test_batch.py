@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+import httpx
+
+from models import llms
+from models.budget import ProviderBudget
+
+
+def test_budget_caps_calls_in_flight():
+    budget = ProviderBudget("test", limit=2)
+
+    async def call():
+        async with budget.slot():
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(run())
+    stats = budget.stats()
+    assert (stats["max_in_flight"], stats["calls"], stats["in_flight"]) == (2, 6, 0)
+
+
+def post_batch(app, body):
+    async def run():
+        # A client per call, since each call runs its own event loop
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://test") as c:
+            response = await c.post("/generate/batch", json=body)
+            return response.status_code, [json.loads(line) for line in response.text.splitlines()]
+
+    return asyncio.run(run())
+
+
+def test_batch_shares_the_provider_budget(app, fake_llm, monkeypatch):
+    fake_llm.delay = 0.01
+    monkeypatch.setattr(llms, "openrouter_budget", ProviderBudget("openrouter", limit=3))
+    items = [{"product_info": f"Product {i}", "company_info": "A company"} for i in range(3)]
+    # The last item repeats the first one and joins its generation
+    status, lines = post_batch(app, {"items": items + items[:1]})
+
+    assert status == 200
+    assert lines[0]["event"] == "batch" and lines[0]["total"] == 4
+    results = sorted((line for line in lines if line["event"] == "item"), key=lambda line: line["index"])
+    assert [result["status"] for result in results] == ["done"] * 4
+    assert results[3]["id"] == results[0]["id"] and results[3]["deduplicated"]
+    assert lines[-1] == {"event": "done", "batch_id": lines[0]["batch_id"], "succeeded": 4, "failed": 0}
+    assert fake_llm.peak == 3
+    assert app.jobs.stats()["submitted"] == 3
+
+
+def test_resumed_batch_skips_finished_items(app, fake_llm):
+    _, lines = post_batch(app, {"items": [{"product_info": "A product", "company_info": "A company"}]})
+    batch_id = lines[0]["batch_id"]
+    calls = len(fake_llm.requests)
+
+    status, lines = post_batch(app, {"batch_id": batch_id})
+    assert status == 200
+    assert lines[1]["status"] == "done"
+    assert len(fake_llm.requests) == calls
+
+
+def test_batch_needs_items(app):
+    assert post_batch(app, {"items": []})[0] == 400
+
+
+def test_unknown_batch_is_404(app):
+    assert post_batch(app, {"batch_id": "missing"})[0] == 404
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from concurrency import gather_bounded, gather_cancelling, limit_from_env
+from market_research import conduct_market_research_async
+
+
+def test_gather_bounded_limits_and_keeps_order():
+    running = []
+    peak = []
+
+    async def work(i):
+        running.append(i)
+        peak.append(len(running))
+        await asyncio.sleep(0.01 * (5 - i))
+        running.remove(i)
+        return i
+
+    assert asyncio.run(gather_bounded((work(i) for i in range(5)), limit=2)) == [0, 1, 2, 3, 4]
+    assert max(peak) == 2
+
+
+def test_gather_cancelling_cancels_the_rest_on_failure():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(gather_cancelling(slow(), fail()))
+    assert cancelled == [1]
+
+
+def test_limit_from_env_is_at_least_one(monkeypatch):
+    monkeypatch.setenv("TEST_LIMIT", "0")
+    assert limit_from_env("TEST_LIMIT", 4) == 1
+    monkeypatch.delenv("TEST_LIMIT")
+    assert limit_from_env("TEST_LIMIT", 4) == 4
+
+
+def test_market_research_runs_parts_concurrently_under_the_limit(fake_llm):
+    fake_llm.delay = 0.01
+    parts = []
+    research = asyncio.run(conduct_market_research_async(
+        "A product", "A company", on_progress=lambda part, value: parts.append(part), concurrency=3
+    ))
+    assert fake_llm.peak == 3
+    assert parts[-1] == "summary"
+    assert set(parts) == set(research.model_dump())
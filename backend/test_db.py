@@ -0,0 +1,236 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from db import SECTIONS, input_hash, open_db
+
+BACKENDS = ["json", "log", "sharded", "sqlite"]
+
+
+def generation(product_info="A product", complete=True, **fields):
+    value = {"product_info": product_info, "company_info": "A company", "timestamp": "2025-01-01T00:00:00", **fields}
+    for section in SECTIONS:
+        value.setdefault(section, {"section": section} if complete else None)
+    return value
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return request.param
+
+
+@pytest.fixture
+def db(backend):
+    db = open_db("test", backend=backend)
+    yield db
+    db.close()
+
+
+def test_crud(db):
+    assert db.create("a", {"x": 1})
+    assert not db.create("a", {"x": 2})
+    assert db.read("a") == {"x": 1}
+    assert db.update("a", {"x": 3})
+    assert not db.update("missing", {"x": 3})
+    assert db.read("a") == {"x": 3}
+    assert db.delete("a")
+    assert not db.delete("a")
+    assert db.read("a") is None
+
+
+def test_sections(db):
+    db.create("a", generation(complete=False))
+    assert db.write_section("a", "campaigns", {"campaigns": [1]})
+    assert not db.write_section("missing", "campaigns", {})
+    assert db.read_section("a", "campaigns") == {"campaigns": [1]}
+    assert db.read("a")["campaigns"] == {"campaigns": [1]}
+    assert db.read("a")["product_info"] == "A product"
+
+
+def test_listing(db):
+    for key in "abc":
+        db.create(key, {"key": key})
+    assert db.list_all() == {key: {"key": key} for key in "abc"}
+    assert [key for key, _ in db.iter_items()] == ["a", "b", "c"]
+    assert [key for key, _ in db.iter_items(after="a")] == ["b", "c"]
+    assert db.delete_many(["a", "b", "missing"]) == 2
+    db.clear()
+    assert db.list_all() == {}
+
+
+def test_reopen(backend):
+    db = open_db("test", backend=backend)
+    db.create("a", generation())
+    db.create("b", {"x": 1})
+    db.update("b", {"x": 2})
+    db.create("c", {"x": 3})
+    db.delete("c")
+    db.close()
+
+    db = open_db("test", backend=backend)
+    assert db.read("a") == generation()
+    assert db.list_all() == {"a": generation(), "b": {"x": 2}}
+    db.close()
+
+
+def test_find_by_input_hash(db):
+    db.create("partial", generation(complete=False))
+    assert db.find_by_input_hash(input_hash("A product", "A company")) is None
+    db.create("first", generation())
+    db.create("second", generation())
+    db.create("other", generation("Another product"))
+    assert db.find_by_input_hash(input_hash("  a PRODUCT ", "a company")) == "second"
+    db.delete("second")
+    assert db.find_by_input_hash(input_hash("A product", "A company")) == "first"
+    assert db.find_by_input_hash(input_hash("Unknown")) is None
+
+
+def test_generation_changes_on_write(db):
+    db.create("a", {"x": 1})
+    before = db.generation()
+    db.update("a", {"x": 2})
+    assert db.generation() != before
+
+
+def test_input_hash_lookups_use_the_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = open_db("test", backend="json")
+    hashed = input_hash("A product", "A company")
+    db.create("first", generation())
+    assert db.find_by_input_hash(hashed) == "first"
+
+    def scan(*args, **kwargs):
+        raise AssertionError("the store was scanned")
+
+    monkeypatch.setattr(db, "iter_items", scan)
+    db.create("second", generation())
+    assert db.find_by_input_hash(hashed) == "second"
+    db.write_section("second", "personas", None)
+    assert db.find_by_input_hash(hashed) == "first"
+    db.delete_many(["first"])
+    assert db.find_by_input_hash(hashed) is None
+    db.write_section("second", "personas", {"personas": []})
+    assert db.find_by_input_hash(hashed) == "second"
+
+
+def test_input_hash_index_sees_writes_from_other_processes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = open_db("test", backend="json")
+    other = open_db("test", backend="json")
+    hashed = input_hash("A product", "A company")
+    assert db.find_by_input_hash(hashed) is None
+    other.create("a", generation())
+    assert db.find_by_input_hash(hashed) == "a"
+    other.delete("a")
+    db.create("b", {"x": 1})
+    assert db.find_by_input_hash(hashed) is None
+
+
+def test_sharded_input_hash_prefers_the_latest_timestamp(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = open_db("test", backend="sharded")
+    db.create("b-old", generation(timestamp="2025-01-01T00:00:00"))
+    db.create("a-new", generation(timestamp="2025-06-01T00:00:00"))
+    assert db.find_by_input_hash(input_hash("A product", "A company")) == "a-new"
+
+
+def test_sqlite_schema_is_migrated_in_creation_order(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = open_db("test", backend="sqlite")
+    db.create("b", generation())
+    db.create("a", generation(complete=False))
+    db.close()
+
+    # A database from before the `seq` and `complete` columns existed
+    conn = sqlite3.connect(tmp_path / ".data" / "test.sqlite3")
+    conn.executescript("""
+        CREATE TABLE legacy (content_id TEXT PRIMARY KEY, timestamp TEXT, input_hash TEXT, meta TEXT NOT NULL);
+        INSERT INTO legacy SELECT content_id, timestamp, input_hash, meta FROM entries ORDER BY seq;
+        DROP TABLE entries;
+        ALTER TABLE legacy RENAME TO entries;
+    """)
+    conn.close()
+
+    db = open_db("test", backend="sqlite")
+    assert list(db.list_all()) == ["b", "a"]
+    assert [key for key, _ in db.iter_items(after="b")] == ["a"]
+    assert db.read("b") == generation()
+    assert db.find_by_input_hash(input_hash("A product", "A company")) == "b"
+    for section in SECTIONS:
+        db.write_section("a", section, {"section": section})
+    assert db.find_by_input_hash(input_hash("A product", "A company")) == "a"
+    db.write_section("a", "personas", None)
+    assert db.find_by_input_hash(input_hash("A product", "A company")) == "b"
+    db.close()
+
+
+def test_sqlite_order_survives_compaction(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = open_db("test", backend="sqlite")
+    for key in ("c", "a", "d", "b"):
+        db.create(key, {"key": key})
+    db.delete("a")
+    db.compact()
+    db.create("e", {"key": "e"})
+    assert list(db.list_all()) == ["c", "d", "b", "e"]
+    assert [key for key, _ in db.iter_items(after="d", batch_size=1)] == ["b", "e"]
+    db.close()
+
+
+def test_sqlite_retries_an_unreadable_legacy_import(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    legacy_file = tmp_path / ".data" / "test.json"
+    legacy_file.parent.mkdir()
+    legacy_file.write_text("{not json")
+    with pytest.raises(ValueError):
+        open_db("test", backend="sqlite")
+
+    legacy_file.write_text('{"a": {"x": 1}}')
+    db = open_db("test", backend="sqlite")
+    assert db.read("a") == {"x": 1}
+    db.close()
+
+
+def test_sharded_null_section_leaves_the_entry_incomplete(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = open_db("test", backend="sharded")
+    db.create("a", generation())
+    db.write_section("a", "personas", None)
+    assert db.read("a").get("personas") is None
+    assert db.find_by_input_hash(input_hash("A product", "A company")) is None
+
+
+def test_sharded_input_hash_lookups_use_the_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = open_db("test", backend="sharded")
+    other = open_db("test", backend="sharded")
+    hashed = input_hash("A product", "A company")
+    db.create("a", generation())
+
+    def scan(*args, **kwargs):
+        raise AssertionError("the store was scanned")
+
+    monkeypatch.setattr(db, "_read_entry", scan)
+    monkeypatch.setattr(db, "iter_items", scan)
+    assert db.find_by_input_hash(hashed) == "a"
+    other.update("a", generation("Another product"))
+    assert db.find_by_input_hash(hashed) is None
+    other.create("b", generation())
+    assert db.find_by_input_hash(hashed) == "b"
+    other.delete("b")
+    assert db.find_by_input_hash(hashed) is None
+    assert db.find_by_input_hash("../..") is None
+
+
+def test_sharded_index_is_built_for_existing_stores(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = open_db("test", backend="sharded")
+    db.create("a", generation())
+    db.create("b", generation(complete=False))
+    shutil.rmtree(db.hash_dir)
+
+    reopened = open_db("test", backend="sharded")
+    assert reopened.find_by_input_hash(input_hash("A product", "A company")) == "a"
+    assert list(reopened.list_all()) == ["a", "b"]
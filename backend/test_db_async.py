@@ -0,0 +1,49 @@
+import asyncio
+import threading
+
+import pytest
+
+from db import open_db
+from db_async import AsyncJsonDB
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = AsyncJsonDB(open_db("test", backend="json"), io_threads=2)
+    yield db
+    db.close()
+
+
+def test_crud(db):
+    async def run():
+        assert await db.create("a", {"x": 1})
+        assert await db.read("a") == {"x": 1}
+        assert await db.update("a", {"x": 2})
+        assert await db.read_section("a", "x") == 2
+        assert await db.list_all() == {"a": {"x": 2}}
+        assert await db.delete("a")
+        assert await db.read("a") is None
+
+    asyncio.run(run())
+
+
+def test_calls_run_on_the_io_pool(db, monkeypatch):
+    threads = []
+    read = db.db.read
+    monkeypatch.setattr(db.db, "read", lambda key: threads.append(threading.current_thread().name) or read(key))
+    asyncio.run(db.read("a"))
+    assert threads[0].startswith("test-io")
+
+
+def test_iter_items_pages_through_entries(db):
+    async def run():
+        for i in range(7):
+            await db.create(f"key{i}", {"i": i})
+        everything = [key async for key, _ in db.iter_items(batch_size=3)]
+        page = [key async for key, _ in db.iter_items(after="key1", limit=4, batch_size=3)]
+        return everything, page
+
+    everything, page = asyncio.run(run())
+    assert everything == [f"key{i}" for i in range(7)]
+    assert page == ["key2", "key3", "key4", "key5"]
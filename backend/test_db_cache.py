@@ -0,0 +1,64 @@
+import pytest
+
+from db import open_db
+from db_cache import CachedJsonDB
+
+
+@pytest.fixture(params=["json", "log", "sqlite"])
+def backend(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return request.param
+
+
+def test_reads_are_served_from_the_cache(backend):
+    db = open_db("test", backend=backend, cache_size=8)
+    db.create("a", {"x": 1})
+    assert db.read("a") == {"x": 1}
+    assert db.read("a") == {"x": 1}
+    assert db.stats()["cache"]["hits"] == 2
+    db.update("a", {"x": 2})
+    assert db.read("a") == {"x": 2}
+    db.close()
+
+
+def test_cached_values_are_copies(backend):
+    db = open_db("test", backend=backend, cache_size=8)
+    db.create("a", {"items": [1]})
+    db.read("a")["items"].append(2)
+    assert db.read("a") == {"items": [1]}
+    db.close()
+
+
+def test_least_recently_used_keys_are_evicted(backend):
+    db = open_db("test", backend=backend, cache_size=2)
+    db.create("a", {"key": "a"})
+    db.create("b", {"key": "b"})
+    db.read("a")
+    # "b" is now the least recently used
+    db.create("c", {"key": "c"})
+    db.read("a")
+    db.read("b")
+    stats = db.stats()["cache"]
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 1, 2)
+    db.close()
+
+
+def test_section_writes_drop_the_cached_entry(backend):
+    db = open_db("test", backend=backend, cache_size=8)
+    db.create("a", {"product_info": "p", "personas": None})
+    assert db.read_section("a", "personas") is None
+    db.write_section("a", "personas", {"personas": [1]})
+    assert db.read_section("a", "personas") == {"personas": [1]}
+    assert db.read("a")["personas"] == {"personas": [1]}
+    db.close()
+
+
+def test_writes_from_another_handle_invalidate_the_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = CachedJsonDB(open_db("test", backend="json"))
+    other = open_db("test", backend="json")
+    db.create("a", {"x": 1})
+    assert db.read("a") == {"x": 1}
+    other.update("a", {"x": 2})
+    assert db.read("a") == {"x": 2}
+    assert db.stats()["cache"]["invalidations"] == 1
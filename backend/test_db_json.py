@@ -0,0 +1,52 @@
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from db import JsonDB
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def file_mode(db):
+    return stat.S_IMODE(db.db_file.stat().st_mode)
+
+
+def test_writes_keep_the_file_mode():
+    db = JsonDB("test")
+    assert file_mode(db) == 0o644
+    os.chmod(db.db_file, 0o640)
+    db.create("a", {"x": 1})
+    assert file_mode(db) == 0o640
+    assert not list(db.data_dir.glob("*.tmp"))
+
+
+def test_concurrent_writers_lose_no_updates():
+    db = JsonDB("test")
+    other = JsonDB("test")
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: (db if i % 2 else other).create(f"key{i}", {"i": i}), range(40)))
+    assert len(db.list_all()) == 40
+
+
+def test_group_commit_batches_concurrent_writes():
+    db = JsonDB("test", group_commit_window=0.05)
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(lambda i: db.create(f"key{i}", {"i": i}), range(10)))
+    assert all(results)
+    assert not db.create("key0", {"i": 0})
+    assert db.committed_writes == 10
+    assert db.commits < 10
+    assert JsonDB("test").read("key9") == {"i": 9}
+
+
+def test_corrupt_file_is_not_overwritten():
+    db = JsonDB("test")
+    db.db_file.write_text("{not json")
+    with pytest.raises(ValueError):
+        db.create("a", {"x": 1})
+    assert db.db_file.read_text() == "{not json"
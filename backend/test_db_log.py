@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from db_log import LogJsonDB
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Compaction is triggered by the tests only
+    db = LogJsonDB("test", compaction_interval=3600, compaction_min_bytes=1 << 40)
+    yield db
+    db.close()
+
+
+def test_compaction_reclaims_overwritten_records(db):
+    for i in range(50):
+        db.create(f"key{i}", {"i": i})
+        db.update(f"key{i}", {"i": i, "updated": True})
+    db.delete("key0")
+    before = db.storage_bytes()
+
+    assert db.compact() > 0
+    assert db.storage_bytes() < before
+    assert db.stats()["total_bytes"] == db.stats()["live_bytes"]
+    assert db.read("key0") is None
+    assert db.read("key49") == {"i": 49, "updated": True}
+
+    db.close()
+    reopened = LogJsonDB("test", compaction_interval=3600)
+    assert len(reopened.list_all()) == 49
+    reopened.close()
+
+
+def test_compact_without_garbage_is_a_no_op(db):
+    db.create("a", {"x": 1})
+    segments = sorted(os.listdir(db.log_dir))
+    assert db.compact() == 0
+    assert sorted(os.listdir(db.log_dir)) == segments
+
+
+def test_torn_tail_is_truncated_on_reopen(db):
+    db.create("a", {"x": 1})
+    db.create("b", {"x": 2})
+    db.close()
+    segment = sorted(db.log_dir.glob("*.seg"))[-1]
+    with open(segment, "r+b") as f:
+        f.truncate(segment.stat().st_size - 3)
+
+    reopened = LogJsonDB("test", compaction_interval=3600)
+    assert reopened.read("a") == {"x": 1}
+    assert reopened.read("b") is None
+    reopened.create("c", {"x": 3})
+    assert reopened.read("c") == {"x": 3}
+    reopened.close()
+
+
+def test_store_is_open_in_one_process_at_a_time(db):
+    with pytest.raises(RuntimeError):
+        LogJsonDB("test")
+    db.close()
+    reopened = LogJsonDB("test", compaction_interval=3600)
+    reopened.close()
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from db import open_db
+from db_retention import RetentionCompactor, RetentionPolicy, apply_retention, select_evictions
+
+
+def entry(days_old, size=100):
+    timestamp = (datetime.now() - timedelta(days=days_old)).isoformat()
+    return {"timestamp": timestamp, "text": "x" * size}
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = open_db("test", backend="log", codec="zlib")
+    yield db
+    db.close()
+
+
+def test_ttl_evicts_expired_entries(db):
+    db.create("old", entry(10))
+    db.create("new", entry(1))
+    db.create("undated", {"text": "kept"})
+    assert select_evictions(db, RetentionPolicy(ttl_seconds=5 * 86400)) == ["old"]
+
+
+def test_max_entries_evicts_oldest_first(db):
+    for days in (3, 1, 2):
+        db.create(f"day{days}", entry(days))
+    assert select_evictions(db, RetentionPolicy(max_entries=1)) == ["day3", "day2"]
+
+
+def test_max_bytes_uses_the_size_on_disk(db):
+    for i in range(10):
+        db.create(f"key{i}", entry(10 - i, size=5000))
+    size = db.storage_bytes()
+    # zlib shrinks the repeated text far below its JSON size, so the JSON size would evict everything
+    evicted = select_evictions(db, RetentionPolicy(max_bytes=size // 2 + 10))
+    assert evicted == [f"key{i}" for i in range(5)]
+
+
+def test_compacts_only_after_evicting(db, monkeypatch):
+    compactions = []
+    monkeypatch.setattr(db, "compact", lambda: compactions.append(1) or 0)
+    db.create("new", entry(1))
+    report = apply_retention(db, RetentionPolicy(ttl_seconds=5 * 86400))
+    assert report.evicted == 0 and compactions == []
+
+    db.create("old", entry(10))
+    report = apply_retention(db, RetentionPolicy(ttl_seconds=5 * 86400))
+    assert report.evicted == 1 and compactions == [1]
+    assert db.read("old") is None
+
+
+def test_ttl_and_max_entries_combine(db):
+    for days in (10, 9, 3, 2, 1):
+        db.create(f"day{days}", entry(days))
+    policy = RetentionPolicy(ttl_seconds=5 * 86400, max_entries=2)
+    assert select_evictions(db, policy) == ["day10", "day9", "day3"]
+
+
+def test_failed_pass_is_logged(db, monkeypatch, caplog):
+    def fail(*args):
+        raise OSError("disk gone")
+
+    monkeypatch.setattr(db, "storage_bytes", fail)
+    compactor = RetentionCompactor(db, RetentionPolicy(max_entries=1))
+    assert compactor.run_once() is None
+    assert "Retention pass failed for test" in caplog.text
+    assert compactor.runs == 0
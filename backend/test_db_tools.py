@@ -0,0 +1,46 @@
+import pytest
+
+from db import decode_value, encode_value, open_db
+from db_tools import convert, sample_generation
+
+
+@pytest.mark.parametrize("codec", ["json", "zlib"])
+def test_codecs_round_trip(codec):
+    value = sample_generation(1)
+    data = encode_value(value, codec)
+    # Records decode without knowing the codec that wrote them
+    assert decode_value(data) == value
+
+
+def test_zlib_is_smaller_than_json():
+    value = sample_generation(1)
+    assert len(encode_value(value, "zlib")) < len(encode_value(value, "json")) / 2
+
+
+def test_unknown_codec_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError):
+        encode_value({}, "lz4")
+    with pytest.raises(ValueError):
+        open_db("test", codec="lz4")
+
+
+@pytest.mark.parametrize("target", ["log", "sharded", "sqlite"])
+def test_convert_copies_every_entry(tmp_path, monkeypatch, target):
+    monkeypatch.chdir(tmp_path)
+    source = open_db("content", backend="json")
+    entries = {f"gen{i}": sample_generation(i) for i in range(3)}
+    for key, value in entries.items():
+        source.create(key, value)
+    source.close()
+
+    assert convert("content", "json", target, "zlib") == 3
+    converted = open_db("content", backend=target, codec="zlib")
+    assert converted.list_all() == entries
+    converted.close()
+
+
+def test_convert_onto_itself_needs_a_new_name(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError):
+        convert("content", "json", "json", "json")
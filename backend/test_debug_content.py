@@ -0,0 +1,49 @@
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from db import iter_json_object, open_db
+from db_async import AsyncJsonDB
+
+
+def test_iter_json_object_parses_incrementally():
+    entries = {
+        "a": {"text": "braces } and \"quotes\" {", "items": [1, 2.5, None, True]},
+        "b": "ünïcode \\ escapes",
+        "c": [],
+    }
+    text = json.dumps(entries, indent=2, ensure_ascii=False)
+    assert list(iter_json_object(io.StringIO(text), chunk_size=3)) == list(entries.items())
+    assert list(iter_json_object(io.StringIO(" { } "))) == []
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import main
+
+    db = AsyncJsonDB(open_db("content", backend="json"))
+    monkeypatch.setattr(main, "db", db)
+    for i in range(5):
+        db.db.create(f"key{i}", {"i": i, "text": "x" * i})
+    yield TestClient(main.app)
+    db.close()
+
+
+def test_debug_content_pages_with_a_cursor(client):
+    first = client.get("/debug/content", params={"limit": 2}).json()
+    assert list(first) == ["key0", "key1"]
+    rest = client.get("/debug/content", params={"cursor": "key1"}).json()
+    assert list(rest) == ["key2", "key3", "key4"]
+
+
+def test_debug_content_projects_fields(client):
+    content = client.get("/debug/content", params={"fields": "i, missing"}).json()
+    assert content["key3"] == {"i": 3}
+
+
+def test_export_streams_ndjson(client):
+    lines = client.get("/debug/content/export", params={"cursor": "key2"}).text.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["key3", "key4"]
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+from conftest import parse_sse
+from db import SECTIONS
+from jobs import Job, JobStatus
+
+
+def test_stream_replays_then_follows_the_log():
+    async def run():
+        job = Job("a", None, ["stage"])
+        job.emit("first")
+
+        async def follow(after=None):
+            return [record["event"] async for record in job.stream(after)]
+
+        follower = asyncio.ensure_future(follow())
+        resumed = asyncio.ensure_future(follow(after=0))
+        await asyncio.sleep(0)
+        job.emit("second")
+        job.emit("done")
+        return await follower, await resumed
+
+    received, resumed = asyncio.run(run())
+    assert received == ["first", "second", "done"]
+    assert resumed == ["second", "done"]
+
+
+def test_stream_sends_keepalives_while_idle():
+    async def run():
+        job = Job("a", None, [])
+        stream = job.stream(keepalive=0.01)
+        assert await stream.__anext__() is None
+        await stream.aclose()
+
+    asyncio.run(run())
+
+
+def test_events_of_a_running_generation(app, client, fake_llm):
+    async def run():
+        async with client as c:
+            content_id = (await c.post("/generate", json={
+                "product_info": "A product", "company_info": "A company", "background": True,
+            })).json()["id"]
+            return content_id, (await c.get(f"/generate/{content_id}/events")).text
+
+    content_id, body = asyncio.run(run())
+    messages = parse_sse(body)
+    assert [message[0] for message in messages] == list(range(len(messages)))
+    sections = {data["section"] for _, event, data in messages if event == "section"}
+    assert sections == set(SECTIONS)
+    assert messages[-1][1] == "done"
+
+
+def test_events_of_a_stored_generation_resume_after_last_event_id(app, client):
+    async def run():
+        await app.db.create("a", {"product_info": "p", "campaigns": [{"name": "c"}]})
+        async with client as c:
+            full = (await c.get("/generate/a/events")).text
+            resumed = (await c.get("/generate/a/events", headers={"Last-Event-ID": "0"})).text
+            missing = (await c.get("/generate/missing/events")).status_code
+        return full, resumed, missing
+
+    full, resumed, missing = asyncio.run(run())
+    assert [event for _, event, _ in parse_sse(full)] == ["section", "failed"]
+    stages = parse_sse(full)[-1][2]["stages"]
+    assert stages["campaigns"]["status"] == "done" and stages["personas"]["status"] == "pending"
+    assert [event for _, event, _ in parse_sse(resumed)] == ["failed"]
+    assert missing == 404
+
+
+def test_events_of_a_generation_in_another_worker_follow_the_store(app, client):
+    async def finish_elsewhere():
+        await asyncio.sleep(0.05)
+        for section in SECTIONS:
+            await app.db.write_section("x", section, {"name": section})
+        await app.job_records.delete("x")
+
+    async def run():
+        status = JobStatus(id="x", status="running", created_at="")
+        await app.job_records.create("x", {**status.model_dump(), "key": "k", "heartbeat": time.time()})
+        await app.db.create("x", {"product_info": "p", "campaigns": [{"name": "c"}]})
+        async with client as c:
+            finishing = asyncio.ensure_future(finish_elsewhere())
+            body = (await c.get("/generate/x/events")).text
+            await finishing
+        return body
+
+    messages = parse_sse(asyncio.run(run()))
+    assert [message[0] for message in messages] == list(range(len(messages)))
+    assert messages[0][2]["section"] == "campaigns"
+    assert {data["section"] for _, event, data in messages if event == "section"} == set(SECTIONS)
+    assert messages[-1][1] == "done"
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from models.http_pool import PoolStats, pool_limits
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections alive
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_sequential_requests_reuse_one_connection(url):
+    pool = PoolStats("test")
+    with pool.sync_client() as client:
+        for _ in range(3):
+            assert client.get(url).text == "ok"
+        stats = pool.stats()
+    assert (stats["clients"], stats["requests"], stats["connections_opened"]) == (1, 3, 1)
+    assert stats["reuse_rate"] == pytest.approx(2 / 3)
+    assert stats["open_connections"] == stats["idle_connections"] == 1
+
+
+def test_async_clients_count_towards_the_same_stats(url):
+    pool = PoolStats("test")
+
+    async def run():
+        async with pool.async_client() as client:
+            await asyncio.gather(*(client.get(url) for _ in range(3)))
+            await client.get(url)
+
+    asyncio.run(run())
+    stats = pool.stats()
+    assert stats["requests"] == 4
+    assert 1 <= stats["connections_opened"] <= 3
+
+
+def test_limits_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("MARKETMIND_HTTP_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("MARKETMIND_HTTP_KEEPALIVE_EXPIRY_S", "5")
+    limits = pool_limits()
+    assert (limits.max_connections, limits.keepalive_expiry) == (7, 5.0)
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+import make_campaigns
+from db import SECTIONS
+from image_queue import ImageQueue, ImageTask
+from make_campaigns import BaseCampaign, generate_campaign_images_async
+from models import images
+from models.images import IMAGE_PLACEHOLDER
+
+
+def base_campaign(name):
+    return BaseCampaign(name=name, slogan="s", concept="c", target_audience="t", key_message="k")
+
+
+@pytest.fixture
+def fal(monkeypatch):
+    """Fake fal.ai: prompts containing "fail" raise, prompts containing "slow" hang."""
+    calls = []
+
+    async def subscribe_async(model, arguments, **kwargs):
+        calls.append(arguments["prompt"])
+        if "fail" in arguments["prompt"]:
+            raise RuntimeError("fal is down")
+        if "slow" in arguments["prompt"]:
+            await asyncio.sleep(10)
+        return {"images": [{"url": f"http://img/{len(calls)}"}]}
+
+    monkeypatch.setattr(images.fal_client, "subscribe_async", subscribe_async)
+    return calls
+
+
+def test_failed_and_slow_images_get_placeholders(fal):
+    campaigns = asyncio.run(generate_campaign_images_async(
+        [base_campaign("ok"), base_campaign("fail"), base_campaign("slow")], timeout=0.05
+    ))
+    assert [campaign.name for campaign in campaigns] == ["ok", "fail", "slow"]
+    assert campaigns[0].image_url.startswith("http://img/")
+    assert campaigns[1].image_url == IMAGE_PLACEHOLDER
+    assert campaigns[2].image_url == IMAGE_PLACEHOLDER
+
+
+def test_images_respect_the_concurrency_limit(monkeypatch):
+    running = []
+    peak = []
+
+    async def subscribe_async(model, arguments, **kwargs):
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+        return {"images": [{"url": "http://img"}]}
+
+    monkeypatch.setattr(images.fal_client, "subscribe_async", subscribe_async)
+    asyncio.run(generate_campaign_images_async([base_campaign(str(i)) for i in range(6)], concurrency=2))
+    assert max(peak) == 2
+
+
+def test_only_missing_images_are_queued(tmp_path_factory, monkeypatch):
+    monkeypatch.chdir(tmp_path_factory.mktemp("main"))
+    import main
+
+    submitted = []
+    monkeypatch.setattr(main.image_queue, "submit", submitted.append)
+    campaigns = make_campaigns.CampaignList(campaigns=[
+        make_campaigns.Campaign(**base_campaign("a").model_dump(), image_url="http://img"),
+        make_campaigns.Campaign(**base_campaign("b").model_dump(), image_url=IMAGE_PLACEHOLDER),
+    ])
+    main.queue_images("c", "campaigns", campaigns)
+    assert [(task.section, task.index) for task in submitted] == [("campaigns", 1)]
+
+
+def test_image_queue_hands_every_task_to_the_listener(fal):
+    stored = []
+
+    async def on_image(task):
+        stored.append((task.index, task.status))
+
+    async def run():
+        queue = ImageQueue(on_image, workers=2, timeout=1)
+        for index, prompt in enumerate(["ok", "fail", "ok"]):
+            queue.submit(ImageTask(content_id="c", section="campaigns", index=index, prompt=prompt))
+        assert len(queue.tasks_for("c")) == 3
+        await queue.join()
+        return queue
+
+    queue = asyncio.run(run())
+    assert sorted(stored) == [(0, "done"), (1, "failed"), (2, "done")]
+    assert queue.tasks_for("c") == []
+    assert queue.stats()["done"] == 2 and queue.stats()["failed"] == 1
+
+
+def test_deferred_images_are_filled_in_after_the_text(app, client, fake_llm, monkeypatch):
+    release = asyncio.Event()
+
+    async def subscribe_async(model, arguments, **kwargs):
+        await release.wait()
+        return {"images": [{"url": "http://img"}]}
+
+    monkeypatch.setattr(images.fal_client, "subscribe_async", subscribe_async)
+
+    async def run():
+        async with client as c:
+            content_id = (await c.post("/generate", json={
+                "product_info": "A product", "company_info": "A company", "defer_images": True,
+            })).json()["id"]
+            stored = await app.db.read(content_id)
+            pending = (await c.get(f"/content/{content_id}/images")).json()
+            release.set()
+            await app.image_queue.join()
+            done = (await c.get(f"/content/{content_id}/images")).json()
+            return stored, pending, done, await app.db.read(content_id)
+
+    stored, pending, done, content = asyncio.run(run())
+    assert all(stored[section] is not None for section in SECTIONS)
+    assert all(campaign["image_url"] == IMAGE_PLACEHOLDER for campaign in stored["campaigns"])
+    assert pending["pending"] == len(pending["images"]) > 0
+    assert done["pending"] == 0
+    assert all(image["status"] == "done" for image in done["images"])
+    assert content["detailed_campaign"]["image_url"] == content["campaigns"][0]["image_url"] == "http://img"
@@ -0,0 +1,185 @@
+import asyncio
+import time
+
+import pytest
+
+from db import SECTIONS, input_hash, open_db
+from db_async import AsyncJsonDB
+from jobs import JobManager, JobStatus, StageStatus
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = AsyncJsonDB(open_db("jobs", backend="json"), io_threads=1)
+    yield store
+    store.close()
+
+
+def running_record(job_id, key, heartbeat):
+    status = JobStatus(id=job_id, status="running", created_at="", stages={"stage": StageStatus(status="running")})
+    return {**status.model_dump(), "key": key, "heartbeat": heartbeat}
+
+
+def test_at_most_max_running_jobs_run_at_once():
+    async def run():
+        manager = JobManager(max_running=2)
+        running = []
+        peak = []
+
+        async def work(job):
+            running.append(job.id)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(job.id)
+
+        submitted = [manager.submit(str(i), work) for i in range(5)]
+        await asyncio.sleep(0)
+        assert manager.stats()["queued"] == 3
+        await asyncio.gather(*(job.wait() for job in submitted))
+        return manager, max(peak)
+
+    manager, peak = asyncio.run(run())
+    assert peak == 2
+    assert manager.stats()["succeeded"] == 5
+
+
+def test_failed_job_reports_its_error():
+    async def run():
+        manager = JobManager()
+
+        async def work(job):
+            job.stage_update("stage", "running")
+            raise RuntimeError("boom")
+
+        job = manager.submit("a", work, stages=["stage"], key="k")
+        assert manager.find_active("k") is job
+        with pytest.raises(RuntimeError):
+            await job.wait()
+        return manager, job
+
+    manager, job = asyncio.run(run())
+    assert (job.status.status, job.status.error) == ("failed", "boom")
+    assert job.events[-1]["event"] == "failed"
+    assert manager.find_active("k") is None
+
+
+def test_only_recent_jobs_keep_their_events():
+    async def run():
+        manager = JobManager(max_finished=3, max_event_logs=1)
+
+        async def work(job):
+            job.emit("progress")
+
+        for i in range(4):
+            await manager.submit(str(i), work).wait()
+        return manager
+
+    manager = asyncio.run(run())
+    assert manager.get("0") is None
+    assert manager.get("2").events_released and manager.get("2").events == []
+    assert not manager.get("3").events_released
+
+
+def test_other_processes_follow_a_job_through_its_record(store):
+    async def run():
+        owner = JobManager(store=store)
+        other = JobManager(store=store, poll_interval=0.01)
+        release = asyncio.Event()
+
+        async def work(job):
+            job.stage_update("stage", "running")
+            await release.wait()
+
+        owner.submit("a", work, stages=["stage", "later"], key="k")
+        await asyncio.sleep(0.05)
+        joined = await other.find_stored("k")
+        running = await other.load("a")
+        release.set()
+        await joined.wait()
+        return running, joined, await other.load("a")
+
+    running, joined, finished = asyncio.run(run())
+    assert running.status == "running"
+    assert (running.stages["stage"].status, running.stages["later"].status) == ("running", "pending")
+    assert joined.status.status == "done"
+    assert finished is None
+
+
+def test_records_report_failed_and_abandoned_jobs(store):
+    async def run():
+        manager = JobManager(store=store, heartbeat_interval=0.05)
+
+        async def work(job):
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            await manager.submit("a", work).wait()
+        # A job whose process stopped updating its record
+        await store.create("b", running_record("b", "k", time.time() - 1))
+        return await manager.load("a"), await manager.load("b"), await manager.find_stored("k")
+
+    failed, abandoned, joined = asyncio.run(run())
+    assert (failed.status, failed.error) == ("failed", "boom")
+    assert (abandoned.status, abandoned.stages["stage"].status) == ("failed", "failed")
+    assert joined is None
+
+
+def test_background_generation_is_stored_as_it_progresses(app, client, fake_llm):
+    async def run():
+        async with client as c:
+            response = (await c.post("/generate", json={
+                "product_info": "A product", "company_info": "A company", "background": True,
+            })).json()
+            assert response["status"] in ("queued", "running")
+            await app.jobs.get(response["id"]).wait()
+            status = (await c.get(f"/jobs/{response['id']}")).json()
+            content = await app.db.read(response["id"])
+            return status, content
+
+    status, content = asyncio.run(run())
+    assert status["status"] == "done"
+    assert all(stage["status"] == "done" for stage in status["stages"].values())
+    assert all(content[section] is not None for section in SECTIONS)
+
+
+def test_identical_requests_join_the_running_job(app, client, fake_llm):
+    fake_llm.delay = 0.01
+
+    async def run():
+        async with client as c:
+            request = {"product_info": "A product", "company_info": "A company"}
+            first, second = await asyncio.gather(c.post("/generate", json=request), c.post("/generate", json=request))
+            third = await c.post("/generate", json=request)
+            return first.json(), second.json(), third.json()
+
+    first, second, third = asyncio.run(run())
+    assert first["id"] == second["id"] == third["id"]
+    assert second["deduplicated"] and third["deduplicated"]
+    assert app.jobs.stats()["submitted"] == 1
+
+
+def test_unknown_job_is_404(client):
+    async def run():
+        async with client as c:
+            return (await c.get("/jobs/missing")).status_code
+
+    assert asyncio.run(run()) == 404
+
+
+def test_generation_running_in_another_worker_is_reported_and_joined(app, client, fake_llm):
+    async def run():
+        hashed = input_hash("A product", "A company")
+        await app.job_records.create("x", running_record("x", hashed, time.time()))
+        await app.db.create("x", {"product_info": "A product", "company_info": "A company"})
+        async with client as c:
+            status = (await c.get("/jobs/x")).json()
+            joined = (await c.post("/generate", json={
+                "product_info": "A product", "company_info": "A company", "background": True,
+            })).json()
+        return status, joined
+
+    status, joined = asyncio.run(run())
+    assert status["status"] == "running"
+    assert (joined["id"], joined["deduplicated"], joined["status"]) == ("x", True, "running")
+    assert app.jobs.stats()["submitted"] == 0
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from conftest import completion
+from models import llms
+from models.llm_cache import LLMCache, cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMCache(tmp_path / "cache.sqlite3", max_entries=2)
+
+
+def test_responses_round_trip(cache):
+    assert cache.get("a") is None
+    cache.put("a", completion("hello"))
+    assert cache.get("a").choices[0].message.content == "hello"
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_least_recently_used_responses_are_evicted(cache):
+    cache.put("a", completion("a"))
+    cache.put("b", completion("b"))
+    cache.get("a")
+    cache.put("c", completion("c"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_responses_are_not_served(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite3", ttl_seconds=-1)
+    cache.put("a", completion("a"))
+    assert cache.get("a") is None
+
+
+def test_cache_file_is_shared(cache):
+    cache.put("a", completion("a"))
+    assert LLMCache(cache.path).get("a").choices[0].message.content == "a"
+
+
+def test_key_covers_the_whole_request():
+    request = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0}
+    assert cache_key(request) == cache_key(dict(reversed(list(request.items()))))
+    assert cache_key(request) != cache_key({**request, "temperature": 1})
+    assert cache_key(request) != cache_key({**request, "model": "other"})
+
+
+def test_repeated_calls_are_served_from_the_cache(cache, fake_llm, monkeypatch):
+    monkeypatch.setattr(llms, "llm_cache", cache)
+
+    async def run():
+        first = await llms.llm_call_async("Say hi")
+        second = await llms.llm_call_async("Say hi")
+        await llms.llm_call_async("Say hi", cache=False)
+        return first, second
+
+    assert asyncio.run(run()) == ("text", "text")
+    assert len(fake_llm.requests) == 2
+    assert cache.stats()["bypasses"] == 1
+
+
+def test_chat_replies_bypass_the_cache(cache, app, client, fake_llm, monkeypatch):
+    monkeypatch.setattr(llms, "llm_cache", cache)
+
+    async def run():
+        await app.db.create("a", {"personas": [{"name": "Ann", "chat_system_prompt": "You are Ann."}]})
+        async with client as c:
+            for _ in range(2):
+                await c.post("/chat", json={
+                    "content_id": "a", "persona_name": "Ann", "messages": [{"role": "user", "content": "Hi"}],
+                })
+            await c.post("/group-chat", json={"content_id": "a", "initial_message": "Hi"})
+
+    asyncio.run(run())
+    assert len(fake_llm.requests) == 3
+    assert cache.stats()["bypasses"] == 3 and cache.stats()["entries"] == 0
@@ -0,0 +1,67 @@
+import asyncio
+
+import httpx
+import openai
+
+import make_personas
+from make_personas import BasePersona, BasePersonaList, generate_personas_async
+
+
+def base_persona(name):
+    return BasePersona(
+        name=name,
+        age=30,
+        occupation="Engineer",
+        income_level="Middle",
+        interests=["hiking"],
+        pain_points=["time"],
+        goals=["save"],
+        preferred_channels=["email"],
+        buying_behavior="Careful",
+        brand_preferences=["Acme"],
+    )
+
+
+def test_slow_or_failed_prompts_keep_their_personas(monkeypatch):
+    async def base_personas(description):
+        return BasePersonaList(personas=[base_persona(name) for name in ("ok", "slow", "broken")])
+
+    async def chat_system_prompt(persona, timeout=None):
+        assert timeout == 0.05
+        if persona.name == "slow":
+            raise openai.APITimeoutError(request=httpx.Request("POST", "https://openrouter.ai"))
+        if persona.name == "broken":
+            raise RuntimeError("provider error")
+        return f"prompt for {persona.name}"
+
+    monkeypatch.setattr(make_personas, "generate_base_personas_async", base_personas)
+    monkeypatch.setattr(make_personas, "generate_chat_system_prompt_async", chat_system_prompt)
+    monkeypatch.setattr(make_personas, "PROMPT_TIMEOUT_S", 0.05)
+    progress = []
+
+    personas = asyncio.run(generate_personas_async(
+        "campaign", on_progress=lambda index, persona: progress.append(index), with_images=False
+    )).personas
+
+    assert [persona.name for persona in personas] == ["ok", "slow", "broken"]
+    assert [persona.chat_prompt_status for persona in personas] == ["done", "timed_out", "failed"]
+    assert personas[0].chat_system_prompt == "prompt for ok"
+    assert personas[1].chat_system_prompt.startswith("You are slow, a 30-year-old Engineer")
+    assert sorted(progress) == [0, 1, 2]
+
+
+def test_prompt_timeout_applies_to_each_call_not_its_queueing(fake_llm, monkeypatch):
+    async def base_personas(description):
+        return BasePersonaList(personas=[base_persona(name) for name in ("a", "b", "c")])
+
+    monkeypatch.setattr(make_personas, "generate_base_personas_async", base_personas)
+    monkeypatch.setattr(make_personas, "PROMPT_TIMEOUT_S", 0.05)
+    fake_llm.delay = 0.03
+
+    # One slot at a time, so the later prompts queue for longer than the timeout
+    personas = asyncio.run(generate_personas_async("campaign", with_images=False, concurrency=1)).personas
+
+    assert {persona.chat_prompt_status for persona in personas} == {"done"}
+    prompt_requests = [request for request in fake_llm.requests if "response_format" not in request]
+    assert len(prompt_requests) == 3
+    assert {request["timeout"] for request in prompt_requests} == {0.05}
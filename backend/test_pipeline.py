@@ -0,0 +1,20 @@
+import asyncio
+
+from db import SECTIONS
+
+
+def test_generation_runs_every_stage_on_the_event_loop(app, fake_llm, monkeypatch):
+    async def no_threads(*args, **kwargs):
+        raise AssertionError("a stage ran in a worker thread")
+
+    monkeypatch.setattr(asyncio, "to_thread", no_threads)
+    run = asyncio.run(app.generate_parallel("A product", "A company"))
+    assert set(SECTIONS) <= set(run.results)
+    assert run.critical_path[-1] in run.results
+    assert app.last_generation_run["seconds"] == run.seconds
+
+
+def test_llm_calls_overlap(app, fake_llm):
+    fake_llm.delay = 0.02
+    asyncio.run(app.generate_parallel("A product", "A company"))
+    assert fake_llm.peak > 1
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from models.rate_limiter import ModelLimit, ModelRateLimiter
+
+
+class Overloaded(Exception):
+    pass
+
+
+def limiter(**kwargs):
+    options = {"rate": 0, "burst": 1, "initial_limit": 2, "min_limit": 1, "max_limit": 4, **kwargs}
+    return ModelRateLimiter(lambda error: isinstance(error, Overloaded), **options)
+
+
+def test_successes_grow_the_limit_additively():
+    limits = limiter()
+    for _ in range(4):
+        with limits.slot("m"):
+            pass
+    # One slot per `limit` successes: 2 -> 2.5 -> 2.9 -> 3.24 -> 3.55
+    assert limits.for_model("m").limit == pytest.approx(3.55, abs=0.01)
+    for _ in range(20):
+        with limits.slot("m"):
+            pass
+    assert limits.for_model("m").limit == 4
+
+
+def test_overloads_cut_the_limit_once_per_cooldown():
+    limits = limiter(initial_limit=4)
+    for _ in range(3):
+        with pytest.raises(Overloaded):
+            with limits.slot("m"):
+                raise Overloaded()
+    stats = limits.stats()["m"]
+    assert (stats["limit"], stats["overloads"], stats["decreases"]) == (2, 3, 1)
+
+    limits.for_model("m")._last_decrease -= 1.0
+    with pytest.raises(Overloaded):
+        with limits.slot("m"):
+            raise Overloaded()
+    assert limits.for_model("m").limit == 1
+
+
+def test_other_errors_leave_the_limit_alone():
+    limits = limiter()
+    with pytest.raises(ValueError):
+        with limits.slot("m"):
+            raise ValueError()
+    assert limits.for_model("m").limit == 2
+    assert limits.stats()["m"]["in_flight"] == 0
+
+
+def test_concurrency_is_capped_at_the_limit():
+    limits = limiter()
+    running = []
+    peak = []
+
+    async def call():
+        async with limits.slot_async("m"):
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+
+    async def run():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(run())
+    assert max(peak) == 2
+    assert limits.stats()["m"]["max_queue_depth"] > 0
+
+
+def test_threads_and_coroutines_share_the_slots():
+    limits = limiter(initial_limit=1, max_limit=1)
+    limit = limits.for_model("m")
+    limit.acquire()
+    acquired = []
+
+    def thread_call():
+        with limits.slot("m"):
+            acquired.append("thread")
+
+    async def run():
+        thread = threading.Thread(target=thread_call)
+        thread.start()
+        while not limit._waiters:
+            await asyncio.sleep(0.001)
+        waiting = asyncio.ensure_future(limit.acquire_async())
+        await asyncio.sleep(0.01)
+        assert acquired == []
+        limit.release(True)
+        await asyncio.to_thread(thread.join)
+        await waiting
+        acquired.append("coroutine")
+        limit.release(True)
+
+    asyncio.run(run())
+    # First in, first out, whichever kind of caller
+    assert acquired == ["thread", "coroutine"]
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    limits = limiter(initial_limit=1, max_limit=1)
+    limit = limits.for_model("m")
+
+    async def run():
+        limit.acquire()
+        waiting = asyncio.ensure_future(limit.acquire_async())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        limit.release(True)
+
+    asyncio.run(run())
+    assert (limit.in_flight, len(limit._waiters)) == (0, 0)
+
+
+def test_token_bucket_paces_calls_after_the_burst():
+    limit = ModelLimit("m", rate=100, burst=2, initial_limit=8, min_limit=1, max_limit=8)
+    start = time.monotonic()
+    for _ in range(5):
+        limit.acquire()
+        limit.release(True)
+    # Two calls from the burst, then three at 100 per second
+    assert time.monotonic() - start >= 0.025
+    assert limit.stats()["calls"] == 5
@@ -0,0 +1,170 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from models.retry import CallRetrier, HedgePolicy, RetryPolicy
+
+
+def rate_limited(retry_after=None):
+    headers = {"retry-after": retry_after} if retry_after else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "http://test"))
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def retrier(attempts=3, hedge=None):
+    return CallRetrier(RetryPolicy(max_attempts=attempts, base_delay=0.001, max_delay=0.01), hedge or HedgePolicy())
+
+
+def test_retries_retryable_errors_until_success():
+    errors = [rate_limited(), rate_limited()]
+
+    def attempt():
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    r = retrier()
+    assert r.call("m", attempt) == "ok"
+    stats = r.stats()["models"]["m"]
+    assert (stats["calls"], stats["attempts"], stats["retries"], stats["recovered"]) == (1, 3, 2, 1)
+
+
+def test_gives_up_after_max_attempts():
+    def attempt():
+        raise rate_limited()
+
+    r = retrier(attempts=2)
+    with pytest.raises(openai.RateLimitError):
+        r.call("m", attempt)
+    stats = r.stats()["models"]["m"]
+    assert (stats["attempts"], stats["failed"]) == (2, 1)
+
+
+def test_does_not_retry_other_errors():
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        retrier().call("m", attempt)
+    assert len(calls) == 1
+
+
+def test_delay_is_jittered_and_honours_retry_after():
+    policy = RetryPolicy(base_delay=1.0, max_delay=8.0)
+    assert all(0 <= policy.delay(3, ValueError()) <= 4.0 for _ in range(100))
+    assert policy.delay(1, rate_limited("5")) >= 5.0
+    assert policy.delay(1, rate_limited("60")) == 8.0
+
+
+def test_async_retries():
+    errors = [rate_limited()]
+
+    async def attempt():
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    r = retrier()
+    assert asyncio.run(r.call_async("m", attempt)) == "ok"
+    assert r.stats()["models"]["m"]["recovered"] == 1
+
+
+def warmed(r, latency=0.001):
+    """Fill the model's latency window so hedging kicks in above `latency`."""
+    async def attempt():
+        await asyncio.sleep(latency)
+        return "fast"
+
+    async def warm():
+        for _ in range(r.hedge.min_samples):
+            await r.call_async("m", attempt)
+
+    asyncio.run(warm())
+    return r
+
+
+def test_slow_attempt_is_hedged_and_loser_cancelled():
+    r = warmed(retrier(hedge=HedgePolicy(enabled=True, min_samples=5)))
+    started = []
+    cancelled = []
+
+    async def attempt():
+        started.append(1)
+        try:
+            # The first attempt hangs, the hedge answers at once
+            await asyncio.sleep(10 if len(started) == 1 else 0)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return "hedge"
+
+    async def run():
+        result = await r.call_async("m", attempt)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == "hedge"
+    assert cancelled == [1]
+    stats = r.stats()["models"]["m"]
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 1)
+
+
+def test_cancelled_call_cancels_its_attempts():
+    r = warmed(retrier(hedge=HedgePolicy(enabled=True, min_samples=5)))
+    cancelled = []
+
+    async def attempt():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def run():
+        # Cancelled while still waiting on the primary attempt, before any hedge
+        task = asyncio.ensure_future(r.call_async("m", attempt))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert cancelled == [1]
+
+
+def test_cancelled_attempts_count_towards_the_threshold():
+    r = warmed(retrier(hedge=HedgePolicy(enabled=True, min_samples=5)))
+    before = len(r._models["m"].latencies)
+
+    async def attempt():
+        await asyncio.sleep(10 if attempts.pop() else 0)
+        return "ok"
+
+    attempts = [False, True]
+    asyncio.run(r.call_async("m", attempt))
+    # Both the winning hedge and the cancelled primary leave a sample
+    assert len(r._models["m"].latencies) == before + 2
+    assert max(r._models["m"].latencies) >= r._models["m"].percentile(0.5)
+
+
+def test_reported_percentiles_are_per_call():
+    r = retrier()
+    errors = [rate_limited()]
+
+    def attempt():
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    r.call("m", attempt)
+    model = r._models["m"]
+    assert len(model.call_latencies) == 1
+    # The call latency covers the failed attempt and the backoff, the attempt latency only the success
+    assert model.call_latencies[0] >= model.latencies[0]
+    assert r.stats()["models"]["m"]["p99_seconds"] == model.call_latencies[0]
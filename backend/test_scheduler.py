@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import pytest
+
+from scheduler import TaskGraph
+
+
+def test_stages_get_their_dependencies_results():
+    graph = TaskGraph()
+    graph.add("a", lambda: 1)
+
+    async def b(a):
+        return a + 1
+
+    graph.add("b", b, deps=["a"])
+    graph.add("c", lambda a, b: a + b, deps=["a", "b"])
+    run = asyncio.run(graph.run())
+    assert run.results == {"a": 1, "b": 2, "c": 3}
+    assert run.critical_path == ["a", "b", "c"]
+
+
+def test_independent_stages_run_concurrently():
+    graph = TaskGraph()
+    for name in "abc":
+        graph.add(name, lambda: time.sleep(0.1))
+    run = asyncio.run(graph.run())
+    assert run.seconds < 0.25
+
+
+def test_unknown_or_duplicate_stages_are_rejected():
+    graph = TaskGraph()
+    graph.add("a", lambda: 1)
+    with pytest.raises(ValueError):
+        graph.add("a", lambda: 1)
+    with pytest.raises(ValueError):
+        graph.add("b", lambda missing: 1, deps=["missing"])
+
+
+def test_failure_cancels_running_stages_and_is_raised():
+    cancelled = []
+    events = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    graph = TaskGraph()
+    graph.add("slow", slow)
+    graph.add("fail", fail)
+    graph.add("after", lambda fail: None, deps=["fail"])
+    with pytest.raises(RuntimeError):
+        asyncio.run(graph.run(on_stage=lambda name, event, payload: events.append((name, event))))
+    assert cancelled == ["slow"]
+    assert ("fail", "failed") in events
+    assert ("after", "running") not in events
+
+
+def test_listener_is_awaited_before_dependents_start():
+    order = []
+
+    async def on_stage(name, event, payload):
+        if event == "done":
+            await asyncio.sleep(0.01)
+        order.append((name, event))
+
+    graph = TaskGraph()
+    graph.add("a", lambda: 1)
+    graph.add("b", lambda a: 2, deps=["a"])
+    asyncio.run(graph.run(on_stage=on_stage))
+    assert order == [("a", "running"), ("a", "done"), ("b", "running"), ("b", "done")]
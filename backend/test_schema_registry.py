@@ -0,0 +1,53 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from models.schema_registry import SchemaRegistry, process_schema
+
+
+class Item(BaseModel):
+    name: str
+    note: Optional[str] = None
+
+
+class Basket(BaseModel):
+    items: List[Item]
+
+
+def test_process_schema_closes_every_object():
+    schema = process_schema(Basket.model_json_schema())
+    assert schema["additionalProperties"] is False
+    assert schema["$defs"]["Item"]["additionalProperties"] is False
+    assert schema["properties"]["items"]["type"] == "array"
+
+
+def test_models_are_compiled_once():
+    registry = SchemaRegistry()
+    registry.register(Basket, Item)
+    assert registry.warm() == 2
+    assert registry.warm() == 0
+
+    first = registry.response_format(Basket)
+    assert registry.response_format(Basket) is first
+    assert first["json_schema"]["name"] == "Basket"
+    assert first["json_schema"]["strict"] is True
+    assert registry.stats() == {"registered": 2, "compiled": 2, "hits": 2}
+
+
+def test_unregistered_models_compile_on_first_use():
+    registry = SchemaRegistry()
+    registry.response_format(Item)
+    registry.response_format(Item)
+    assert registry.stats() == {"registered": 0, "compiled": 1, "hits": 1}
+
+
+def test_models_sharing_a_name_are_kept_apart():
+    class Other(BaseModel):
+        label: str
+
+    Other.__name__ = "Item"
+    registry = SchemaRegistry()
+    registry.register(Item, Other)
+    assert registry.warm() == 2
+    assert "label" in registry.response_format(Other)["json_schema"]["schema"]["properties"]
+    assert "note" in registry.response_format(Item)["json_schema"]["schema"]["properties"]
@@ -0,0 +1,75 @@
+import asyncio
+
+from conftest import parse_sse
+from models import llms
+from models.streaming import StreamMetrics, StreamStats
+
+
+def test_metrics_measure_speed_from_the_first_token():
+    metrics = StreamMetrics(model="m")
+    metrics.start()
+    metrics._started -= 1.0  # the first token arrives a second in
+    metrics.token()
+    metrics.token()
+    metrics.finish(completion_tokens=10)
+    assert 1.0 <= metrics.ttft_seconds < metrics.seconds
+    assert metrics.tokens == 10
+    assert metrics.tokens_per_second == 10 / (metrics.seconds - metrics.ttft_seconds)
+
+
+def test_stats_leave_failed_streams_out_of_the_percentiles():
+    stats = StreamStats()
+    for ttft, failed in ((0.1, False), (0.3, False), (0.2, False), (5.0, True)):
+        metrics = StreamMetrics(model="m", ttft_seconds=ttft, tokens=1, tokens_per_second=10.0)
+        stats.record(metrics, failed)
+    report = stats.stats()
+    assert (report["streams"], report["completed"], report["failed"], report["tokens"]) == (4, 3, 1, 4)
+    assert report["p50_ttft_seconds"] == 0.2
+    assert report["p99_ttft_seconds"] == 0.3
+
+
+def test_stream_yields_text_as_it_arrives(fake_llm, monkeypatch):
+    monkeypatch.setattr(llms, "stream_stats", StreamStats())
+    metrics = StreamMetrics(model="m")
+
+    async def run():
+        return [text async for text in llms.llm_stream_messages_async([{"role": "user", "content": "hi"}], metrics=metrics)]
+
+    assert asyncio.run(run()) == ["Hello", ", ", "world"]
+    assert fake_llm.requests[0]["stream_options"] == {"include_usage": True}
+    assert metrics.tokens == 3 and metrics.ttft_seconds is not None
+    assert llms.stream_stats.stats()["completed"] == 1
+    assert llms.model_limiter.stats()[llms.text_model]["in_flight"] == 0
+
+
+def chat(app, client, content_id="a"):
+    async def run():
+        await app.db.create("a", {"personas": [{"name": "Ann", "chat_system_prompt": "You are Ann."}]})
+        async with client as c:
+            response = await c.post("/chat/stream", json={
+                "content_id": content_id, "persona_name": "Ann", "messages": [{"role": "user", "content": "Hi"}],
+            })
+            return response.status_code, response.text
+
+    return asyncio.run(run())
+
+
+def test_chat_stream_sends_tokens_then_metrics(app, client, fake_llm):
+    status, body = chat(app, client)
+    assert status == 200
+    messages = parse_sse(body)
+    assert [data["text"] for _, event, data in messages if event == "token"] == ["Hello", ", ", "world"]
+    assert messages[-1][1] == "done" and messages[-1][2]["tokens"] == 3
+    assert fake_llm.requests[0]["messages"][0] == {"role": "system", "content": "You are Ann."}
+
+
+def test_chat_stream_reports_a_broken_stream(app, client, fake_llm):
+    fake_llm.stream_error = RuntimeError("connection lost")
+    _, body = chat(app, client)
+    messages = parse_sse(body)
+    assert [event for _, event, _ in messages] == ["token", "token", "token", "error"]
+    assert messages[-1][2] == {"detail": "connection lost"}
+
+
+def test_chat_stream_with_unknown_content_is_404(app, client, fake_llm):
+    assert chat(app, client, content_id="missing")[0] == 404